@@ -0,0 +1,235 @@
+"""Constant-memory live chat analytics.
+
+`ChatAnalytics` is a chat sink (see `chat_aggregator.add_sink`) keeping, per
+channel and for all channels together:
+
+- messages per second over sliding windows (ring buffers of time buckets);
+- unique chatters (HyperLogLog, ~1.6% error with the default precision);
+- top emotes and top repeated phrases (Space-Saving heavy hitters), plus a
+  Count-Min sketch for "how often was this phrase seen" queries.
+
+None of them grows with the number of viewers or the length of the stream,
+so a raid with tens of thousands of chatters costs the same memory as a quiet
+evening. `snapshot()` is cheap enough to call from an overlay poll.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import time
+from array import array
+
+from emotes import EMOTE
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "windows": [10, 60, 300],  # seconds
+    "buckets": 60,             # ring-buffer slots per window
+    "hll_precision": 12,
+    "top_k": 50,
+    "cms_width": 2048,
+    "cms_depth": 4,
+    "min_phrase_len": 3,
+    "log_interval": 60,        # 0 disables the periodic chat.stats log line
+}
+
+ALL = "*"
+_PUNCT = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def _hash64(item: str) -> int:
+    return int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class SlidingWindowCounter:
+    """Event count over the last `window` seconds, kept in `buckets` time slots."""
+
+    def __init__(self, window: float = 60.0, buckets: int = 60, clock=time.monotonic):
+        self.window = float(window)
+        self.resolution = self.window / buckets
+        self._counts = array("L", [0] * buckets)
+        self._slots = array("q", [-1] * buckets)  # absolute slot number held by each bucket
+        self._clock = clock
+
+    def add(self, n: int = 1):
+        slot = int(self._clock() / self.resolution)
+        i = slot % len(self._counts)
+        if self._slots[i] != slot:
+            self._slots[i] = slot
+            self._counts[i] = 0
+        self._counts[i] += n
+
+    def count(self) -> int:
+        oldest = int(self._clock() / self.resolution) - len(self._counts)
+        return sum(c for c, s in zip(self._counts, self._slots) if s > oldest)
+
+    def rate(self) -> float:
+        return self.count() / self.window
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"precision must be in 4..16, got {precision}")
+        self.p = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+        self._alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add(self, item: str):
+        h = _hash64(item)
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self) -> int:
+        estimate = self._alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # small-range correction: linear counting
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other: "HyperLogLog"):
+        if other.p != self.p:
+            raise ValueError("cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+
+class SpaceSaving:
+    """Top-k heavy hitters in O(k) memory (Metwally et al.); counts may overestimate by `error`."""
+
+    def __init__(self, k: int = 50):
+        self.k = k
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, item: str, n: int = 1):
+        if item in self.counts:
+            self.counts[item] += n
+            return
+        if len(self.counts) < self.k:
+            self.counts[item] = n
+            self.errors[item] = 0
+            return
+        # evict the current minimum; the newcomer inherits its count as possible error
+        victim = min(self.counts, key=self.counts.__getitem__)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[item] = floor + n
+        self.errors[item] = floor
+
+    def top(self, n: int = 10) -> list:
+        return sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+
+class CountMinSketch:
+    """Frequency estimates with bounded overcount, `depth` rows of `width` counters."""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("L", [0] * width) for _ in range(depth)]
+
+    def _cells(self, item: str):
+        h = _hash64(item)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, item: str, n: int = 1):
+        cells = self._cells(item)
+        # conservative update: only raise the counters that are at the current minimum
+        target = min(row[c] for row, c in zip(self.rows, cells)) + n
+        for row, c in zip(self.rows, cells):
+            if row[c] < target:
+                row[c] = target
+
+    def estimate(self, item: str) -> int:
+        return min(row[c] for row, c in zip(self.rows, self._cells(item)))
+
+
+def normalize_phrase(text: str) -> str:
+    """Lowercase, drop punctuation and collapse spaces so near-identical spam counts together."""
+    return _SPACES.sub(" ", _PUNCT.sub(" ", (text or "").lower())).strip()
+
+
+def record_emotes(record: dict) -> list:
+    """Emote names in a chat record, from its pre-tokenized `segments`."""
+    return [seg["name"] for seg in record.get("segments") or () if seg["type"] == EMOTE]
+
+
+class ChannelStats:
+    def __init__(self, cfg: dict, clock=time.monotonic):
+        self.total = 0
+        self.windows = {int(w): SlidingWindowCounter(w, cfg["buckets"], clock) for w in cfg["windows"]}
+        self.chatters = HyperLogLog(cfg["hll_precision"])
+        self.emotes = SpaceSaving(cfg["top_k"])
+        self.phrases = SpaceSaving(cfg["top_k"])
+        self.phrase_counts = CountMinSketch(cfg["cms_width"], cfg["cms_depth"])
+
+    def snapshot(self, top: int = 10) -> dict:
+        return {
+            "messages": self.total,
+            "rate": {f"{w}s": round(c.rate(), 3) for w, c in self.windows.items()},
+            "unique_chatters": self.chatters.count(),
+            "top_emotes": self.emotes.top(top),
+            "top_phrases": [p for p in self.phrases.top(top) if p[1] > 1],
+        }
+
+
+class ChatAnalytics:
+    """Chat sink maintaining per-channel sketches; call `snapshot()` for the current view."""
+
+    def __init__(self, cfg: dict = None, clock=time.monotonic):
+        self.cfg = dict(DEFAULTS, **(cfg or {}))
+        self._clock = clock
+        self.channels = {}
+
+    def _stats(self, channel: str) -> ChannelStats:
+        stats = self.channels.get(channel)
+        if stats is None:
+            stats = self.channels[channel] = ChannelStats(self.cfg, self._clock)
+        return stats
+
+    def __call__(self, record: dict):
+        author = record.get("author_id") or record.get("author") or ""
+        phrase = normalize_phrase(record.get("content"))
+        emotes = record_emotes(record)
+        # a collapsed copypasta record stands for that many dropped messages; it has no author
+        n = record.get("collapsed") or 1
+        for stats in (self._stats(record.get("channel") or ""), self._stats(ALL)):
+            stats.total += n
+            for counter in stats.windows.values():
+                counter.add(n)
+            if author:
+                stats.chatters.add(author)
+            for emote in emotes:
+                stats.emotes.add(emote, n)
+            if len(phrase) >= self.cfg["min_phrase_len"]:
+                stats.phrases.add(phrase, n)
+                stats.phrase_counts.add(phrase, n)
+
+    def phrase_count(self, text: str, channel: str = ALL) -> int:
+        stats = self.channels.get(channel)
+        return stats.phrase_counts.estimate(normalize_phrase(text)) if stats else 0
+
+    def snapshot(self, channel: str = None, top: int = 10) -> dict:
+        """Stats for one channel, or {channel: stats} for all (ALL = every channel together)."""
+        if channel is not None:
+            stats = self.channels.get(channel)
+            return stats.snapshot(top) if stats else {}
+        return {name: stats.snapshot(top) for name, stats in self.channels.items()}
+
+    async def run(self):
+        """Periodically log the snapshot as a `chat.stats` line for metrics collection."""
+        interval = float(self.cfg["log_interval"])
+        while True:
+            await asyncio.sleep(interval)
+            if self.channels:
+                logger.info("chat.stats", extra={"stats": self.snapshot(top=5)})
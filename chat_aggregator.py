@@ -1,13 +1,109 @@
 import asyncio
+import functools
+import importlib
 import os
+import types
 import time
+import uuid
 import logging
 import re
-from twitchio.ext import commands
-from twitch_auth import refresh_access_token, write_tokens_to_env, read_tokens_from_env
+import startup
+import instrument
+from config import Settings
+from supervisor import Supervisor, LivenessWatchdog, ALWAYS
+from keepalive import ConnectionHealth, HealthRegistry, set_tcp_keepalive, TCP_DEFAULTS
+from reconnect import ReconnectScheduler, PRIMARY, SECONDARY, BACKGROUND
+from send_queue import SendQueue, REPLY
+from emotes import EmoteIndex, tokenize, TEXT, CODEPOINT
+from moderation import ModerationIndex, RecentMessages, CLEARMSG, CLEARCHAT
+from irc_stream import LineSplitter, ReceiveStats, CHUNK_SIZE
 
 logger = logging.getLogger(__name__)
 
+# in-process consumers of normalized chat records (see add_sink)
+_sinks = []
+# sink -> redact(handle) for sinks that keep records and honour moderation deletes
+_redactors = {}
+# sinks that also want CLEARMSG/CLEARCHAT event records (live readers)
+_event_sinks = []
+# message id / user -> location of each message in every redactable sink
+moderation = ModerationIndex()
+# debug payloads are only built when these say so (see instrument.configure)
+_debug_twitchio = instrument.gate("twitchio")
+_debug_irc = instrument.gate("irc")
+_debug_records = instrument.gate("records")
+# `type` of a record summarizing a collapsed copypasta flood (see copypasta.py)
+COPYPASTA = "copypasta"
+
+
+def add_sink(sink, redact=None, moderation_events: bool = False):
+    """Register a callable that receives every record passed to log_chat_message.
+
+    If `redact` is given, whatever `sink(record)` returns is kept as a handle and
+    `redact(handle)` is called when a moderator deletes that message.
+    """
+    if sink not in _sinks:
+        _sinks.append(sink)
+    if redact is not None:
+        _redactors[sink] = redact
+    if moderation_events and sink not in _event_sinks:
+        _event_sinks.append(sink)
+
+
+def remove_sink(sink):
+    try:
+        _sinks.remove(sink)
+    except ValueError:
+        pass
+    _redactors.pop(sink, None)
+    if sink in _event_sinks:
+        _event_sinks.remove(sink)
+
+
+_TAG_ESCAPES = {":": ";", "s": " ", "\\": "\\", "r": "\r", "n": "\n"}
+
+
+def _unescape_tag(value: str) -> str:
+    if "\\" not in value:
+        return value
+    out, chars = [], iter(value)
+    for ch in chars:
+        if ch == "\\":
+            nxt = next(chars, "")
+            out.append(_TAG_ESCAPES.get(nxt, nxt))
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _parse_irc_line(text: str):
+    """Split an IRC line into (tags, prefix, command, params); the trailing param is last."""
+    tags = {}
+    if text.startswith("@"):
+        raw_tags, _, text = text[1:].partition(" ")
+        for item in raw_tags.split(";"):
+            key, _, value = item.partition("=")
+            tags[key] = _unescape_tag(value)
+    prefix = ""
+    if text.startswith(":"):
+        prefix, _, text = text[1:].partition(" ")
+    text, sep, trailing = text.partition(" :")
+    params = text.split()
+    command = params.pop(0) if params else ""
+    if sep:
+        params.append(trailing)
+    return tags, prefix, command, params
+
+
+def moderation_event(command: str, channel: str, tags: dict, params: list) -> dict:
+    """Build the event dict for a CLEARMSG / CLEARCHAT line."""
+    if command == "CLEARMSG":
+        return {"type": CLEARMSG, "channel": channel, "id": tags.get("target-msg-id"), "login": tags.get("login")}
+    duration = tags.get("ban-duration")
+    return {"type": CLEARCHAT, "channel": channel, "user_id": tags.get("target-user-id"),
+            "login": params[1] if len(params) > 1 else None,
+            "duration": int(duration) if duration and duration.isdigit() else None}
+
 
 def _sanitize_content(content: str) -> str:
     """Sanitize chat content for logging/UI.
@@ -28,90 +124,334 @@ def _sanitize_content(content: str) -> str:
         content = content[:max_len-3] + "..."
     return content
 
+
+def _sanitize_segments(segments: list) -> list:
+    """Apply the content sanitizer to the text segments, keeping emotes in place."""
+    out = []
+    for seg in segments:
+        if seg["type"] == TEXT:
+            text = re.sub(r"https?://\S+|www\.\S+", "", seg["text"])
+            text = re.sub(r"\s+", " ", text)
+            if not text or (text == " " and (not out or out[-1]["type"] == TEXT)):
+                continue
+            seg = {"type": TEXT, "text": text}
+        out.append(seg)
+    if out and out[0]["type"] == TEXT:
+        out[0]["text"] = out[0]["text"].lstrip()
+    if out and out[-1]["type"] == TEXT:
+        out[-1]["text"] = out[-1]["text"].rstrip()
+    return [seg for seg in out if seg["type"] != TEXT or seg["text"]]
+
+_ssl_ctx = None
+
+
+def _ssl_context():
+    """Shared client TLS context; loading the CA store once saves time on every reconnect."""
+    global _ssl_ctx
+    if _ssl_ctx is None:
+        import ssl
+        _ssl_ctx = ssl.create_default_context()
+    return _ssl_ctx
+
+
+class _IrcConnection:
+    """Per-connection state shared by the batched receive path."""
+
+    __slots__ = ("name", "writer", "health", "welcomed", "pending_drain")
+
+    def __init__(self, name, writer, health):
+        self.name = name
+        self.writer = writer
+        self.health = health
+        self.welcomed = False
+        self.pending_drain = False
+
+
 class ChatAggregator:
-    def __init__(self, cfg=None):
+    # roles in sharded mode (see sharding.py): a "worker" only reads IRC for its
+    # channels, the "coordinator" only keeps the shared token fresh
+    ROLES = ("all", "worker", "coordinator")
+
+    def __init__(self, cfg=None, settings: Settings = None, role: str = "all"):
+        if role not in self.ROLES:
+            raise ValueError(f"role must be one of {self.ROLES}, got {role!r}")
+        if cfg is None and settings is not None:
+            cfg = settings.raw.get("chat")
         self.cfg = cfg or {}
-        self.tasks = []
+        # immutable snapshot; replaced wholesale by apply_settings on config reload
+        self.settings = settings or Settings.from_config({"chat": self.cfg})
+        instrument.configure(self.settings)
+        self.supervisor = Supervisor("chat")
+        # Twitch sends PING about every 5 minutes; silence beyond that means a dead socket
+        self.watchdog = LivenessWatchdog(deadline=float(self.cfg.get("liveness_timeout", 360)))
+        self._stopped = None
+        self.ring = None
+        self.analytics = None
+        self.recent = None
+        self.console = None
+        # --channel/--author from the command line, on top of `console` config
+        self.console_filters = {}
+        # where moderation events go; a shard worker forwards them to the coordinator
+        self.moderate = apply_moderation
+        moderation.max_tracked = int((self.cfg.get("moderation") or {}).get("max_tracked", moderation.max_tracked))
+        emotes_cfg = self.cfg.get("emotes") or {}
+        # third-party/channel emotes for messages whose tags do not describe them
+        self.emote_index = EmoteIndex(emotes_cfg.get("manifest"), int(emotes_cfg.get("max_entries", 10000))) if emotes_cfg.get("manifest") else None
+        self.emote_offsets = emotes_cfg.get("offsets", CODEPOINT)
+        copypasta_cfg = self.cfg.get("copypasta") or {}
+        # collapses near-duplicate floods before they are normalized, logged or sunk
+        self.copypasta = None
+        if copypasta_cfg.get("enabled") and role != "coordinator":
+            from copypasta import CopypastaFilter
+            self.copypasta = CopypastaFilter(copypasta_cfg)
+        first_seen_cfg = self.cfg.get("first_seen") or {}
+        # per-channel persistent Bloom filters flagging first-time chatters
+        self.first_seen = None
+        if first_seen_cfg.get("enabled") and role != "coordinator":
+            from first_seen import FirstSeen
+            self.first_seen = FirstSeen(first_seen_cfg)
+        self.health = HealthRegistry()
+        # every (re)connect goes through one scheduler sharing the Twitch connect/auth budget
+        self.reconnect = ReconnectScheduler(dict({"base": self.settings.retry_base, "max": self.settings.retry_max},
+                                                 **(self.cfg.get("reconnect") or {})))
+        self._irc_writers = {}
+        self._irc_channels = set()
+        self.receive_stats = {}
+        # non-IRC chat platforms (see platforms.py), by name
+        self.adapters = {}
+        self._bot_reload_event = None
+        send_cfg = self.cfg.get("send_queue") or {}
+        self._mod_channels = {c.lstrip("#").lower() for c in send_cfg.get("mod_channels") or []}
+        self.outbound = SendQueue(self._send_privmsg, send_cfg, is_mod=self._is_mod)
+        self.role = role
+        # where normalized chat records go; a shard worker replaces it with its IPC forwarder
+        self.emit = emit_chat_record
+
+    def send(self, channel: str, text: str, priority: int = REPLY):
+        """Queue an outbound chat message; returns a cancellable, awaitable handle."""
+        return self.outbound.submit(channel, text, priority)
+
+    def _is_mod(self, channel: str) -> bool:
+        bot = (self.settings.bot_username or "").lower()
+        return channel == bot or channel in self._mod_channels
+
+    async def _send_privmsg(self, channel: str, text: str):
+        """Write one PRIVMSG on the healthiest live IRC connection carrying `channel`."""
+        name = self.health.primary(channel)
+        writer = self._irc_writers.get(name) if name else None
+        if writer is None or writer.is_closing():
+            writer = next((w for w in self._irc_writers.values() if not w.is_closing()), None)
+        if writer is None:
+            raise ConnectionError("no live IRC connection")
+        writer.write(f"PRIVMSG #{channel} :{text}\r\n".encode('utf-8'))
+        await writer.drain()
+
+    def apply_settings(self, new: Settings, old: Settings = None):
+        """ConfigWatcher subscriber: switch to a new snapshot and apply it live."""
+        old = old or self.settings
+        self.settings = new
+        self.cfg = new.raw.get("chat") or {}
+        instrument.configure(new)
+        if self.console is not None and new.echo_messages != old.echo_messages:
+            (add_sink if new.echo_messages else remove_sink)(self.console)
+        if new.channels != old.channels:
+            logger.info("Chat channels changed: %s -> %s", list(old.channels), list(new.channels))
+            self._sync_irc_channels()
+            if self._bot_reload_event is not None:
+                self._bot_reload_event.set()
+
+    def _sync_irc_channels(self):
+        """JOIN/PART on the live IRC fallback connections to match settings.channels."""
+        wanted = set(self.settings.channels)
+        for name, writer in list(self._irc_writers.items()):
+            if writer.is_closing():
+                continue
+            for chan in sorted(wanted - self._irc_channels):
+                writer.write(f"JOIN #{chan}\r\n".encode('utf-8'))
+            for chan in sorted(self._irc_channels - wanted):
+                writer.write(f"PART #{chan}\r\n".encode('utf-8'))
+            health = self.health.connections.get(name)
+            if health is not None:
+                health.channels = set(wanted)
+        self._irc_channels = wanted
+
+    def _start_ring(self):
+        """Publish chat into a shared-memory ring when `shm_ring.enabled` is set."""
+        ring_cfg = self.cfg.get("shm_ring") or {}
+        if not ring_cfg.get("enabled") or self.ring is not None or self.role == "worker":
+            return
+        from chat_ring import ChatRingWriter, DEFAULT_NAME, DEFAULT_SLOTS, DEFAULT_SLOT_SIZE
+        try:
+            self.ring = ChatRingWriter(
+                name=ring_cfg.get("name", DEFAULT_NAME),
+                slots=ring_cfg.get("slots", DEFAULT_SLOTS),
+                slot_size=ring_cfg.get("slot_size", DEFAULT_SLOT_SIZE),
+            )
+        except Exception:
+            logger.exception("Failed to create shared-memory chat ring")
+            return
+        add_sink(self.ring.publish, redact=self.ring.redact, moderation_events=True)
+        logger.info("Chat ring published as shared memory %s", self.ring.name)
+
+    def _start_console(self):
+        """Echo chat to the terminal through a buffered, frame-rate limited sink."""
+        if self.role == "worker":
+            return
+        if self.console is None:
+            from console import ConsoleRenderer
+            cfg = dict(self.cfg.get("console") or {}, **{k: v for k, v in self.console_filters.items() if v})
+            self.console = ConsoleRenderer(cfg)
+        if self.settings.echo_messages:
+            add_sink(self.console)
+        self.supervisor.add("console", self.console.run, restart=ALWAYS)
+
+    def _start_recent(self):
+        """Keep the last `recent_messages` records in memory (moderation deletes apply)."""
+        size = int(self.cfg.get("recent_messages", 200))
+        if size <= 0 or self.role == "worker":
+            return
+        if self.recent is None:
+            self.recent = RecentMessages(size)
+        add_sink(self.recent, redact=self.recent.redact)
+
+    def _start_analytics(self):
+        """Feed chat into constant-memory live stats when `analytics.enabled` is set."""
+        analytics_cfg = self.cfg.get("analytics") or {}
+        if not analytics_cfg.get("enabled") or self.role == "worker":
+            return
+        if self.analytics is None:
+            from analytics import ChatAnalytics
+            self.analytics = ChatAnalytics(analytics_cfg)
+        add_sink(self.analytics)
+        if float(self.analytics.cfg["log_interval"]) > 0:
+            self.supervisor.add("chat-analytics", self.analytics.run, restart=ALWAYS)
 
     async def stop(self):
         """Gracefully stop all running tasks started by ChatAggregator."""
         print("ChatAggregator stopping...")
-        # Cancel background tasks
-        for t in list(self.tasks):
-            try:
-                t.cancel()
-            except Exception:
-                pass
-        if self.tasks:
-            await asyncio.gather(*self.tasks, return_exceptions=True)
-        self.tasks.clear()
+        self.supervisor.shutdown()
+        if self._stopped is not None:
+            await self._stopped.wait()
+        if self.ring is not None:
+            remove_sink(self.ring.publish)
+            self.ring.close()
+            self.ring = None
+        if self.analytics is not None:
+            remove_sink(self.analytics)
+        if self.recent is not None:
+            remove_sink(self.recent)
+        if self.console is not None:
+            remove_sink(self.console)
+        if self.first_seen is not None:
+            self.first_seen.close()
         print("ChatAggregator stopped.")
 
     async def start(self):
+        """Start every chat connection under the supervisor; returns on stop()."""
         logger.info("ChatAggregator starting...")
+        self._stopped = asyncio.Event()
+        self.supervisor = Supervisor("chat")
+        try:
+            self._start_ring()
+            self._start_recent()
+            self._start_console()
+            self._start_analytics()
+            self._add_children()
+            await self.supervisor.run()
+        finally:
+            self._stopped.set()
+
+    def _add_children(self):
+        sup = self.supervisor
+        sup.add("liveness-watchdog", self.watchdog.run, restart=ALWAYS)
+        sup.add("send-queue", self.outbound.run, restart=ALWAYS)
+        if self.emote_index is not None:
+            sup.add("emote-index", self.emote_index.run, restart=ALWAYS)
+        if self.copypasta is not None:
+            sup.add("copypasta", self._flush_copypasta, restart=ALWAYS)
+        if self.first_seen is not None:
+            sup.add("first-seen", self.first_seen.run, restart=ALWAYS)
+        self._add_platforms()
         # Twitch
-        twitch_cfg = self.cfg.get("twitch", {})
-        irc_token = twitch_cfg.get("irc_token") or os.getenv("TWITCH_IRC_TOKEN")
-        bot_username = twitch_cfg.get("bot_username") or os.getenv("TWITCH_BOT_USERNAME")
-        streamer = twitch_cfg.get("streamer_login") or os.getenv("TWITCH_STREAMER_LOGIN")
+        st = self.settings
+        irc_token = st.irc_token
+        bot_username = st.bot_username
+        streamer = st.streamer_login
 
         # debug: log presence without exposing full secrets
         token_present = bool(irc_token)
         token_preview = ("oauth:" + irc_token[-6:]) if token_present and irc_token.startswith("oauth:") else ("<set>" if token_present else "<missing>")
-        logger.debug("Twitch config: token=%s, bot=%s, streamer=%s", token_preview, bot_username, streamer)
+        logger.debug("Twitch config: token=%s, bot=%s, channels=%s", token_preview, bot_username, list(st.channels))
 
-        client_id = twitch_cfg.get("client_id") or os.getenv("TWITCH_CLIENT_ID")
-        client_secret = twitch_cfg.get("client_secret") or os.getenv("TWITCH_CLIENT_SECRET")
+        client_id = st.client_id
+        client_secret = st.client_secret
 
-        # retry/backoff settings (can be set via env)
-        retry_base = int(os.getenv("TWITCH_RETRY_BASE", "5"))
-        retry_max = int(os.getenv("TWITCH_RETRY_MAX", "300"))
-        retry_max_attempts = os.getenv("TWITCH_RETRY_MAX_ATTEMPTS")
-        retry_max_attempts = int(retry_max_attempts) if retry_max_attempts and retry_max_attempts.isdigit() else None
-
-        if irc_token and streamer:
+        if irc_token and (st.channels or self.role == "coordinator"):
             # event used to notify manager that tokens were refreshed
             self._token_refreshed_event = asyncio.Event()
+            # event used to restart the bot when the channel list changes
+            self._bot_reload_event = asyncio.Event()
 
-            # create a managed task that restarts the bot on failure with exponential backoff
-            self.tasks.append(asyncio.create_task(self._manage_twitch_bot(irc_token, bot_username or "twitch-bot", [streamer], client_id, client_secret, retry_base, retry_max, retry_max_attempts, self._token_refreshed_event)))
-            logger.info("Twitch bot task created (managed) for channel: %s", streamer)
+            # Start raw IRC fallback listener to ensure we receive PRIVMSG events
+            # This is now ALWAYS enabled as a reliable fallback since twitchio events may not fire
+            # several redundant connections may carry the same channels; only the
+            # healthiest one (by keepalive RTT) forwards each channel's messages.
+            # Added first: children start in order, so CONNECT/JOIN goes out before any twitchio work
+            count = max(1, int(self.cfg.get("irc_connections", 1))) if self.role != "coordinator" else 0
+            for i in range(count):
+                name = "irc-fallback" if count == 1 else f"irc-fallback-{i}"
+                sup.add(name, lambda name=name: self._irc_fallback(irc_token, bot_username or "twitch-bot", name), restart=ALWAYS)
+            logger.info("Twitch IRC fallback task created (raw IRC listener, %d connection(s))", count)
+
+            if self.role == "all":
+                # managed child that restarts the bot on failure with exponential backoff
+                sup.add("twitch-bot", lambda: self._manage_twitch_bot(irc_token, bot_username or "twitch-bot", client_id, client_secret, st.retry_max_attempts, self._token_refreshed_event))
+                logger.info("Twitch bot task created (managed) for channels: %s", ", ".join(st.channels))
 
             # if refresh token present, start background refresher task
-            refresh_token = twitch_cfg.get("refresh_token") or os.getenv("TWITCH_REFRESH_TOKEN")
-            expires_at = twitch_cfg.get("expires_at") or os.getenv("TWITCH_TOKEN_EXPIRES_AT")
-            try:
-                expires_at = int(expires_at) if expires_at else None
-            except Exception:
-                expires_at = None
-            if refresh_token and client_id and client_secret:
-                self.tasks.append(asyncio.create_task(self._twitch_token_refresher(client_id, client_secret, self._token_refreshed_event)))
+            if self.role != "worker" and st.refresh_token and client_id and client_secret:
+                sup.add("token-refresher", lambda: self._twitch_token_refresher(client_id, client_secret, self._token_refreshed_event), restart=ALWAYS)
                 logger.info("Twitch token refresher task created")
-
-            # Start raw IRC fallback listener to ensure we receive PRIVMSG events
-            # This is now ALWAYS enabled as a reliable fallback since twitchio events may not fire
-            self.tasks.append(asyncio.create_task(self._irc_fallback(irc_token, bot_username or "twitch-bot", streamer)))
-            logger.info("Twitch IRC fallback task created (raw IRC listener)")
         else:
             logger.warning("Twitch config incomplete or missing; skipping Twitch chat.")
 
-    async def _manage_twitch_bot(self, token, nick, channels, client_id, client_secret, retry_base, retry_max, retry_max_attempts, token_refreshed_event: asyncio.Event):
-        import random, traceback
+    async def _manage_twitch_bot(self, token, nick, client_id, client_secret, retry_max_attempts, token_refreshed_event: asyncio.Event):
         attempt = 0
-        backoff = retry_base
         current_token = token
+        # twitchio (and aiohttp under it) is slow to import and the Helix lookup is a
+        # blocking HTTP call: do both in threads while the IRC fallback connects
+        await asyncio.to_thread(importlib.import_module, "twitchio.ext.commands")
+        startup.timer.mark("twitchio_imported")
+        bot_id = await asyncio.to_thread(_lookup_bot_id, client_id, token, nick)
         while True:
+            # backoff, circuit breaker and the shared connect budget live in the scheduler
+            await self.reconnect.acquire("twitch-bot", SECONDARY)
             attempt += 1
             bot = None
             try:
                 logger.info("[twitch] starting bot (attempt %d)", attempt)
-                bot = self._make_twitch_bot(current_token, nick, channels, client_id, client_secret, bot_id=None)
+                bot = self._make_twitch_bot(current_token, nick, list(self.settings.channels), client_id, client_secret, bot_id=bot_id)
                 # run bot.start() in a task so we can also wait for token refresh events
                 bot_task = asyncio.create_task(bot.start())
 
-                # wait for either bot to finish or token refresh event
+                # wait for either bot to finish, a token refresh or a channel list change
                 token_wait_task = asyncio.create_task(token_refreshed_event.wait())
-                done, pending = await asyncio.wait({bot_task, token_wait_task}, return_when=asyncio.FIRST_COMPLETED)
+                reload_wait_task = asyncio.create_task(self._bot_reload_event.wait())
+                done, pending = await asyncio.wait({bot_task, token_wait_task, reload_wait_task}, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in (token_wait_task, reload_wait_task):
+                    if waiter not in done:
+                        waiter.cancel()
+
+                if reload_wait_task in done and bot_task not in done:
+                    logger.info("[twitch] channel list changed, restarting bot")
+                    self._bot_reload_event.clear()
+                    try:
+                        await bot.close()
+                    except Exception:
+                        pass
+                    bot_task.cancel()
+                    await asyncio.gather(bot_task, return_exceptions=True)
+                    continue
 
                 # handle token refresh signal
                 if token_wait_task in done and token_refreshed_event.is_set():
@@ -129,6 +469,7 @@ class ChatAggregator:
                         except Exception:
                             pass
                     # read updated token
+                    from twitch_auth import read_tokens_from_env
                     tokens = read_tokens_from_env()
                     new_token = tokens.get("access_token")
                     if new_token:
@@ -137,7 +478,7 @@ class ChatAggregator:
                         logger.warning("[twitch] token refreshed but access token missing in env")
                     # reset counters
                     attempt = 0
-                    backoff = retry_base
+                    self.reconnect.success("twitch-bot")
                     # continue to start bot with new token
                     continue
 
@@ -155,15 +496,11 @@ class ChatAggregator:
                         if retry_max_attempts and attempt >= retry_max_attempts:
                             logger.info("[twitch] reached max retry attempts (%d), giving up", retry_max_attempts)
                             break
-                        sleep_time = backoff + random.random() * min(5, backoff)
-                        logger.info("[twitch] retrying in %.1fs (backoff %ds)", sleep_time, backoff)
-                        await asyncio.sleep(sleep_time)
-                        backoff = min(backoff * 2, retry_max)
+                        sleep_time = self.reconnect.failure("twitch-bot")
+                        logger.info("[twitch] retrying in %.1fs", sleep_time)
                     else:
-                        logger.info("[twitch] bot stopped gracefully, will restart after short delay")
+                        logger.info("[twitch] bot stopped gracefully, will restart")
                         attempt = 0
-                        backoff = retry_base
-                        await asyncio.sleep(1)
 
             except asyncio.CancelledError:
                 logger.info("[twitch] manage task cancelled")
@@ -185,14 +522,13 @@ class ChatAggregator:
                 if retry_max_attempts and attempt >= retry_max_attempts:
                     logger.info("[twitch] reached max retry attempts (%d), giving up", retry_max_attempts)
                     break
-                sleep_time = backoff + random.random() * min(5, backoff)
-                logger.info("[twitch] retrying in %.1fs (backoff %ds)", sleep_time, backoff)
-                await asyncio.sleep(sleep_time)
-                backoff = min(backoff * 2, retry_max)
+                sleep_time = self.reconnect.failure("twitch-bot")
+                logger.info("[twitch] retrying in %.1fs", sleep_time)
 
     async def _twitch_token_refresher(self, client_id, client_secret, token_refreshed_event: asyncio.Event):
         """Background task to refresh Twitch access token when it nears expiry."""
         logger.info("[twitch] token refresher started")
+        from twitch_auth import refresh_access_token, write_tokens_to_env, read_tokens_from_env
         while True:
             tokens = read_tokens_from_env()
             refresh_token = tokens.get("refresh_token")
@@ -209,7 +545,7 @@ class ChatAggregator:
                 continue
             try:
                 logger.info("[twitch] refreshing access token using refresh_token")
-                data = refresh_access_token(client_id, client_secret, refresh_token)
+                data = await asyncio.to_thread(refresh_access_token, client_id, client_secret, refresh_token)
                 access_token = data.get("access_token")
                 new_refresh = data.get("refresh_token") or refresh_token
                 expires_in = data.get("expires_in", 3600)
@@ -221,45 +557,17 @@ class ChatAggregator:
                 except Exception:
                     logger.exception("Failed to set token_refreshed_event")
                 # optionally restart process to pick up new token if configured
-                restart_flag = os.getenv("TWITCH_RESTART_ON_REFRESH", "false").lower()
-                if restart_flag in ("1","true","yes"):
+                if self.settings.restart_on_refresh:
                     logger.info("[twitch] TWITCH_RESTART_ON_REFRESH set; exiting to allow supervisor to restart")
                     os._exit(0)
             except Exception as exc:
                 logger.exception("[twitch] token refresh failed: %s", exc)
                 await asyncio.sleep(30)
 
-        if self.tasks:
-            await asyncio.gather(*self.tasks)
-        else:
-            print("No chat backends configured; idle loop.")
-            while True:
-                await asyncio.sleep(3600)
-
     def _make_twitch_bot(self, token, nick, channels, client_id=None, client_secret=None, bot_id=None):
+        from twitchio.ext import commands
         outer = self
 
-        # Try to fetch bot_id using Helix API if possible
-        if bot_id is None:
-            try:
-                import requests
-                if client_id and token and nick:
-                    headers = {"Client-Id": client_id, "Authorization": f"Bearer {token.replace('oauth:', '')}"}
-                    resp = requests.get("https://api.twitch.tv/helix/users", params={"login": nick}, headers=headers, timeout=5)
-                    logger.debug(f"Helix API call for bot_id: status={resp.status_code}")
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        if data.get("data"):
-                            bot_id = data["data"][0].get("id")
-                            logger.info(f"Retrieved bot_id: {bot_id}")
-                        else:
-                            logger.warning("Helix API returned no data")
-                    else:
-                        logger.warning(f"Helix API error: {resp.status_code}")
-            except Exception as e:
-                logger.warning(f"Failed to get bot_id from Helix: {e}")
-                bot_id = None
-        
         logger.debug(f"Final bot_id: {bot_id}")
 
         class Bot(commands.Bot):
@@ -279,132 +587,321 @@ class ChatAggregator:
                 # avoid accessing attributes that may not exist across twitchio versions
                 bot_ident = getattr(self, 'nick', None) or getattr(self, 'name', None) or getattr(self, 'user', '<bot>')
                 logger.info("Twitch bot connected", extra={"bot": bot_ident, "channels": channels})
+                outer.reconnect.success("twitch-bot")
+                startup.timer.mark("twitchio_ready")
 
             async def event_message(self, message):
                 # low-level debug: log raw message object to help diagnosing missing events
-                try:
-                    logger.debug("raw message received", extra={"repr": repr(message), "attrs": {k: getattr(message, k, None) for k in dir(message) if k.startswith("content") or k in ("tags","echo")}})
-                except Exception:
-                    logger.debug("raw message received (could not introspect)")
+                if _debug_twitchio.sample():
+                    try:
+                        _debug_twitchio.log(logger, "raw message received", extra={"repr": repr(message), "attrs": {k: getattr(message, k, None) for k in dir(message) if k.startswith("content") or k in ("tags","echo")}})
+                    except Exception:
+                        _debug_twitchio.log(logger, "raw message received (could not introspect)")
 
                 # ignore messages sent by the bot itself
                 if getattr(message, 'echo', False):
-                    logger.debug("Ignoring message.echo == True", extra={"author": getattr(message.author, 'name', None)})
+                    if _debug_twitchio.enabled:
+                        _debug_twitchio.log(logger, "Ignoring message.echo == True", extra={"author": getattr(message.author, 'name', None)})
                     return
 
-                # echo to console if enabled (helpful for quick checks)
-                if os.getenv("TWITCH_ECHO_MESSAGES", "true").lower() in ("1", "true", "yes"):
-                    try:
-                        print(f"[{getattr(message.channel, 'name', message.channel)}] {getattr(message.author, 'name', message.author)}: {getattr(message, 'content', '')}")
-                    except Exception:
-                        print(repr(message))
+                settings = outer.settings
+                if not settings.filters.accepts(getattr(message.author, 'name', None), getattr(message, 'content', '')):
+                    return
 
-                # call module-level helper so logic is testable without bot instantiation
-                log_chat_message(message)
+                # console echo (echo_messages) is the ConsoleRenderer sink, fed like every other sink
+                outer._publish(message)
 
             async def event_join(self, channel, user):
+                if not _debug_twitchio.sample():
+                    return
                 try:
-                    logger.debug("event_join", extra={"channel": getattr(channel, 'name', str(channel)), "user": getattr(user, 'name', str(user))})
+                    _debug_twitchio.log(logger, "event_join", extra={"channel": getattr(channel, 'name', str(channel)), "user": getattr(user, 'name', str(user))})
                 except Exception:
-                    logger.debug("event_join received")
+                    _debug_twitchio.log(logger, "event_join received")
 
             async def event_part(self, channel, user):
+                if not _debug_twitchio.sample():
+                    return
                 try:
-                    logger.debug("event_part", extra={"channel": getattr(channel, 'name', str(channel)), "user": getattr(user, 'name', str(user))})
+                    _debug_twitchio.log(logger, "event_part", extra={"channel": getattr(channel, 'name', str(channel)), "user": getattr(user, 'name', str(user))})
                 except Exception:
-                    logger.debug("event_part received")
+                    _debug_twitchio.log(logger, "event_part received")
 
             @commands.command(name="ping")
             async def ping(self, ctx: commands.Context):
                 """Simple command to test bot responsiveness."""
-                try:
-                    await ctx.send("pong")
-                except Exception:
-                    logger.exception("Failed to send ping response")
+                # replies go through the rate-limited outbound queue
+                channel = getattr(ctx.channel, 'name', None) or str(ctx.channel)
+                outer.send(channel, "pong")
 
         # return an instance of the Bot class
         return Bot(token, nick, channels, client_id=client_id, client_secret=client_secret, bot_id=bot_id)
 
-    async def _irc_fallback(self, token, nick, channel):
+    async def _irc_fallback(self, token, nick, name="irc-fallback"):
         """Raw IRC fallback listener using asyncio streams. Connects directly to Twitch IRC over TLS and forwards PRIVMSG to log_chat_message.
         This runs in parallel with the twitchio bot and ensures we always receive chat messages.
         """
-        import ssl, asyncio, random
-        backoff = 5
-        max_backoff = 300
+        # the first connection is the primary chat path and reconnects first
+        priority = PRIMARY if name in ("irc-fallback", "irc-fallback-0") else BACKGROUND
+        liveness = None
+        keepalive = None
+        health = ConnectionHealth(name, cfg=self.cfg.get("keepalive"))
+        tcp_cfg = dict(TCP_DEFAULTS, **(self.cfg.get("tcp_keepalive") or {}))
+        connect_timeout = float(self.cfg.get("connect_timeout", 10))
+        chunk_size = int(self.cfg.get("read_chunk_size", CHUNK_SIZE))
+        # per-batch / per-line receive timing, see irc_stream.ReceiveStats
+        stats = self.receive_stats.setdefault(name, ReceiveStats()) if self.cfg.get("profile_receive") else None
         while True:
+            await self.reconnect.acquire(name, priority)
             try:
-                logger.info("[irc-fallback] connecting to irc.chat.twitch.tv:6697 as %s, joining #%s", nick, channel)
-                ssl_ctx = ssl.create_default_context()
-                reader, writer = await asyncio.open_connection('irc.chat.twitch.tv', 6697, ssl=ssl_ctx)
-
-                # send login
+                channels = list(self.settings.channels)
+                logger.info("[irc-fallback] connecting to irc.chat.twitch.tv:6697 as %s, joining %s", nick, ", ".join("#" + c for c in channels))
+                ssl_ctx = _ssl_context()
+                reader, writer = await asyncio.wait_for(asyncio.open_connection('irc.chat.twitch.tv', 6697, ssl=ssl_ctx), connect_timeout)
+                set_tcp_keepalive(writer.get_extra_info('socket'), **tcp_cfg)
+
+                # send login; tags carry message/user ids, commands deliver CLEARMSG/CLEARCHAT
+                writer.write(b"CAP REQ :twitch.tv/tags twitch.tv/commands\r\n")
                 writer.write(f"PASS {token}\r\n".encode('utf-8'))
                 writer.write(f"NICK {nick}\r\n".encode('utf-8'))
-                writer.write(f"JOIN #{channel}\r\n".encode('utf-8'))
+                for chan in channels:
+                    writer.write(f"JOIN #{chan}\r\n".encode('utf-8'))
                 await writer.drain()
+                self._irc_writers[name] = writer
+                self._irc_channels = set(channels)
+                # abort (not close) so a half-open TLS socket is torn down immediately
+                liveness = self.watchdog.register(name, writer.transport.abort)
+                health.channels = set(channels)
+                health.connected = True
+                self.health.register(health)
+                keepalive = asyncio.create_task(health.run(writer.write, writer.transport.abort))
 
                 logger.info("[irc-fallback] connected and joined channel")
-                backoff = 5
+                startup.timer.mark("irc_joined")
+                conn = _IrcConnection(name, writer, health)
+                splitter = LineSplitter()
 
                 while True:
-                    line = await reader.readline()
-                    if not line:
+                    # one read returns every line Twitch packed into the TLS records so far
+                    chunk = await reader.read(chunk_size)
+                    if not chunk:
                         logger.warning("[irc-fallback] connection closed by server")
                         break
-                    text = line.decode('utf-8', errors='replace').strip()
-                    logger.debug("[irc-fallback] RAW: %s", text[:400])
-                    # PING/PONG
-                    if text.startswith('PING'):
-                        try:
-                            writer.write('PONG :tmi.twitch.tv\r\n'.encode('utf-8'))
-                            await writer.drain()
-                            logger.debug('[irc-fallback] sent PONG')
-                        except Exception:
-                            logger.exception('[irc-fallback] failed to send PONG')
-                        continue
-                    if 'PRIVMSG' in text:
-                        try:
-                            # :user!user@user.tmi.twitch.tv PRIVMSG #channel :message
-                            prefix, rest = text.split(' PRIVMSG ', 1)
-                            user = prefix.split('!')[0].lstrip(':')
-                            chan, msg = rest.split(' :', 1)
-                            # build a minimal message-like object
-                            import types
-                            message = types.SimpleNamespace()
-                            message.channel = types.SimpleNamespace(name=chan.lstrip('#'))
-                            message.author = types.SimpleNamespace(name=user)
-                            message.content = msg
-                            message.tags = {}
-                            message.echo = False
-                            logger.debug('[irc-fallback] parsed PRIVMSG from %s: %s', user, msg[:200])
-                            # forward to structured logger
-                            try:
-                                log_chat_message(message)
-                            except Exception:
-                                logger.exception('[irc-fallback] failed to log chat message')
-                        except Exception:
-                            logger.exception('[irc-fallback] failed to parse PRIVMSG')
+                    liveness.touch()
+                    started = time.perf_counter() if stats is not None else 0.0
+                    lines = splitter.feed(chunk)
+                    if lines:
+                        self._handle_irc_lines(conn, lines, stats)
+                    if conn.pending_drain:
+                        conn.pending_drain = False
+                        await writer.drain()
+                    if stats is not None:
+                        stats.record_batch(len(chunk), len(lines), time.perf_counter() - started)
             except asyncio.CancelledError:
                 logger.info('[irc-fallback] cancelled')
-                return
+                raise
             except Exception:
                 logger.exception('[irc-fallback] connection error, retrying')
-            # backoff
-            sleep = backoff + random.random() * min(5, backoff)
-            logger.info('[irc-fallback] reconnecting in %.1fs (backoff %ds)', sleep, backoff)
-            await asyncio.sleep(sleep)
-            backoff = min(backoff * 2, max_backoff)
+            finally:
+                if liveness is not None:
+                    self.watchdog.unregister(liveness)
+                    liveness = None
+                if keepalive is not None:
+                    keepalive.cancel()
+                    keepalive = None
+                health.connected = False
+                self.health.unregister(health)
+                self._irc_writers.pop(name, None)
+            # backoff is applied by the scheduler before the next attempt
+            sleep = self.reconnect.failure(name)
+            logger.info('[irc-fallback] reconnecting in %.1fs', sleep)
+
+    def _publish(self, message):
+        """Normalize and emit one chat message, unless it is collapsed into a copypasta flood."""
+        channel = getattr(message.channel, 'name', str(message.channel))
+        # checked before collapsing, so a first message lost in a flood still counts as seen
+        first_seen = None
+        if self.first_seen is not None:
+            first_seen = self.first_seen.check(
+                channel, getattr(message.author, 'id', None) or getattr(message.author, 'user_id', None))
+        if self.copypasta is not None and not self.copypasta.admit(
+                channel, getattr(message, 'content', ''), getattr(message.author, 'name', None), bool(first_seen)):
+            return
+        # normalize with the module-level helper so logic is testable without bot instantiation
+        record = chat_record(message, self.emote_index, self.emote_offsets)
+        if first_seen is not None:
+            record["first_seen"] = first_seen
+        self.emit(record)
+
+    def _add_platforms(self):
+        """One supervised child per enabled `platforms.<name>` entry (YouTube, ...)."""
+        platforms_cfg = self.cfg.get("platforms") or {}
+        if self.role == "worker" or not platforms_cfg:
+            return
+        from platforms import create_adapter
+        for name, pcfg in platforms_cfg.items():
+            if not (pcfg or {}).get("enabled", True):
+                continue
+            try:
+                adapter = self.adapters.get(name) or create_adapter(name, pcfg)
+            except ValueError as exc:
+                logger.error("Chat platform %s disabled: %s", name, exc)
+                continue
+            self.adapters[name] = adapter
+            self.supervisor.add(f"platform-{name}", functools.partial(self._run_adapter, adapter), restart=ALWAYS,
+                                health=adapter.health.snapshot)
+
+    async def _run_adapter(self, adapter):
+        """Feed one platform adapter into the same pipeline as Twitch chat."""
+        await adapter.connect()
+        logger.info("Chat platform %s connected", adapter.name)
+        try:
+            async for message in adapter.messages():
+                if not self.settings.filters.accepts(message.author.name, message.content):
+                    continue
+                try:
+                    self._publish(message)
+                except Exception:
+                    logger.exception("[%s] failed to log chat message", adapter.name)
+        finally:
+            await adapter.close()
+
+    async def _flush_copypasta(self):
+        """Emit one record per collapsed flood every `copypasta.flush_interval` seconds."""
+        interval = float(self.copypasta.cfg["flush_interval"])
+        while True:
+            await asyncio.sleep(interval)
+            for summary in self.copypasta.flush():
+                # no author: the text stands for many chatters, none of them is credited
+                message = types.SimpleNamespace(
+                    channel=types.SimpleNamespace(name=summary["channel"]),
+                    author=types.SimpleNamespace(name=None, id=None),
+                    id=f"copypasta-{uuid.uuid4()}", content=summary["content"], tags={}, echo=False)
+                record = chat_record(message, self.emote_index, self.emote_offsets)
+                record["type"] = COPYPASTA
+                record["collapsed"] = summary["collapsed"]
+                record["collapsed_authors"] = summary["authors"]
+                record["collapsed_first_seen"] = summary["first_seen"]
+                try:
+                    self.emit(record)
+                except Exception:
+                    logger.exception("failed to emit collapsed copypasta")
+
+    def _handle_irc_lines(self, conn, lines, stats=None):
+        """Dispatch one received batch of complete IRC lines."""
+        gated = _debug_irc.enabled
+        for text in lines:
+            if not text:
+                continue
+            debug = gated and _debug_irc.sample()
+            if debug:
+                _debug_irc.log(logger, "[irc-fallback] RAW: %s", text[:400])
+            started = time.perf_counter() if stats is not None else 0.0
+            try:
+                self._handle_irc_line(conn, text, debug)
+            except Exception:
+                logger.exception('[irc-fallback] failed to handle line')
+            if stats is not None:
+                stats.record_line(time.perf_counter() - started)
+
+    def _handle_irc_line(self, conn, text, debug=False):
+        tags, prefix, command, params = _parse_irc_line(text)
+        if not conn.welcomed and command == '001':
+            # RPL_WELCOME: authenticated, the endpoint is healthy again
+            conn.welcomed = True
+            self.reconnect.success(conn.name)
+            startup.timer.mark("irc_welcome")
+        # PING/PONG
+        if command == 'PING':
+            conn.writer.write(b'PONG :tmi.twitch.tv\r\n')
+            conn.pending_drain = True
+            logger.debug('[irc-fallback] sent PONG')
+            return
+        if command == 'NOTICE' and (tags.get('msg-id') == 'msg_ratelimit' or 'sending messages too quickly' in text):
+            chan = params[0].lstrip('#') if params else ''
+            logger.warning('[irc-fallback] rate limited in #%s, holding outbound queue', chan)
+            self.outbound.rate_limited(chan)
+            return
+        if command == 'PONG':
+            rtt = conn.health.on_pong(text)
+            if rtt is not None:
+                logger.debug('[irc-fallback] %s rtt %.1fms', conn.name, rtt * 1000)
+            return
+        if command in ('CLEARMSG', 'CLEARCHAT') and params:
+            chan = params[0].lstrip('#')
+            if self.health.is_primary(conn.name, chan):
+                try:
+                    self.moderate(moderation_event(command, chan, tags, params))
+                except Exception:
+                    logger.exception('[irc-fallback] failed to apply %s', command)
+            return
+        if command == 'PRIVMSG' and len(params) >= 2:
+            try:
+                # @tags :user!user@user.tmi.twitch.tv PRIVMSG #channel :message
+                user = prefix.split('!')[0]
+                chan, msg = params[0], params[-1]
+                # build a minimal message-like object
+                message = types.SimpleNamespace()
+                message.channel = types.SimpleNamespace(name=chan.lstrip('#'))
+                message.author = types.SimpleNamespace(name=user, id=tags.get('user-id'))
+                message.id = tags.get('id')
+                message.content = msg
+                message.tags = tags
+                message.echo = False
+                if debug:
+                    _debug_irc.log(logger, '[irc-fallback] parsed PRIVMSG from %s: %s', user, msg[:200])
+                if not self.settings.filters.accepts(user, msg):
+                    return
+                if not self.health.is_primary(conn.name, message.channel.name):
+                    return
+                # forward to structured logger (or the shard coordinator)
+                try:
+                    self._publish(message)
+                except Exception:
+                    logger.exception('[irc-fallback] failed to log chat message')
+            except Exception:
+                logger.exception('[irc-fallback] failed to parse PRIVMSG')
+
+def _lookup_bot_id(client_id, token, nick):
+    """Fetch the bot's user id from Helix (blocking; run it in a thread)."""
+    if not (client_id and token and nick):
+        return None
+    try:
+        import requests
+        headers = {"Client-Id": client_id, "Authorization": f"Bearer {token.replace('oauth:', '')}"}
+        resp = requests.get("https://api.twitch.tv/helix/users", params={"login": nick}, headers=headers, timeout=5)
+        logger.debug(f"Helix API call for bot_id: status={resp.status_code}")
+        if resp.status_code == 200:
+            data = resp.json()
+            if data.get("data"):
+                bot_id = data["data"][0].get("id")
+                logger.info(f"Retrieved bot_id: {bot_id}")
+                return bot_id
+            logger.warning("Helix API returned no data")
+        else:
+            logger.warning(f"Helix API error: {resp.status_code}")
+    except Exception as e:
+        logger.warning(f"Failed to get bot_id from Helix: {e}")
+    return None
 
 
 def log_chat_message(message):
     """Log a chat message in a structured way. Extracts/normalizes fields and writes to logger."""
+    emit_chat_record(chat_record(message))
+
+
+def chat_record(message, emote_index: EmoteIndex = None, offsets: str = CODEPOINT) -> dict:
+    """Normalize a twitchio (or IRC fallback) message into a plain, picklable record.
+
+    `segments` is the content already split into text and emote pieces.
+    """
     # basic debug to help diagnose missing events
-    try:
-        raw_content = getattr(message, 'content', '')
-        logger.debug("log_chat_message invoked", extra={"raw_content_preview": raw_content[:200], "echo": getattr(message, 'echo', None)})
-    except Exception:
-        logger.debug("log_chat_message invoked (could not read message attributes)")
+    if _debug_records.sample():
+        try:
+            raw_content = getattr(message, 'content', '')
+            _debug_records.log(logger, "log_chat_message invoked", extra={"raw_content_preview": raw_content[:200], "echo": getattr(message, 'echo', None)})
+        except Exception:
+            _debug_records.log(logger, "log_chat_message invoked (could not read message attributes)")
 
     channel = getattr(message.channel, 'name', str(message.channel))
     author = getattr(message.author, 'name', str(message.author))
@@ -412,12 +909,50 @@ def log_chat_message(message):
     tags = getattr(message, 'tags', {}) or {}
     raw_content = getattr(message, 'content', '')
     content = _sanitize_content(raw_content)
+    # emote offsets refer to the raw text, so tokenize before sanitizing
+    segments = _sanitize_segments(tokenize(raw_content, tags.get('emotes'), emote_index, channel, offsets))
+
+    msg_id = getattr(message, 'id', None) or tags.get('id')
 
-    logger.info("chat.message", extra={
+    record = {
+        "id": str(msg_id) if msg_id is not None else None,
         "channel": channel,
         "author": author,
         "author_id": str(author_id) if author_id is not None else None,
         "content": content,
+        "segments": segments,
         "tags": tags
-    })
+    }
+    return record
+
+
+def emit_chat_record(record: dict, ts: float = None):
+    """Write a normalized record to the chat log and hand it to every sink.
+
+    Copypasta summaries are logged as `chat.copypasta`, so log readers that count
+    `chat.message` lines per author skip them.
+    """
+    logger.info("chat.copypasta" if record.get("type") == COPYPASTA else "chat.message", extra=record)
+
+    if _sinks:
+        record = dict(record, ts=ts or time.time())
+        for sink in list(_sinks):
+            try:
+                handle = sink(record)
+                if handle and sink in _redactors:
+                    moderation.track(record, _redactors[sink], handle)
+            except Exception:
+                logger.exception("chat sink %r failed", sink)
+
+
+def apply_moderation(event: dict) -> int:
+    """CLEARMSG/CLEARCHAT: redact the messages from every sink and notify live readers."""
+    removed = moderation.apply(event)
+    logger.info("chat.moderation", extra=dict(event, removed=removed))
+    for sink in list(_event_sinks):
+        try:
+            sink(dict(event, ts=time.time()))
+        except Exception:
+            logger.exception("chat sink %r failed", sink)
+    return removed
 
@@ -0,0 +1,211 @@
+"""Shared-memory ring buffer for live chat.
+
+`ChatAggregator` can publish every logged chat message into a named shared
+memory block so local tools (`show_chat.py --live`, OBS helper scripts) get
+chat without going through the log file.
+
+Layout (little endian):
+  header:  magic(u32) slot_count(u32) slot_size(u32) owner_pid(u32) head_seq(u64)
+  slot[i]: seq(u64) length(u32) version(u32) payload(slot_size bytes)
+
+There is exactly one writer; its pid is in the header, so a block left behind
+by a crashed writer can be reclaimed while a live one is never taken over.
+Each slot is a small seqlock: the writer zeroes
+the slot sequence, copies the payload, then stores the message sequence
+number. Readers never lock; they re-check the slot sequence after copying and
+count anything overwritten underneath them as a gap, so a slow reader never
+slows the writer down. A moderation delete rewrites a slot in place (same
+sequence number, bumped version), so readers compare the version too.
+"""
+
+import json
+import logging
+import os
+import struct
+from multiprocessing import shared_memory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME = "obs_multichat_chat"
+DEFAULT_SLOTS = 1024
+DEFAULT_SLOT_SIZE = 4096
+
+MAGIC = 0x4F4D4352  # "OMCR"
+_HEADER = struct.Struct("<IIIIQ")
+_SLOT_HEADER = struct.Struct("<QII")
+_SEQ = struct.Struct("<Q")
+_HEAD_OFFSET = 16
+
+# blocks created by a writer in this process (tracked by our resource tracker)
+_owned = set()
+
+
+def _alive(pid: int) -> bool:
+    if os.name == "nt":
+        # Windows frees a block with its last handle, so an existing one always has a live owner
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _owner(name: str):
+    """Pid of the live writer owning the existing block `name`, or None if the block is stale."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        if shm.size < _HEADER.size:
+            return None
+        magic, _, _, pid, _ = _HEADER.unpack_from(shm.buf, 0)
+        return pid if magic == MAGIC and pid and _alive(pid) else None
+    finally:
+        shm.close()
+
+
+def _encode(record: dict, limit: int):
+    data = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(data) > limit and record.get("tags"):
+        # tags are the least useful part for live consumers; drop them first
+        data = json.dumps(dict(record, tags={}), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return data if len(data) <= limit else None
+
+
+class ChatRingWriter:
+    """Single writer publishing chat records into a shared-memory ring."""
+
+    def __init__(self, name: str = DEFAULT_NAME, slots: int = DEFAULT_SLOTS, slot_size: int = DEFAULT_SLOT_SIZE):
+        self.slots = int(slots)
+        self.slot_size = int(slot_size)
+        self._stride = _SLOT_HEADER.size + self.slot_size
+        size = _HEADER.size + self.slots * self._stride
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            pid = _owner(name)
+            if pid is not None:
+                raise FileExistsError(f"chat ring {name!r} is in use by pid {pid}") from None
+            # left behind by a crashed writer; take it over
+            logger.warning("chat ring: reclaiming stale block %s", name)
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self.shm.name
+        _owned.add(self.name)
+        self.buf = self.shm.buf
+        self.buf[:size] = bytes(size)
+        _HEADER.pack_into(self.buf, 0, MAGIC, self.slots, self.slot_size, os.getpid(), 0)
+        self.seq = 0
+        self.dropped = 0
+
+    def publish(self, record: dict) -> int:
+        """Write one record; returns its sequence number, or 0 if it does not fit into a slot."""
+        data = _encode(record, self.slot_size)
+        if data is None:
+            self.dropped += 1
+            logger.debug("chat ring: record too large for slot, dropped")
+            return 0
+        seq = self.seq + 1
+        self._write_slot(seq, data, 0)
+        _SEQ.pack_into(self.buf, _HEAD_OFFSET, seq)
+        self.seq = seq
+        return seq
+
+    def _write_slot(self, seq: int, data: bytes, version: int):
+        off = _HEADER.size + ((seq - 1) % self.slots) * self._stride
+        _SEQ.pack_into(self.buf, off, 0)
+        start = off + _SLOT_HEADER.size
+        self.buf[start:start + len(data)] = data
+        _SLOT_HEADER.pack_into(self.buf, off, seq, len(data), version)
+
+    def redact(self, seq: int) -> bool:
+        """Blank a published message in place if its slot has not been reused yet."""
+        if self.buf is None:
+            return False
+        off = _HEADER.size + ((seq - 1) % self.slots) * self._stride
+        slot_seq, length, version = _SLOT_HEADER.unpack_from(self.buf, off)
+        if slot_seq != seq:
+            return False
+        start = off + _SLOT_HEADER.size
+        record = json.loads(bytes(self.buf[start:start + length]))
+        record.update(content="", segments=[], tags={}, deleted=True)
+        self._write_slot(seq, _encode(record, self.slot_size), (version + 1) & 0xFFFFFFFF)
+        return True
+
+    def close(self):
+        self.buf = None
+        _owned.discard(self.name)
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ChatRingReader:
+    """Lock-free reader. Call `read()` repeatedly; `gaps` counts missed records."""
+
+    def __init__(self, name: str = DEFAULT_NAME, from_start: bool = False):
+        self.shm = shared_memory.SharedMemory(name=name)
+        if name not in _owned:
+            _untrack(self.shm)
+        self.buf = self.shm.buf
+        magic, self.slots, self.slot_size, _, head = _HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"shared memory block {name!r} is not a chat ring")
+        self._stride = _SLOT_HEADER.size + self.slot_size
+        self.next_seq = max(1, head - self.slots + 1) if from_start else head + 1
+        self.gaps = 0
+
+    def head(self) -> int:
+        return _SEQ.unpack_from(self.buf, _HEAD_OFFSET)[0]
+
+    def read(self, max_items: int = None) -> list:
+        """Return all records published since the previous call."""
+        out = []
+        head = self.head()
+        while self.next_seq <= head and (max_items is None or len(out) < max_items):
+            oldest = head - self.slots + 1
+            if self.next_seq < oldest:
+                self.gaps += oldest - self.next_seq
+                self.next_seq = oldest
+            seq = self.next_seq
+            off = _HEADER.size + ((seq - 1) % self.slots) * self._stride
+            slot_seq, length, version = _SLOT_HEADER.unpack_from(self.buf, off)
+            if slot_seq != seq:
+                if slot_seq == 0 or slot_seq > seq:
+                    # being rewritten or already overwritten by a newer lap
+                    self.gaps += 1
+                    self.next_seq += 1
+                    head = self.head()
+                    continue
+                break
+            start = off + _SLOT_HEADER.size
+            data = bytes(self.buf[start:start + min(length, self.slot_size)])
+            if _SLOT_HEADER.unpack_from(self.buf, off)[::2] != (seq, version):
+                self.gaps += 1
+                self.next_seq += 1
+                continue
+            self.next_seq += 1
+            try:
+                out.append(json.loads(data))
+            except ValueError:
+                self.gaps += 1
+        return out
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+
+def _untrack(shm):
+    """Readers must not unlink the writer's block when they exit (bpo-39959)."""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
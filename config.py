@@ -1,12 +1,33 @@
+import asyncio
+import logging
 import os
-from dotenv import load_dotenv
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Pattern, Tuple
+
+from dotenv import dotenv_values, load_dotenv
 import yaml
 
+# variables set by the real process environment win over .env, as with load_dotenv()
+_PROCESS_ENV_KEYS = frozenset(os.environ)
+
 load_dotenv()  # load variables from .env if present
 
+# what load_dotenv() added: a startup snapshot of .env, not part of the process environment
+_DOTENV_KEYS = frozenset(os.environ) - _PROCESS_ENV_KEYS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.yaml")
+DEFAULT_ENV_PATH = os.path.join(os.path.dirname(__file__), ".env")
+
+_TRUE = ("1", "true", "yes", "on")
+_LOG_LEVELS = ("CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG")
 
-def load_config(path=None):
-    path = path or os.path.join(os.path.dirname(__file__), "config.yaml")
+
+def load_config(path=None, environ=None):
+    path = path or DEFAULT_CONFIG_PATH
+    environ = os.environ if environ is None else environ
     config = {}
     if os.path.exists(path):
         with open(path, "r", encoding="utf-8") as f:
@@ -22,7 +43,7 @@ def load_config(path=None):
     }
 
     for env_key, path_tuple in env_map.items():
-        val = os.getenv(env_key)
+        val = environ.get(env_key)
         if val is None:
             continue
         # ensure nested dicts exist
@@ -32,3 +53,185 @@ def load_config(path=None):
         d[path_tuple[-1]] = val
 
     return config
+
+
+def read_environ(env_path=None) -> dict:
+    """Process environment merged with the current contents of `.env`.
+
+    Unlike `os.environ`, this re-reads `.env`, so edits to it show up on reload,
+    including keys deleted from it since startup.
+    """
+    env = {key: val for key, val in os.environ.items() if key not in _DOTENV_KEYS}
+    for key, val in dotenv_values(env_path or DEFAULT_ENV_PATH).items():
+        if val is not None and key not in _PROCESS_ENV_KEYS:
+            env[key] = val
+    return env
+
+
+def parse_flag(value, default: bool) -> bool:
+    """Boolean from a config or env value (`1/true/yes/on`); `default` when unset."""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in _TRUE
+
+
+def _int(value, default, name, minimum=0):
+    if value is None or value == "":
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+    if value < minimum:
+        raise ValueError(f"{name} must be >= {minimum}, got {value}")
+    return value
+
+
+@dataclass(frozen=True)
+class ChatFilters:
+    ignore_authors: frozenset = frozenset()
+    ignore_patterns: Tuple[Pattern, ...] = ()
+
+    def accepts(self, author: str, content: str) -> bool:
+        if author and author.lower() in self.ignore_authors:
+            return False
+        return not any(p.search(content or "") for p in self.ignore_patterns)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Validated, immutable configuration snapshot (config.yaml + environment).
+
+    Build it once with `Settings.from_config()`; hot paths read plain attributes.
+    `raw` keeps the merged config dict for subsystems that take dict sections.
+    """
+    log_level: str = "INFO"
+    echo_messages: bool = True
+    irc_token: Optional[str] = None
+    bot_username: Optional[str] = None
+    streamer_login: Optional[str] = None
+    channels: Tuple[str, ...] = ()
+    client_id: Optional[str] = None
+    client_secret: Optional[str] = None
+    refresh_token: Optional[str] = None
+    expires_at: Optional[int] = None
+    retry_base: int = 5
+    retry_max: int = 300
+    retry_max_attempts: Optional[int] = None
+    restart_on_refresh: bool = False
+    filters: ChatFilters = field(default_factory=ChatFilters)
+    raw: dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_config(cls, config: dict, environ=None) -> "Settings":
+        environ = os.environ if environ is None else environ
+        chat = config.get("chat") or {}
+        twitch = chat.get("twitch") or {}
+
+        log_level = str(environ.get("LOG_LEVEL") or config.get("log_level") or "INFO").upper()
+        if log_level not in _LOG_LEVELS:
+            raise ValueError(f"log level must be one of {_LOG_LEVELS}, got {log_level!r}")
+
+        streamer = twitch.get("streamer_login") or environ.get("TWITCH_STREAMER_LOGIN")
+        channels = [c.lstrip("#").lower() for c in (twitch.get("channels") or []) if c]
+        if streamer and streamer.lower() not in channels:
+            channels.insert(0, streamer.lower())
+
+        expires_at = twitch.get("expires_at") or environ.get("TWITCH_TOKEN_EXPIRES_AT")
+        try:
+            expires_at = int(expires_at) if expires_at else None
+        except (TypeError, ValueError):
+            expires_at = None
+
+        retry_max_attempts = environ.get("TWITCH_RETRY_MAX_ATTEMPTS")
+        filters_cfg = chat.get("filters") or {}
+        try:
+            patterns = tuple(re.compile(p, re.IGNORECASE) for p in filters_cfg.get("ignore_patterns") or [])
+        except re.error as exc:
+            raise ValueError(f"invalid chat.filters.ignore_patterns entry: {exc}")
+
+        return cls(
+            log_level=log_level,
+            echo_messages=parse_flag(environ.get("TWITCH_ECHO_MESSAGES", chat.get("echo_messages")), True),
+            irc_token=twitch.get("irc_token") or environ.get("TWITCH_IRC_TOKEN"),
+            bot_username=twitch.get("bot_username") or environ.get("TWITCH_BOT_USERNAME"),
+            streamer_login=streamer,
+            channels=tuple(channels),
+            client_id=twitch.get("client_id") or environ.get("TWITCH_CLIENT_ID"),
+            client_secret=twitch.get("client_secret") or environ.get("TWITCH_CLIENT_SECRET"),
+            refresh_token=twitch.get("refresh_token") or environ.get("TWITCH_REFRESH_TOKEN"),
+            expires_at=expires_at,
+            retry_base=_int(environ.get("TWITCH_RETRY_BASE"), 5, "TWITCH_RETRY_BASE", 1),
+            retry_max=_int(environ.get("TWITCH_RETRY_MAX"), 300, "TWITCH_RETRY_MAX", 1),
+            # 0 (or unset) = retry forever
+            retry_max_attempts=(_int(retry_max_attempts, None, "TWITCH_RETRY_MAX_ATTEMPTS") or None) if retry_max_attempts and retry_max_attempts.isdigit() else None,
+            restart_on_refresh=parse_flag(environ.get("TWITCH_RESTART_ON_REFRESH"), False),
+            filters=ChatFilters(
+                ignore_authors=frozenset(a.lower() for a in filters_cfg.get("ignore_authors") or []),
+                ignore_patterns=patterns,
+            ),
+            raw=config,
+        )
+
+
+def load_settings(path=None, env_path=None) -> Settings:
+    environ = read_environ(env_path)
+    return Settings.from_config(load_config(path, environ), environ)
+
+
+class ConfigWatcher:
+    """Poll config.yaml and .env, swap in a new Settings snapshot on change.
+
+    Subscribers are called as `callback(new, old)` after the swap. A file that
+    fails to parse or validate is logged and the previous snapshot stays active.
+    """
+
+    def __init__(self, path=None, env_path=None, interval: float = 1.0, settings: Settings = None):
+        self.path = path or DEFAULT_CONFIG_PATH
+        self.env_path = env_path or DEFAULT_ENV_PATH
+        self.interval = interval
+        self._stamp = self._stat()
+        self.current = settings or load_settings(self.path, self.env_path)
+        self._subscribers = []
+
+    def subscribe(self, callback: Callable[[Settings, Settings], None]):
+        self._subscribers.append(callback)
+
+    def _stat(self):
+        stamp = []
+        for p in (self.path, self.env_path):
+            try:
+                st = os.stat(p)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def check(self) -> bool:
+        """Reload if either file changed; returns True when a new snapshot was applied."""
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            new = load_settings(self.path, self.env_path)
+        except Exception as exc:
+            logger.error("Config reload failed, keeping previous settings: %s", exc)
+            return False
+        if new == self.current:
+            return False
+        old, self.current = self.current, new
+        logger.info("Config reloaded")
+        for cb in list(self._subscribers):
+            try:
+                cb(new, old)
+            except Exception:
+                logger.exception("Config subscriber %r failed", cb)
+        return True
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.check()
@@ -0,0 +1,91 @@
+"""Rate-adaptive console echo of chat messages.
+
+`ConsoleRenderer` is a chat sink: receiving a record only appends it to a
+bounded buffer. `run()` flushes the buffer at a fixed frame rate with a single
+write done in a worker thread, so a slow terminal or a blocked pipe can never
+stall the IRC reader. Above `max_rate` messages per second a channel is shown
+as "+N messages in #chan" instead of line by line. Filters are the same as
+`show_chat.py --channel/--author`.
+"""
+
+import asyncio
+import logging
+import sys
+from collections import Counter, deque
+
+from logfiles import match
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"fps": 10, "max_rate": 20.0, "buffer": 5000, "channel": None, "author": None}
+RATE_WINDOW = 1.0  # seconds of frames the per-channel rate is measured over
+
+
+class ConsoleRenderer:
+    def __init__(self, cfg: dict = None, stream=None):
+        self.cfg = dict(DEFAULTS, **(cfg or {}))
+        self.stream = stream
+        self.interval = 1.0 / max(1.0, float(self.cfg["fps"]))
+        self.max_rate = float(self.cfg["max_rate"])
+        self.filters = {"channel": self.cfg["channel"], "author": self.cfg["author"]}
+        self._buffer = deque(maxlen=int(self.cfg["buffer"]))
+        self._frames = deque()  # (time, per-channel counts) of the last RATE_WINDOW
+        self.overflow = Counter()  # per channel, records pushed out of a full buffer
+        self.written = 0
+        self.summarized = 0
+
+    def __call__(self, record: dict):
+        if not match(record, self.filters):
+            return
+        if len(self._buffer) == self._buffer.maxlen:
+            self.overflow[self._buffer[0].get("channel", "?")] += 1
+        self._buffer.append(record)
+
+    def _rates(self, per_channel: Counter, now: float) -> Counter:
+        self._frames.append((now, per_channel))
+        while self._frames[0][0] <= now - RATE_WINDOW:
+            self._frames.popleft()
+        total = Counter()
+        for _, counts in self._frames:
+            total.update(counts)
+        return total
+
+    def render(self, records: list, now: float) -> str:
+        """Text for one frame: full lines, or one summary line per too-busy channel."""
+        per_channel = Counter(r.get("channel", "?") for r in records)
+        rates = self._rates(per_channel, now)
+        busy = {c for c in per_channel if rates[c] / RATE_WINDOW > self.max_rate}
+        lines = []
+        for rec in records:
+            channel = rec.get("channel", "?")
+            if channel not in busy:
+                suffix = f" (+{rec['collapsed']} similar)" if rec.get("collapsed") else ""
+                lines.append(f"[{channel}] {rec.get('author') or rec.get('type') or '?'}: {rec.get('content', '')}{suffix}")
+        for channel in sorted(busy | set(self.overflow)):
+            count = (per_channel[channel] if channel in busy else 0) + self.overflow[channel]
+            lines.append(f"+{count} messages in #{channel}")
+            self.summarized += count
+        self.overflow.clear()
+        self.written += len(records) - sum(per_channel[c] for c in busy)
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def take(self) -> list:
+        records = list(self._buffer)
+        self._buffer.clear()
+        return records
+
+    def _write(self, text: str):
+        stream = self.stream or sys.stdout
+        stream.write(text)
+        stream.flush()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._buffer and not self.overflow:
+                continue
+            text = self.render(self.take(), loop.time())
+            if text:
+                # blocking write off the loop; the next frame waits for it to finish
+                await asyncio.to_thread(self._write, text)
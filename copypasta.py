@@ -0,0 +1,173 @@
+"""Copypasta flood collapsing.
+
+During spam waves hundreds of accounts post slight variations of the same
+text. `CopypastaFilter.admit()` runs before a message is normalized, logged or
+handed to any sink: it fingerprints the message with a one-permutation MinHash
+over its word shingles (one CRC per word, so it stays cheap in pure Python) and
+looks for a near neighbour in a per-channel sliding-window index with banded
+(LSH) buckets, so the cost per message does not depend on how many messages
+are in the window.
+
+The first `threshold` members of a cluster pass through untouched; later ones
+are dropped and only counted. `flush()` turns the counts into summaries
+(representative text, how many were collapsed, by how many authors, how many
+of them were first-time chatters), which `ChatAggregator` emits as one
+`chat.copypasta` record: no author is credited and analytics count it
+without adding a chatter.
+"""
+
+import logging
+import time
+import zlib
+from collections import OrderedDict
+
+from analytics import normalize_phrase
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "enabled": False,
+    "window": 30.0,         # seconds a cluster stays alive without new members
+    "threshold": 5,         # members shown before the rest are collapsed
+    "similarity": 0.5,      # estimated Jaccard similarity to join a cluster
+    "min_words": 4,         # shorter messages (emote spam, "LUL") are never collapsed
+    "bands": 16,
+    "rows": 2,              # bands * rows MinHash slots per message
+    "max_clusters": 2000,   # per channel; least recently active dropped first
+    "flush_interval": 2.0,  # seconds between summary records
+}
+
+_EMPTY = -1  # signature slot no feature hashed into
+
+
+def shingles(words: list) -> set:
+    """Word unigrams and bigrams."""
+    features = set(words)
+    features.update(a + " " + b for a, b in zip(words, words[1:]))
+    return features
+
+
+class _Cluster:
+    __slots__ = ("signature", "keys", "content", "members", "pending", "authors", "first_seen", "last_seen")
+
+    def __init__(self, signature, keys, content, now):
+        self.signature = signature
+        self.keys = keys
+        self.content = content
+        self.members = 0
+        self.pending = 0       # collapsed since the last flush
+        self.authors = set()   # authors of the pending members, reset at every flush
+        self.first_seen = 0    # first-time chatters among them
+        self.last_seen = now
+
+
+class _ChannelIndex:
+    def __init__(self):
+        self.clusters = OrderedDict()  # id(cluster) -> cluster, least recently active first
+        self.buckets = {}              # band key -> cluster
+
+
+class CopypastaFilter:
+    def __init__(self, cfg: dict = None, clock=time.monotonic):
+        self.cfg = dict(DEFAULTS, **(cfg or {}))
+        self.window = float(self.cfg["window"])
+        self.threshold = int(self.cfg["threshold"])
+        self.similarity = float(self.cfg["similarity"])
+        self.min_words = int(self.cfg["min_words"])
+        self.bands = int(self.cfg["bands"])
+        self.rows = int(self.cfg["rows"])
+        self.max_clusters = int(self.cfg["max_clusters"])
+        self._slots = self.bands * self.rows
+        self._clock = clock
+        self._channels = {}
+        self.collapsed = 0
+
+    def signature(self, features: set) -> tuple:
+        """One-permutation MinHash: each feature hashes into one of the slots, the slot keeps its minimum."""
+        k = self._slots
+        sig = [_EMPTY] * k
+        for f in features:
+            h = (zlib.crc32(f.encode("utf-8")) * 0x9E3779B1) & 0xFFFFFFFF
+            slot, value = h % k, h // k
+            if sig[slot] == _EMPTY or value < sig[slot]:
+                sig[slot] = value
+        return tuple(sig)
+
+    def _keys(self, signature: tuple) -> list:
+        r = self.rows
+        bands = ((i, signature[i * r:(i + 1) * r]) for i in range(self.bands))
+        # a band of empty slots only says both messages are short
+        return [key for key in bands if any(v != _EMPTY for v in key[1])]
+
+    def _similar(self, a: tuple, b: tuple) -> bool:
+        same = either = 0
+        for x, y in zip(a, b):
+            if x != _EMPTY or y != _EMPTY:
+                either += 1
+                same += x == y
+        return same >= self.similarity * either
+
+    def _drop(self, index: _ChannelIndex, cluster: _Cluster):
+        index.clusters.pop(id(cluster), None)
+        for key in cluster.keys:
+            if index.buckets.get(key) is cluster:
+                del index.buckets[key]
+
+    def admit(self, channel: str, content: str, author: str = None, first_seen: bool = False) -> bool:
+        """False if the message belongs to a flood and should be collapsed.
+
+        `first_seen` marks the author's first message in the channel, counted in the summary.
+        """
+        words = normalize_phrase(content).split()
+        if len(words) < self.min_words:
+            return True
+        features = shingles(words)
+        now = self._clock()
+        index = self._channels.get(channel)
+        if index is None:
+            index = self._channels[channel] = _ChannelIndex()
+        sig = self.signature(features)
+        keys = self._keys(sig)
+        cluster = None
+        for key in keys:
+            candidate = index.buckets.get(key)
+            if candidate is not None and now - candidate.last_seen <= self.window and self._similar(sig, candidate.signature):
+                cluster = candidate
+                break
+        if cluster is None:
+            cluster = _Cluster(sig, keys, content, now)
+            index.clusters[id(cluster)] = cluster
+            for key in keys:
+                index.buckets[key] = cluster
+            while len(index.clusters) > self.max_clusters:
+                self._drop(index, next(iter(index.clusters.values())))
+        else:
+            index.clusters.move_to_end(id(cluster))
+        cluster.last_seen = now
+        cluster.members += 1
+        if cluster.members <= self.threshold:
+            return True
+        cluster.pending += 1
+        if author:
+            cluster.authors.add(author)
+        if first_seen:
+            cluster.first_seen += 1
+        self.collapsed += 1
+        return False
+
+    def flush(self) -> list:
+        """Summaries of the messages collapsed since the last call; expires idle clusters."""
+        now = self._clock()
+        summaries = []
+        for channel, index in list(self._channels.items()):
+            for cluster in list(index.clusters.values()):
+                if cluster.pending:
+                    summaries.append({"channel": channel, "content": cluster.content, "collapsed": cluster.pending,
+                                      "authors": len(cluster.authors), "first_seen": cluster.first_seen})
+                    cluster.pending = cluster.first_seen = 0
+                    cluster.authors = set()
+                if now - cluster.last_seen > self.window:
+                    self._drop(index, cluster)
+            if not index.clusters:
+                del self._channels[channel]
+        return summaries
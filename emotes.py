@@ -0,0 +1,189 @@
+"""Emote tokenization for chat messages.
+
+Every chat record carries `segments`: the message split into text and emote
+pieces, so overlays and analytics never re-tokenize or re-resolve emotes.
+Twitch emotes come from the `emotes` IRC tag (`id:start-end,start-end/id:...`),
+decoded in one pass. Twitch counts those offsets in Unicode code points (what a
+Python str indexes by); relays written in JavaScript count UTF-16 code units,
+which differ as soon as the message holds an emoji outside the BMP, so both are
+supported. Third-party and channel emotes (BTTV/FFZ/7TV...) never appear in the
+tag; they are matched per whitespace-separated token against `EmoteIndex`, a
+size-bounded hash index built from a local JSON manifest.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+TEXT = "text"
+EMOTE = "emote"
+CODEPOINT = "codepoint"
+UTF16 = "utf16"
+
+_WORDS = re.compile(r"(\s+)")
+
+
+def parse_emotes_tag(tag: str) -> list:
+    """`25:0-4,12-16/1902:6-10` -> [(0, 4, "25"), (12, 16, "25"), (6, 10, "1902")] (inclusive ends)."""
+    spans = []
+    if not tag or not isinstance(tag, str):
+        return spans
+    for group in tag.split("/"):
+        emote_id, _, ranges = group.partition(":")
+        for rng in ranges.split(","):
+            start, _, end = rng.partition("-")
+            if start.isdigit() and end.isdigit():
+                spans.append((int(start), int(end), emote_id))
+    return spans
+
+
+def _utf16_index(content: str) -> list:
+    """Map each UTF-16 code unit offset to its code point index."""
+    table = []
+    for i, ch in enumerate(content):
+        table.append(i)
+        if ord(ch) > 0xFFFF:
+            table.append(i)  # second half of the surrogate pair
+    table.append(len(content))
+    return table
+
+
+def emote_spans(content: str, tag: str, offsets: str = CODEPOINT) -> list:
+    """Sorted, non-overlapping (start, end_exclusive, id) spans in str indices."""
+    raw = parse_emotes_tag(tag)
+    if not raw:
+        return []
+    table = _utf16_index(content) if offsets == UTF16 and any(ord(c) > 0xFFFF for c in content) else None
+    spans = []
+    for start, end, emote_id in raw:
+        if table is not None:
+            if end + 1 >= len(table):
+                continue
+            start, end = table[start], table[end + 1]
+        else:
+            end += 1
+        if 0 <= start < end <= len(content):
+            spans.append((start, end, emote_id))
+    spans.sort()
+    result = []
+    for span in spans:
+        if not result or span[0] >= result[-1][1]:
+            result.append(span)
+    return result
+
+
+class EmoteIndex:
+    """Bounded name -> emote lookup for emotes the IRC tags do not describe.
+
+    Manifest format::
+
+        {"global": {"KEKW": {"id": "5e9c6c187e090362f8b0b9e8", "source": "bttv"}},
+         "channels": {"my_channel": {"catJAM": {"id": "60ae...", "source": "7tv"}}}}
+
+    A bare string value is taken as the emote id. Entries beyond `max_entries`
+    are evicted least-recently-matched first.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (channel or "", name) -> info
+        self._stamp = None
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, name: str, info, channel: str = None):
+        if isinstance(info, str):
+            info = {"id": info}
+        key = ((channel or "").lower(), name)
+        self._entries[key] = dict(info, name=name)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, token: str, channel: str = None):
+        for key in (((channel or "").lower(), token), ("", token)):
+            info = self._entries.get(key)
+            if info is not None:
+                self._entries.move_to_end(key)
+                return info
+        return None
+
+    def load(self, path: str = None):
+        """(Re)build the index from the JSON manifest; a broken file keeps the old index."""
+        path = path or self.path
+        try:
+            stamp = os.stat(path).st_mtime_ns
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as exc:
+            logger.error("Failed to load emote manifest %s: %s", path, exc)
+            return False
+        old, self._entries = self._entries, OrderedDict()
+        try:
+            for name, info in (manifest.get("global") or {}).items():
+                self.add(name, info)
+            for channel, emotes in (manifest.get("channels") or {}).items():
+                for name, info in (emotes or {}).items():
+                    self.add(name, info, channel)
+        except (AttributeError, TypeError) as exc:
+            logger.error("Malformed emote manifest %s: %s", path, exc)
+            self._entries = old
+            return False
+        self.path, self._stamp = path, stamp
+        logger.info("Emote index loaded: %d entries from %s", len(self._entries), path)
+        return True
+
+    def changed(self) -> bool:
+        try:
+            return os.stat(self.path).st_mtime_ns != self._stamp
+        except OSError:
+            return False
+
+    async def run(self, interval: float = 30.0):
+        """Reload the manifest whenever it changes on disk."""
+        while True:
+            await asyncio.sleep(interval)
+            if self.path and self.changed():
+                self.load()
+
+
+def tokenize(content: str, tag: str = None, index: EmoteIndex = None, channel: str = None,
+             offsets: str = CODEPOINT) -> list:
+    """Split a message into text/emote segments (adjacent text is merged)."""
+    segments = []
+
+    def text(piece):
+        if not piece:
+            return
+        if segments and segments[-1]["type"] == TEXT:
+            segments[-1]["text"] += piece
+        else:
+            segments.append({"type": TEXT, "text": piece})
+
+    def plain(piece):
+        if index is None or not len(index):
+            text(piece)
+            return
+        for token in _WORDS.split(piece):
+            info = index.lookup(token, channel) if token and not token.isspace() else None
+            if info is None:
+                text(token)
+            else:
+                segments.append({"type": EMOTE, "name": token, "id": info.get("id"), "source": info.get("source", "third-party")})
+
+    pos = 0
+    for start, end, emote_id in emote_spans(content or "", tag, offsets):
+        plain(content[pos:start])
+        segments.append({"type": EMOTE, "name": content[start:end], "id": emote_id, "source": "twitch"})
+        pos = end
+    plain((content or "")[pos:])
+    return segments
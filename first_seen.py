@@ -0,0 +1,199 @@
+"""First-time chatter detection with persistent Bloom filters.
+
+Each channel has a scalable Bloom filter keyed on the Twitch `user-id` tag:
+a list of slices, each a memory-mapped file under `path`. A new slice is
+opened when the current one reaches its capacity; it is `growth` times larger
+and has a tighter error rate (`tightening`), so the total false-positive rate
+stays under `error_rate` however many chatters arrive.
+
+Opening a channel only maps its files, so startup does not read anything.
+Bits are set directly in the mapping; `sync()` (run periodically) flushes the
+slices written since the last sync. A false positive means a genuinely new
+chatter is not highlighted; a first-time chatter is never reported twice.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "enabled": False,
+    "path": os.path.join(os.path.dirname(__file__), "data", "first_seen"),
+    "capacity": 10000,      # chatters in the first slice of each channel
+    "error_rate": 0.001,    # overall false-positive rate
+    "growth": 2,            # capacity multiplier of each new slice
+    "tightening": 0.8,      # error-rate multiplier of each new slice
+    "sync_interval": 30.0,  # seconds between flushes of written slices to disk
+}
+
+MAGIC = 0x4F4D4246  # "OMBF"
+# magic, hash count, bits, capacity, count, error rate
+_HEADER = struct.Struct("<IIQQQd")
+_COUNT_OFFSET = 24
+
+
+def _hashes(key: str):
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    h1, h2 = struct.unpack("<QQ", digest)
+    return h1, h2 | 1
+
+
+class BloomSlice:
+    """One fixed-size Bloom filter living in a memory-mapped file."""
+
+    def __init__(self, path: str, capacity: int = None, error_rate: float = None):
+        self.path = path
+        if not os.path.exists(path):
+            self._create(path, capacity, error_rate)
+        self._file = open(path, "r+b")
+        self.mm = mmap.mmap(self._file.fileno(), 0)
+        magic, self.k, self.bits, self.capacity, _, self.error_rate = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or len(self.mm) < _HEADER.size + (self.bits + 7) // 8:
+            self.close()
+            raise ValueError(f"not a bloom filter slice: {path}")
+
+    @staticmethod
+    def _create(path, capacity, error_rate):
+        bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        k = max(1, math.ceil(-math.log2(error_rate)))
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, k, bits, capacity, 0, error_rate))
+            f.truncate(_HEADER.size + (bits + 7) // 8)  # sparse: zero pages cost nothing on disk
+        os.replace(tmp, path)
+
+    @property
+    def count(self) -> int:
+        return struct.unpack_from("<Q", self.mm, _COUNT_OFFSET)[0]
+
+    def _positions(self, h1: int, h2: int):
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.k)]
+
+    def contains(self, h1: int, h2: int) -> bool:
+        mm, base = self.mm, _HEADER.size
+        return all(mm[base + (p >> 3)] & (1 << (p & 7)) for p in self._positions(h1, h2))
+
+    def add(self, h1: int, h2: int):
+        mm, base = self.mm, _HEADER.size
+        for p in self._positions(h1, h2):
+            mm[base + (p >> 3)] |= 1 << (p & 7)
+        struct.pack_into("<Q", mm, _COUNT_OFFSET, self.count + 1)
+
+    def flush(self):
+        self.mm.flush()
+
+    def close(self):
+        if not self.mm.closed:
+            self.mm.close()
+        self._file.close()
+
+
+class ScalableBloomFilter:
+    """Growing chain of `BloomSlice` files named `<prefix>.<n>.bloom`."""
+
+    def __init__(self, prefix: str, capacity: int = 10000, error_rate: float = 0.001,
+                 growth: float = 2, tightening: float = 0.8):
+        self.prefix = prefix
+        self.capacity = int(capacity)
+        # slice i gets error_rate * (1 - r) * r**i, which sums to at most error_rate
+        self.first_error = float(error_rate) * (1 - tightening)
+        self.growth = growth
+        self.tightening = tightening
+        self.slices = []
+        self.dirty = set()
+        n = 0
+        while os.path.exists(self._path(n)):
+            self.slices.append(BloomSlice(self._path(n)))
+            n += 1
+
+    def _path(self, n: int) -> str:
+        return f"{self.prefix}.{n}.bloom"
+
+    def _grow(self) -> BloomSlice:
+        n = len(self.slices)
+        s = BloomSlice(self._path(n), int(self.capacity * self.growth ** n), self.first_error * self.tightening ** n)
+        self.slices.append(s)
+        return s
+
+    def __contains__(self, key: str) -> bool:
+        h1, h2 = _hashes(key)
+        return any(s.contains(h1, h2) for s in self.slices)
+
+    def add(self, key: str) -> bool:
+        """Add `key`; True if it was not in the filter before."""
+        h1, h2 = _hashes(key)
+        if any(s.contains(h1, h2) for s in self.slices):
+            return False
+        active = self.slices[-1] if self.slices else None
+        if active is None or active.count >= active.capacity:
+            active = self._grow()
+        active.add(h1, h2)
+        self.dirty.add(active)
+        return True
+
+    def __len__(self):
+        return sum(s.count for s in self.slices)
+
+    def sync(self):
+        # swap first: sync may run in a thread while the loop keeps adding
+        dirty, self.dirty = self.dirty, set()
+        for s in dirty:
+            s.flush()
+
+    def close(self):
+        self.sync()
+        for s in self.slices:
+            s.close()
+        self.slices = []
+
+
+_UNSAFE = re.compile(r"[^\w-]")
+
+
+class FirstSeen:
+    """Per-channel first-time chatter flags, opened lazily per channel."""
+
+    def __init__(self, cfg: dict = None):
+        self.cfg = dict(DEFAULTS, **(cfg or {}))
+        self.path = self.cfg["path"]
+        os.makedirs(self.path, exist_ok=True)
+        self._filters = {}
+
+    def _filter(self, channel: str) -> ScalableBloomFilter:
+        f = self._filters.get(channel)
+        if f is None:
+            cfg = self.cfg
+            f = self._filters[channel] = ScalableBloomFilter(
+                os.path.join(self.path, _UNSAFE.sub("_", channel or "_")), cfg["capacity"],
+                cfg["error_rate"], cfg["growth"], cfg["tightening"])
+        return f
+
+    def check(self, channel: str, user_id) -> bool:
+        """True the first time `user_id` chats in `channel` (and records it)."""
+        if not user_id:
+            return False
+        return self._filter(channel).add(str(user_id))
+
+    def sync(self):
+        for f in list(self._filters.values()):
+            f.sync()
+
+    def close(self):
+        for f in self._filters.values():
+            f.close()
+        self._filters.clear()
+
+    async def run(self):
+        """Flush written slices to disk every `sync_interval` seconds."""
+        interval = float(self.cfg["sync_interval"])
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.sync)
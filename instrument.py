@@ -0,0 +1,93 @@
+"""Debug instrumentation gates for the chat hot path.
+
+Building a debug payload (a `repr`, a `dir()` walk, a 400-char preview) costs
+the same whether or not the line is ever written. Hot paths therefore ask a
+per-subsystem `DebugGate` first; the gate is a plain attribute read, decided
+once per config snapshot by `configure(settings)` rather than per call.
+
+    debug:
+      twitchio: false         # off even when log_level is DEBUG
+      irc: {sample: 100}      # 1 in 100 raw lines
+      records: true           # on even at INFO (lines are logged at INFO)
+
+A subsystem left out follows `log_level`: on at DEBUG, off otherwise. A bare
+number is a sampling rate. Forcing a subsystem on at a higher log level writes
+its lines at INFO, so one noisy subsystem can be diagnosed in production
+without turning on DEBUG everywhere.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUBSYSTEMS = ("twitchio", "irc", "records")
+
+
+class DebugGate:
+    __slots__ = ("name", "enabled", "every", "level", "_count")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.enabled = False
+        self.every = 1
+        self.level = logging.DEBUG
+        self._count = 0
+
+    def sample(self) -> bool:
+        """True when this call should build and log its payload."""
+        if not self.enabled:
+            return False
+        if self.every <= 1:
+            return True
+        self._count += 1
+        return self._count % self.every == 0
+
+    def log(self, log: logging.Logger, msg: str, *args, **kwargs):
+        log.log(self.level, msg, *args, **kwargs)
+
+
+_gates = {name: DebugGate(name) for name in SUBSYSTEMS}
+
+
+def gate(name: str) -> DebugGate:
+    """The gate for `name`; the same object across reconfigurations, so it can be cached."""
+    g = _gates.get(name)
+    if g is None:
+        g = _gates[name] = DebugGate(name)
+    return g
+
+
+def _parse(value):
+    """(enabled or None to follow log_level, sample rate) from a `debug.<name>` value."""
+    if value is None or isinstance(value, bool):
+        return value, 1
+    if isinstance(value, int):
+        return value > 0, max(1, value)
+    if isinstance(value, dict):
+        enabled = value.get("enabled", True)
+        return (None if enabled is None else bool(enabled)), max(1, int(value.get("sample") or 1))
+    raise ValueError(f"expected true/false, a sample rate or {{enabled, sample}}, got {value!r}")
+
+
+def configure(settings):
+    """Recompute every gate from a Settings snapshot (`log_level` and the `debug` section)."""
+    global_debug = settings.log_level == "DEBUG"
+    section = settings.raw.get("debug") or {}
+    if not isinstance(section, dict):
+        logger.error("debug: expected a mapping, got %r; using log_level only", section)
+        section = {}
+    for name in set(_gates) | set(section):
+        g = gate(name)
+        try:
+            enabled, every = _parse(section.get(name))
+        except (TypeError, ValueError) as exc:
+            logger.error("debug.%s: %s; using log_level only", name, exc)
+            enabled, every = None, 1
+        g.enabled = global_debug if enabled is None else enabled
+        g.every = every
+        g.level = logging.DEBUG if global_debug else logging.INFO
+        g._count = 0
+
+
+def snapshot() -> dict:
+    return {name: {"enabled": g.enabled, "sample": g.every} for name, g in sorted(_gates.items())}
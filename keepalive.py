@@ -0,0 +1,170 @@
+"""Client-driven IRC keepalive, RTT tracking and connection health.
+
+Twitch only PINGs about every five minutes, so a connection that silently dies
+is otherwise noticed only after the OS TCP timeout. Each IRC connection gets a
+`ConnectionHealth` that sends its own `PING :ka-<n>` every few seconds, measures
+the round-trip time from the matching PONG, keeps a bounded latency history and
+recycles the socket after `max_missed` unanswered PINGs. `HealthRegistry`
+picks the healthiest connection per channel when several carry it.
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"interval": 15.0, "timeout": 5.0, "max_missed": 2, "degraded_rtt": 1.0, "history": 60}
+TCP_DEFAULTS = {"idle": 10, "interval": 5, "count": 3}
+
+
+def set_tcp_keepalive(sock, idle: int = 10, interval: int = 5, count: int = 3):
+    """Enable TCP keepalive (and TCP_USER_TIMEOUT where available) on `sock`."""
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, int(idle))
+        elif hasattr(socket, "TCP_KEEPALIVE"):  # macOS
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, int(idle))
+        if hasattr(socket, "TCP_KEEPINTVL"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, int(interval))
+        if hasattr(socket, "TCP_KEEPCNT"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, int(count))
+        if hasattr(socket, "TCP_USER_TIMEOUT"):
+            # fail writes that stay unacknowledged instead of retransmitting for ~15 minutes
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, int((idle + interval * count) * 1000))
+        if hasattr(socket, "SIO_KEEPALIVE_VALS"):  # Windows
+            sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, int(idle) * 1000, int(interval) * 1000))
+    except OSError:
+        logger.debug("could not set TCP keepalive options", exc_info=True)
+
+
+class ConnectionHealth:
+    """Keepalive state and latency history of one IRC connection."""
+
+    def __init__(self, name: str, channels=(), cfg: dict = None):
+        cfg = dict(DEFAULTS, **(cfg or {}))
+        self.name = name
+        self.channels = set(channels)
+        self.interval = float(cfg["interval"])
+        self.timeout = float(cfg["timeout"])
+        self.max_missed = int(cfg["max_missed"])
+        self.degraded_rtt = float(cfg["degraded_rtt"])
+        self.history = deque(maxlen=int(cfg["history"]))
+        self.srtt = None
+        self.missed = 0
+        self.connected = False
+        self._seq = 0
+        self._outstanding = {}
+
+    def next_ping(self) -> bytes:
+        self._seq += 1
+        token = f"ka-{self._seq}"
+        self._outstanding[token] = time.monotonic()
+        return f"PING :{token}\r\n".encode("utf-8")
+
+    def on_pong(self, text: str) -> Optional[float]:
+        """Handle a PONG line; returns the RTT in seconds if it answers one of our PINGs."""
+        token = text.rsplit(":", 1)[-1].strip()
+        sent = self._outstanding.pop(token, None)
+        if sent is None:
+            return None
+        rtt = time.monotonic() - sent
+        # older PINGs still outstanding were lost in transit; the link is alive, so drop them
+        for old in [t for t, ts in self._outstanding.items() if ts <= sent]:
+            del self._outstanding[old]
+        self.record(rtt)
+        return rtt
+
+    def record(self, rtt: float):
+        self.history.append(rtt)
+        self.srtt = rtt if self.srtt is None else 0.8 * self.srtt + 0.2 * rtt
+        self.missed = 0
+
+    def expire(self) -> int:
+        """Count PINGs unanswered for longer than `timeout` as missed."""
+        now = time.monotonic()
+        for token in [t for t, ts in self._outstanding.items() if now - ts > self.timeout]:
+            del self._outstanding[token]
+            self.missed += 1
+        return self.missed
+
+    @property
+    def degraded(self) -> bool:
+        return not self.connected or self.missed > 0 or (self.srtt is not None and self.srtt > self.degraded_rtt)
+
+    def score(self) -> float:
+        """Lower is healthier; disconnected connections are never chosen."""
+        if not self.connected:
+            return float("inf")
+        return (self.srtt if self.srtt is not None else self.degraded_rtt) + self.missed * self.timeout
+
+    def snapshot(self) -> dict:
+        hist = sorted(self.history)
+        return {
+            "connected": self.connected,
+            "srtt": self.srtt,
+            "last_rtt": self.history[-1] if self.history else None,
+            "p95_rtt": hist[int(len(hist) * 0.95) - 1] if hist else None,
+            "missed": self.missed,
+            "degraded": self.degraded,
+        }
+
+    async def run(self, send: Callable[[bytes], None], recycle: Callable[[], None]):
+        """Send PINGs every `interval`; recycle the connection after `max_missed` misses."""
+        while True:
+            send(self.next_ping())
+            await asyncio.sleep(self.timeout)
+            if self.expire() >= self.max_missed:
+                logger.warning("[keepalive] %s missed %d PONGs, recycling connection", self.name, self.missed)
+                recycle()
+                return
+            if self.degraded:
+                logger.info("[keepalive] %s degraded (srtt=%s, missed=%d)", self.name,
+                            f"{self.srtt:.3f}s" if self.srtt is not None else "n/a", self.missed)
+            await asyncio.sleep(max(0.0, self.interval - self.timeout))
+
+
+class HealthRegistry:
+    """Choose the healthiest connection for each channel, with hysteresis."""
+
+    def __init__(self, margin: float = 0.2):
+        self.margin = margin
+        self.connections = {}
+        self._primary = {}
+
+    def register(self, health: ConnectionHealth):
+        self.connections[health.name] = health
+
+    def unregister(self, health: ConnectionHealth):
+        if self.connections.get(health.name) is health:
+            del self.connections[health.name]
+
+    def primary(self, channel: str) -> Optional[str]:
+        candidates = [h for h in self.connections.values() if channel in h.channels and h.connected]
+        if not candidates:
+            self._primary.pop(channel, None)
+            return None
+        best = min(candidates, key=lambda h: h.score())
+        current = self.connections.get(self._primary.get(channel))
+        if current is not None and current in candidates and not current.degraded:
+            # only switch away from a healthy primary for a clearly better one
+            if best.score() >= current.score() * (1 - self.margin):
+                return current.name
+        if current is not best:
+            logger.info("[keepalive] #%s now served by %s", channel, best.name)
+        self._primary[channel] = best.name
+        return best.name
+
+    def is_primary(self, name: str, channel: str) -> bool:
+        if len(self.connections) <= 1:
+            return True
+        return self.primary(channel) == name
+
+    def snapshot(self) -> dict:
+        return {name: h.snapshot() for name, h in self.connections.items()}
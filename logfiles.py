@@ -0,0 +1,48 @@
+"""Log file helpers shared by the logger, the console echo and show_chat.py.
+
+The live log is `logs/obs_multichat.log`; rotation leaves backups next to it
+as `.N` or `.YYYYmmdd-HHMMSS[-N]`, optionally gzipped. Kept apart from the CLI
+so the app modules do not import show_chat.
+"""
+
+import glob
+import gzip
+import os
+
+LOG_PATH = os.path.join(os.path.dirname(__file__), "logs", "obs_multichat.log")
+
+
+def log_files(log_path: str = LOG_PATH) -> list:
+    """Return the live log and its rotated backups, oldest first.
+
+    Backups are `log.N` (count-based rotation, higher is older) or
+    `log.YYYYmmdd-HHMMSS[-N]` (size/time rotation), either optionally `.gz`.
+    """
+    files = [f for f in glob.glob(log_path + "*") if os.path.isfile(f) and not f.endswith(".tmp")]
+
+    def age(path):
+        suffix = path[len(log_path):].lstrip(".")
+        if suffix.endswith(".gz"):
+            suffix = suffix[:-3]
+        if not suffix:
+            return (2,)
+        if suffix.isdigit():
+            return (0, -int(suffix))
+        # same-second rotations get -1, -2, ... after the timestamp
+        n = suffix[16:]
+        return (1, suffix[:15], int(n) if n.isdigit() else 0)
+
+    return sorted(files, key=age)
+
+
+def open_log(path: str):
+    """Binary line iterator over a log file, decompressing `.gz` backups on the fly."""
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def match(obj: dict, filters: dict) -> bool:
+    if filters.get("channel") and obj.get("channel") != filters["channel"]:
+        return False
+    if filters.get("author") and obj.get("author") != filters["author"]:
+        return False
+    return True
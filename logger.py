@@ -1,10 +1,169 @@
+import contextlib
+import gzip
 import logging
+import multiprocessing
 import os
+import queue
+import shutil
+import sys
+import threading
+import time
+import traceback
 from logging.handlers import RotatingFileHandler
 from pythonjsonlogger import jsonlogger
 
+from logfiles import log_files
 
-def setup_logging(level: str = "INFO", log_dir: str = None):
+# `logs` section of config.yaml
+ROTATION_DEFAULTS = {
+    "max_mb": 5,          # rotate when the live file reaches this size...
+    "rotate_hours": 24,   # ...or is this old (0 = size only)
+    "compress": True,     # gzip rotated files in a background thread
+    "keep_days": 14,      # delete backups older than this (0 = no age limit)
+    "max_total_mb": 500,  # delete oldest backups beyond this total, live file included (0 = no limit)
+}
+
+
+def _gzip(path: str):
+    """Compress `path` to `path.gz` via a per-process temp file, so neither a crash nor a
+    second process compressing the same backup can leave a torn .gz; a backup already gone is skipped."""
+    tmp = f"{path}.gz.{os.getpid()}.tmp"
+    try:
+        src = open(path, "rb")
+    except FileNotFoundError:
+        return
+    try:
+        with src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            st = os.fstat(src.fileno())
+        os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, path + ".gz")
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+def prune_backups(log_file: str, keep_days: float = 0, max_total_mb: float = 0, now: float = None) -> list:
+    """Delete rotated backups of `log_file` past the age or disk budget, oldest first; returns them."""
+    files = log_files(log_file)
+    stats = {}
+    for f in files:
+        try:
+            stats[f] = os.stat(f)
+        except FileNotFoundError:  # compressed or pruned since the listing
+            pass
+    sizes = {f: st.st_size for f, st in stats.items()}
+    removed = []
+    now = time.time() if now is None else now
+    for path in stats:
+        if path == log_file:
+            continue
+        too_old = keep_days and now - stats[path].st_mtime > keep_days * 86400
+        over_budget = max_total_mb and sum(sizes.values()) > max_total_mb * 1024 * 1024
+        if not (too_old or over_budget):
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        sizes.pop(path)
+        removed.append(path)
+    return removed
+
+
+class ChatLogHandler(RotatingFileHandler):
+    """Rotate on size or age; compress and prune backups off the logging path.
+
+    Rotation itself is one rename to a timestamped name (`obs_multichat.log.20240101-120000`),
+    so it never pauses the event loop; gzip and retention run in a single worker thread.
+    The thread and the startup jobs (compressing leftover backups, pruning) start with the
+    first record, and only in the main process: a spawned child that sets up logging again
+    (a shard worker re-importing `__main__`) leaves the backups to its parent.
+    """
+
+    def __init__(self, filename: str, rotation: dict = None, encoding: str = "utf-8"):
+        self.rotation = dict(ROTATION_DEFAULTS, **(rotation or {}))
+        super().__init__(filename, maxBytes=int(float(self.rotation["max_mb"]) * 1024 * 1024),
+                         backupCount=0, encoding=encoding)
+        self.rotate_every = float(self.rotation["rotate_hours"]) * 3600
+        self._opened_at = time.time()
+        self._jobs = queue.SimpleQueue()
+        self._worker = None
+        self._started = False
+
+    def _start(self):
+        self._started = True
+        if multiprocessing.parent_process() is not None:
+            return
+        self._worker = threading.Thread(target=self._work, name="log-compress", daemon=True)
+        self._worker.start()
+        # backups a previous run rotated but did not get to compress
+        for path in log_files(self.baseFilename):
+            if path != self.baseFilename and not path.endswith(".gz"):
+                self._jobs.put(path)
+        self._jobs.put("")  # prune once at startup
+
+    def emit(self, record):
+        if not self._started:
+            self._start()
+        super().emit(record)
+
+    def shouldRollover(self, record) -> bool:
+        if self.rotate_every and time.time() - self._opened_at >= self.rotate_every:
+            return self.stream is None or self.stream.tell() > 0
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            stamp = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}"
+            dest, n = stamp, 0
+            while os.path.exists(dest) or os.path.exists(dest + ".gz"):
+                n += 1
+                dest = f"{stamp}-{n}"
+            os.rename(self.baseFilename, dest)
+            if self._worker is not None:
+                self._jobs.put(dest)
+        self._opened_at = time.time()
+        self.stream = self._open()
+
+    def _work(self):
+        while True:
+            path = self._jobs.get()
+            if path is None:
+                return
+            if isinstance(path, threading.Event):
+                path.set()
+                continue
+            try:
+                if path and self.rotation["compress"] and os.path.exists(path):
+                    _gzip(path)
+                prune_backups(self.baseFilename, float(self.rotation["keep_days"]),
+                              float(self.rotation["max_total_mb"]))
+            except Exception:
+                # logging from here could recurse into this handler
+                traceback.print_exc(file=sys.stderr)
+
+    def wait(self):
+        """Block until every queued compression/pruning job is done (shutdown, tests)."""
+        if self._worker is None:
+            return
+        done = threading.Event()
+        self._jobs.put(done)
+        done.wait()
+
+    def close(self):
+        if self._worker is not None and self._worker.is_alive():
+            self._jobs.put(None)
+            # let a running compression finish so no backup is left half-processed
+            self._worker.join(timeout=30)
+        super().close()
+
+
+def setup_logging(level: str = "INFO", log_dir: str = None, rotation: dict = None):
     log_dir = log_dir or os.path.join(os.path.dirname(__file__), "logs")
     os.makedirs(log_dir, exist_ok=True)
     log_file = os.path.join(log_dir, "obs_multichat.log")
@@ -18,17 +177,25 @@ def setup_logging(level: str = "INFO", log_dir: str = None):
     fmt = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
     ch.setFormatter(fmt)
 
-    # File handler (JSON structured)
-    fh = RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
-    fh.setLevel(getattr(logging, level.upper(), logging.INFO))
-    json_formatter = jsonlogger.JsonFormatter('%(asctime)s %(levelname)s %(name)s %(message)s')
-    fh.setFormatter(json_formatter)
-
     # Avoid adding duplicate handlers when setup_logging is called multiple times
-    if not any(isinstance(h, RotatingFileHandler) and h.baseFilename == fh.baseFilename for h in logger.handlers if hasattr(h, 'baseFilename')):
+    if not any(isinstance(h, RotatingFileHandler) and h.baseFilename == os.path.abspath(log_file) for h in logger.handlers if hasattr(h, 'baseFilename')):
+        # File handler (JSON structured), rotated and compressed per the `logs` config
+        fh = ChatLogHandler(log_file, rotation)
+        fh.setLevel(getattr(logging, level.upper(), logging.INFO))
+        json_formatter = jsonlogger.JsonFormatter('%(asctime)s %(levelname)s %(name)s %(message)s')
+        fh.setFormatter(json_formatter)
         logger.addHandler(fh)
     if not any(isinstance(h, logging.StreamHandler) for h in logger.handlers):
         logger.addHandler(ch)
 
     logger.debug(f"Logging initialized. File: {log_file}")
     return logger
+
+
+def apply_log_level(level: str):
+    """Change the level of the root logger and its handlers at runtime."""
+    lvl = getattr(logging, str(level).upper(), logging.INFO)
+    root = logging.getLogger()
+    root.setLevel(lvl)
+    for h in root.handlers:
+        h.setLevel(lvl)
@@ -1,50 +1,118 @@
+import startup  # first: its import time is the process start reference
+import argparse
 import asyncio
-import signal
-from chat_aggregator import ChatAggregator
-from stream_manager import StreamManager
-from metadata_updater import MetadataUpdater
-from config import load_config
 import os
-from logger import setup_logging
 import logging
+from chat_aggregator import ChatAggregator, add_sink, remove_sink
+from config import ConfigWatcher, load_settings, parse_flag
+from logger import setup_logging, apply_log_level
+from supervisor import Supervisor, ALWAYS
+# stream_manager / metadata_updater (aiohttp) and twitchio are imported by the
+# subsystems that use them, off the path to the first JOIN
+startup.timer.mark("imports")
 
-# initialize logging; allow overriding via LOG_LEVEL env var
-log_level = os.getenv("LOG_LEVEL", "INFO")
-logger = setup_logging(level=log_level)
+logger = logging.getLogger(__name__)
 
-async def main():
-    config = load_config()
+
+def init():
+    """Load the settings and set up logging.
+
+    Called from `__main__` only: spawned shard workers re-import this module
+    and must not open the log handler (and its rotation jobs) a second time.
+    """
+    # validated settings snapshot from config.yaml + env (LOG_LEVEL overrides the level)
+    settings = load_settings()
+    startup.timer.mark("config")
+    setup_logging(level=settings.log_level, rotation=settings.raw.get("logs"))
+    startup.timer.mark("logging")
+    return settings
+
+
+def _apply_log_level(new, old):
+    if new.log_level != old.log_level:
+        apply_log_level(new.log_level)
+        logger.info("Log level changed to %s", new.log_level)
+
+
+def _report_on_first_message(record):
+    """One-shot sink: time-to-first-message closes the startup report."""
+    startup.timer.mark("first_message")
+    remove_sink(_report_on_first_message)
+    startup.timer.report()
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="obs_multichat chat aggregator")
+    p.add_argument("--channel", help="Echo only this channel to the console (as show_chat.py)")
+    p.add_argument("--author", help="Echo only this author to the console (as show_chat.py)")
+    return p.parse_args(argv)
+
+
+async def main(args=None, settings=None):
+    args = args or parse_args([])
+    settings = settings or init()
+    watcher = ConfigWatcher(settings=settings)
+    config = watcher.current.raw
     logger.info("Config loaded.")
-    chat = ChatAggregator(config.get("chat", {}))
-    stream = StreamManager(config.get("stream", {}))
-    meta = MetadataUpdater(config.get("metadata", {}))
+    shard_cfg = config.get("sharding") or {}
+    shards = None
+    if shard_cfg.get("enabled"):
+        # channels are read by worker processes; this process only logs and feeds sinks
+        from sharding import ShardCoordinator
+        shards = ShardCoordinator(watcher.current, shard_cfg)
+        chat = ChatAggregator(settings=watcher.current, role="coordinator")
+    else:
+        chat = ChatAggregator(settings=watcher.current)
+    chat.console_filters = {"channel": args.channel, "author": args.author}
+
+    # apply config.yaml / .env edits live
+    watcher.subscribe(_apply_log_level)
+    watcher.subscribe(chat.apply_settings)
+    if shards is not None:
+        watcher.subscribe(shards.apply_settings)
 
-    # start chat aggregator as a background task
-    chat_task = asyncio.create_task(chat.start())
+    # every long-running subsystem is a named child of one supervisor;
+    # SIGINT/SIGTERM trigger a graceful shutdown of all of them
+    sup = Supervisor("main")
+    sup.add("chat", chat.start, critical=True)
+    if shards is not None:
+        sup.add("shards", shards.run, critical=True)
+    sup.add("config-watcher", watcher.run, restart=ALWAYS)
+    sup.install_signal_handlers()
+    add_sink(_report_on_first_message)
+    startup.timer.mark("supervisor_ready")
 
     logger.info("Main loop started - chat aggregator is running")
     logger.info("Press Ctrl+C to stop")
-    
+
     try:
-        # Keep running indefinitely until interrupted
-        while True:
-            await asyncio.sleep(1)
-    except KeyboardInterrupt:
-        logger.info("Keyboard interrupt received")
+        await sup.run()
     finally:
         # attempt graceful shutdown
         logger.info("Shutting down...")
-        chat_task.cancel()
         await chat.stop()
-        try:
-            await asyncio.gather(chat_task, return_exceptions=True)
-        except Exception:
-            pass
+        remove_sink(_report_on_first_message)
+        startup.timer.report()
         logger.info("Shutdown complete")
 
+
+def _loop_factory(settings):
+    """uvloop when installed and not disabled (OBS_UVLOOP=0 or `uvloop: false`), else asyncio's default."""
+    if not parse_flag(os.environ.get("OBS_UVLOOP", settings.raw.get("uvloop")), True):
+        return None
+    try:
+        import uvloop
+    except ImportError:
+        logger.debug("uvloop not installed, using the default asyncio loop")
+        return None
+    logger.info("Using uvloop event loop")
+    return uvloop.new_event_loop
+
+
 if __name__ == "__main__":
+    settings = init()
     try:
-        asyncio.run(main())
+        with asyncio.Runner(loop_factory=_loop_factory(settings)) as runner:
+            runner.run(main(parse_args(), settings))
     except KeyboardInterrupt:
         logger.info("Stopped by user")
-
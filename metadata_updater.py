@@ -1,10 +1,229 @@
-import requests
+import asyncio
+import logging
+
+import aiohttp
+
+from config import Settings
+from ratelimit import TokenBucket, retry_after
+
+logger = logging.getLogger(__name__)
+
+# Built-in platform specs; anything here can be overridden per platform in config.
+# `fields` maps our generic keys (title, game_id, ...) to the platform's JSON keys.
+PLATFORMS = {
+    "twitch": {
+        "url": "https://api.twitch.tv/helix/channels",
+        "method": "PATCH",
+        "fields": {"title": "title", "game_id": "game_id", "category_id": "game_id",
+                   "language": "broadcaster_language", "tags": "tags"},
+        "rate_limit": {"rate": 800 / 60, "burst": 800},
+    },
+}
+
 
 class MetadataUpdater:
-    def __init__(self, cfg=None):
+    """Async, debounced, delta-only metadata updates for every platform.
+
+    `update()` only records the desired state. After `debounce` seconds of quiet
+    each platform gets one request carrying just the fields that differ from the
+    last state it acknowledged. Platforms are sent to concurrently over one pooled
+    aiohttp session; 429/5xx responses are retried within the platform's rate limit.
+
+    The Twitch token and client id come from the platform config, else the live
+    Settings snapshot (`apply_settings` follows reloads), else the token store in
+    `.env`. A 401 refreshes the token and retries once.
+    """
+
+    def __init__(self, cfg=None, settings: Settings = None):
         self.cfg = cfg or {}
+        self.settings = settings
+        self.debounce = float(self.cfg.get("debounce", 2.0))
+        self.max_retries = int(self.cfg.get("max_retries", 5))
+        self.retry_delay = float(self.cfg.get("retry_delay", 1.0))
+        self.timeout = float(self.cfg.get("timeout", 10))
+        self.platforms = {}
+        for name, pcfg in (self.cfg.get("platforms") or {}).items():
+            spec = dict(PLATFORMS.get(name, {}))
+            spec.update(pcfg or {})
+            if spec.get("enabled", True):
+                self.platforms[name] = spec
+        self.pending = {}
+        self.acked = {}
+        self._buckets = {}
+        self._timers = {}
+        self._inflight = {}
+        self._session = None
+        self._twitch_token = None  # obtained after a 401, wins over the configured one
+
+    def apply_settings(self, new: Settings, old: Settings = None):
+        """ConfigWatcher subscriber: later requests use the reloaded credentials."""
+        self.settings = new
+        self._twitch_token = None
 
     def update(self, platform, data):
-        print(f"Update metadata on {platform}: {data}")
-        # Реализовать вызовы API для каждой платформы (Twitch, YouTube, VK и т.д.)
-        # Например: requests.patch(...) с корректной аутентификацией
+        """Merge `data` into the desired state of `platform` ("all" = every platform)."""
+        targets = list(self.platforms) if platform == "all" else [platform]
+        for name in targets:
+            if name not in self.platforms:
+                logger.warning("Metadata update for unknown platform %s ignored", name)
+                continue
+            self.pending.setdefault(name, {}).update(data)
+            self._schedule(name, self.debounce)
+
+    def update_all(self, data):
+        self.update("all", data)
+
+    def _schedule(self, platform, delay):
+        timer = self._timers.pop(platform, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[platform] = asyncio.get_running_loop().call_later(delay, self._kick, platform)
+
+    def _kick(self, platform):
+        self._timers.pop(platform, None)
+        previous = self._inflight.get(platform)
+        self._inflight[platform] = asyncio.get_running_loop().create_task(self._run(platform, previous))
+
+    async def _run(self, platform, previous):
+        if previous is not None and not previous.done():
+            # one request per platform at a time; the newer state goes next
+            await asyncio.gather(previous, return_exceptions=True)
+        return await self._send(platform)
+
+    def delta(self, platform) -> dict:
+        """Fields in the pending state that differ from the acknowledged state."""
+        acked = self.acked.get(platform, {})
+        return {k: v for k, v in self.pending.get(platform, {}).items() if acked.get(k) != v}
+
+    def _bucket(self, platform) -> TokenBucket:
+        bucket = self._buckets.get(platform)
+        if bucket is None:
+            rl = self.platforms[platform].get("rate_limit") or {"rate": 1, "burst": 5}
+            bucket = self._buckets[platform] = TokenBucket(rl.get("rate", 1), rl.get("burst"))
+        return bucket
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=int(self.cfg.get("pool_size", 4)))
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    def _build_request(self, platform, changed) -> dict:
+        spec = self.platforms[platform]
+        fields = spec.get("fields") or {}
+        body = {fields.get(k, k): v for k, v in changed.items()}
+        headers = dict(spec.get("headers") or {})
+        params = dict(spec.get("params") or {})
+        if platform == "twitch":
+            token, client_id = self._twitch_credentials()
+            headers.setdefault("Client-Id", client_id)
+            headers.setdefault("Authorization", f"Bearer {token}")
+            if spec.get("broadcaster_id"):
+                params.setdefault("broadcaster_id", spec["broadcaster_id"])
+        elif spec.get("token"):
+            headers.setdefault("Authorization", f"Bearer {spec['token']}")
+        return {"method": spec.get("method", "PATCH"), "url": spec["url"], "json": body, "params": params, "headers": headers}
+
+    def _twitch_credentials(self) -> tuple:
+        spec = self.platforms["twitch"]
+        settings = self.settings
+        token = self._twitch_token or spec.get("token") or (settings.irc_token if settings else None)
+        client_id = spec.get("client_id") or (settings.client_id if settings else None)
+        if not token:
+            from twitch_auth import read_tokens_from_env
+            token = read_tokens_from_env().get("access_token")
+        return (token or "").replace("oauth:", ""), client_id or ""
+
+    async def _refresh_twitch_token(self, used: str):
+        """A token to replace one Twitch answered 401 to, or None.
+
+        The chat token refresher may already have saved a new one; otherwise the
+        refresh token is exchanged (and the result saved, as the refresher does).
+        """
+        from twitch_auth import read_tokens_from_env, refresh_access_token, write_tokens_to_env
+        stored = await asyncio.to_thread(read_tokens_from_env)
+        token = (stored.get("access_token") or "").replace("oauth:", "")
+        if token and token != used:
+            return token
+        settings = self.settings
+        refresh_token = stored.get("refresh_token") or (settings.refresh_token if settings else None)
+        client_id = self._twitch_credentials()[1]
+        client_secret = settings.client_secret if settings else None
+        if not (refresh_token and client_id and client_secret):
+            return None
+        try:
+            data = await asyncio.to_thread(refresh_access_token, client_id, client_secret, refresh_token)
+        except Exception as exc:
+            logger.warning("Twitch token refresh for metadata updates failed: %s", exc)
+            return None
+        await asyncio.to_thread(write_tokens_to_env, data["access_token"], data.get("refresh_token") or refresh_token,
+                                data.get("expires_in", 3600))
+        return data["access_token"]
+
+    async def _send(self, platform):
+        changed = self.delta(platform)
+        if not changed:
+            logger.debug("Metadata for %s already up to date", platform)
+            return True
+        request = self._build_request(platform, changed)
+        bucket = self._bucket(platform)
+        session = await self._get_session()
+        delay = self.retry_delay
+        refreshed = False
+        for attempt in range(1, self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                async with session.request(**request) as resp:
+                    if resp.status < 300:
+                        self.acked.setdefault(platform, {}).update(changed)
+                        logger.info("Metadata updated on %s: %s", platform, changed)
+                        return True
+                    text = await resp.text()
+                    if resp.status == 429:
+                        reset = retry_after(resp.headers, delay)
+                        # hold the bucket so the retry waits for the platform's reset
+                        bucket.drain(reset)
+                        wait = 0
+                        logger.warning("Metadata update on %s rate limited, retrying in %.1fs", platform, reset)
+                    elif resp.status == 401 and platform == "twitch" and not refreshed:
+                        refreshed = True
+                        used = request["headers"].get("Authorization", "").replace("Bearer ", "")
+                        token = await self._refresh_twitch_token(used)
+                        if token is None:
+                            logger.error("Metadata update on twitch unauthorized and no new token: %s", text[:200])
+                            return False
+                        self._twitch_token = token.replace("oauth:", "")
+                        request = self._build_request(platform, changed)
+                        wait = 0
+                        logger.warning("Metadata update on twitch unauthorized, retrying with a new token")
+                    elif resp.status >= 500:
+                        wait = delay
+                        logger.warning("Metadata update on %s failed (%d), retrying in %.1fs", platform, resp.status, wait)
+                    else:
+                        logger.error("Metadata update on %s rejected (%d): %s", platform, resp.status, text[:200])
+                        return False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                wait = delay
+                logger.warning("Metadata update on %s failed (%s), retrying in %.1fs", platform, exc, wait)
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, 60)
+        logger.error("Metadata update on %s gave up after %d attempts", platform, self.max_retries)
+        return False
+
+    async def flush(self):
+        """Send everything pending right now and wait for all platforms."""
+        for platform in list(self._timers):
+            self._timers.pop(platform).cancel()
+            self._kick(platform)
+        await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+
+    async def close(self):
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for task in self._inflight.values():
+            task.cancel()
+        await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
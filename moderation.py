@@ -0,0 +1,143 @@
+"""Moderation deletes (CLEARMSG / CLEARCHAT) across every live chat sink.
+
+Sinks that keep chat around (the shared-memory ring, the recent-messages
+cache) return a handle for each stored record. `ModerationIndex` remembers,
+per message id, where the message lives in each sink, plus which message ids
+belong to each user and channel, so:
+
+- deleting one message costs O(1) per sink holding it;
+- a timeout/ban touches only that user's messages;
+- clearing a channel touches only that channel's messages.
+
+The index is bounded (`max_tracked`), oldest messages first; sinks are bounded
+too, so anything evicted here has long left them anyway.
+"""
+
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CLEARMSG = "clearmsg"
+CLEARCHAT = "clearchat"
+
+
+class _Entry:
+    __slots__ = ("channel", "users", "locations")
+
+    def __init__(self, channel, users):
+        self.channel = channel
+        self.users = users
+        self.locations = []
+
+
+class ModerationIndex:
+    def __init__(self, max_tracked: int = 10000):
+        self.max_tracked = max_tracked
+        self._messages = OrderedDict()  # message id -> _Entry
+        self._by_user = {}              # (channel, "id"|"login", value) -> {message id: None}
+        self._by_channel = {}           # channel -> {message id: None}
+        self.redacted = 0
+
+    def __len__(self):
+        return len(self._messages)
+
+    def track(self, record: dict, redact, handle):
+        """Remember that `redact(handle)` removes `record` from one sink."""
+        msg_id = record.get("id")
+        if not msg_id:
+            return
+        entry = self._messages.get(msg_id)
+        if entry is None:
+            channel = record.get("channel") or ""
+            users = []
+            if record.get("author_id"):
+                users.append((channel, "id", str(record["author_id"])))
+            if record.get("author"):
+                users.append((channel, "login", record["author"].lower()))
+            entry = self._messages[msg_id] = _Entry(channel, users)
+            for key in users:
+                self._by_user.setdefault(key, {})[msg_id] = None
+            self._by_channel.setdefault(channel, {})[msg_id] = None
+            while len(self._messages) > self.max_tracked:
+                self._forget(next(iter(self._messages)))
+        entry.locations.append((redact, handle))
+
+    def _forget(self, msg_id):
+        entry = self._messages.pop(msg_id, None)
+        if entry is None:
+            return None
+        for key in entry.users:
+            ids = self._by_user.get(key)
+            if ids is not None:
+                ids.pop(msg_id, None)
+                if not ids:
+                    del self._by_user[key]
+        ids = self._by_channel.get(entry.channel)
+        if ids is not None:
+            ids.pop(msg_id, None)
+            if not ids:
+                del self._by_channel[entry.channel]
+        return entry
+
+    def delete(self, msg_id: str) -> int:
+        """Redact one message from every sink; returns how many copies were removed."""
+        entry = self._forget(msg_id)
+        if entry is None:
+            return 0
+        removed = 0
+        for redact, handle in entry.locations:
+            try:
+                if redact(handle) is not False:
+                    removed += 1
+            except Exception:
+                logger.exception("moderation: redact via %r failed", redact)
+        self.redacted += removed
+        return removed
+
+    def clear_user(self, channel: str, user_id: str = None, login: str = None) -> int:
+        ids = {}
+        if user_id:
+            ids.update(self._by_user.get((channel, "id", str(user_id))) or {})
+        if login:
+            ids.update(self._by_user.get((channel, "login", login.lower())) or {})
+        return sum(self.delete(msg_id) for msg_id in list(ids))
+
+    def clear_channel(self, channel: str) -> int:
+        return sum(self.delete(msg_id) for msg_id in list(self._by_channel.get(channel) or ()))
+
+    def apply(self, event: dict) -> int:
+        """Apply a CLEARMSG/CLEARCHAT event dict (see `chat_aggregator.apply_moderation`)."""
+        if event.get("type") == CLEARMSG:
+            return self.delete(event.get("id"))
+        if event.get("type") == CLEARCHAT:
+            if event.get("user_id") or event.get("login"):
+                return self.clear_user(event.get("channel") or "", event.get("user_id"), event.get("login"))
+            return self.clear_channel(event.get("channel") or "")
+        return 0
+
+
+class RecentMessages:
+    """Bounded in-memory cache of the latest chat records (for overlays and APIs)."""
+
+    def __init__(self, maxlen: int = 200):
+        self.maxlen = maxlen
+        self._records = OrderedDict()
+        self._seq = 0
+
+    def __call__(self, record: dict):
+        self._seq += 1
+        self._records[self._seq] = record
+        if len(self._records) > self.maxlen:
+            self._records.popitem(last=False)
+        return self._seq
+
+    def __len__(self):
+        return len(self._records)
+
+    def redact(self, handle) -> bool:
+        return self._records.pop(handle, None) is not None
+
+    def recent(self, channel: str = None, n: int = None) -> list:
+        records = [r for r in self._records.values() if channel is None or r.get("channel") == channel]
+        return records[-n:] if n else records
@@ -0,0 +1,254 @@
+"""Chat platform adapters for everything that is not Twitch IRC.
+
+An adapter connects to one platform chat and yields message objects shaped
+like twitchio's (`channel.name`, `author.name/id`, `id`, `content`, `tags`),
+so `ChatAggregator` feeds them through the same pipeline as Twitch: filters,
+copypasta collapsing, first-seen flags, the log and every sink. `health`
+reports the adapter's state; it is part of the aggregator supervisor's
+`status()` under `platform-<name>`.
+
+`PollingChatAdapter` covers HTTP APIs that are polled (YouTube liveChat and
+anything shaped like it). It follows the page token and the poll interval the
+server suggests, sends conditional requests (ETag / Last-Modified), and backs
+off while chat is idle: busy chat is polled as fast as the server allows,
+quiet chat costs a request every `max_interval` seconds at most.
+"""
+
+import abc
+import asyncio
+import logging
+import time
+import types
+from collections import OrderedDict
+
+import aiohttp
+
+from ratelimit import retry_after
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "min_interval": 1.0,   # never poll faster, whatever the server suggests
+    "max_interval": 30.0,  # idle backoff ceiling
+    "idle_backoff": 1.5,   # interval multiplier per poll without new messages
+    "error_delay": 5.0,    # first retry delay after a failed poll (doubles up to max_interval)
+    "timeout": 10.0,
+    "skip_backlog": True,  # drop the messages already in chat when connecting
+}
+
+# Built-in platform specs; any key can be overridden per platform in config.
+# `fields` maps message attributes to dotted paths inside each item.
+PLATFORMS = {
+    "youtube": {
+        "url": "https://www.googleapis.com/youtube/v3/liveChat/messages",
+        "params": {"part": "snippet,authorDetails"},  # add liveChatId and key in config
+        "items": "items",
+        "next_page": "nextPageToken",
+        "page_param": "pageToken",
+        "interval": "pollingIntervalMillis",
+        "interval_scale": 0.001,
+        "fields": {"id": "id", "author": "authorDetails.displayName",
+                   "author_id": "authorDetails.channelId", "content": "snippet.displayMessage"},
+    },
+}
+
+
+def _get(obj, path: str):
+    for key in path.split("."):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+class AdapterHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.connected = False
+        self.polls = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.messages = 0
+        self.interval = 0.0
+        self.last_ok = None
+        self.last_error = None
+
+    def snapshot(self) -> dict:
+        return {
+            "connected": self.connected,
+            "polls": self.polls,
+            "not_modified": self.not_modified,
+            "errors": self.errors,
+            "messages": self.messages,
+            "interval": round(self.interval, 3),
+            "since_ok": round(time.monotonic() - self.last_ok, 1) if self.last_ok is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class PlatformAdapter(abc.ABC):
+    """Interface every chat platform implements."""
+
+    def __init__(self, name: str, cfg: dict = None):
+        self.name = name
+        self.cfg = cfg or {}
+        self.channel = self.cfg.get("channel") or name
+        self.health = AdapterHealth(name)
+
+    @abc.abstractmethod
+    async def connect(self):
+        """Open whatever the adapter reads from; called before `messages()`."""
+
+    @abc.abstractmethod
+    def messages(self):
+        """Async iterator of normalized message objects; runs until cancelled."""
+
+    async def close(self):
+        self.health.connected = False
+
+    def message(self, msg_id, author, author_id, content):
+        """Message object for the pipeline; ids and names are coerced to text, as IRC tags would be."""
+        return types.SimpleNamespace(
+            channel=types.SimpleNamespace(name=self.channel),
+            author=types.SimpleNamespace(name=_text(author), id=_text(author_id)),
+            id=_text(msg_id), content=_text(content) or "", tags={"platform": self.name}, echo=False)
+
+
+class PollingChatAdapter(PlatformAdapter):
+    def __init__(self, name: str, cfg: dict = None):
+        spec = dict(DEFAULTS, **PLATFORMS.get(name, {}))
+        spec.update(cfg or {})
+        super().__init__(name, spec)
+        self.min_interval = float(spec["min_interval"])
+        self.max_interval = float(spec["max_interval"])
+        self.idle_backoff = float(spec["idle_backoff"])
+        self.error_delay = float(spec["error_delay"])
+        # config adds to the built-in query params and field paths instead of replacing them
+        builtin = PLATFORMS.get(name, {})
+        self.cfg["params"] = dict(builtin.get("params") or {}, **((cfg or {}).get("params") or {}))
+        self.fields = dict(builtin.get("fields") or {}, **((cfg or {}).get("fields") or {}))
+        self.page_token = None
+        self.server_interval = self.min_interval
+        self.delay = self.min_interval
+        self._failures = 0  # consecutive failed polls
+        self._validators = {}  # conditional request headers from the last 200
+        self._seen = OrderedDict()  # recent message ids, in case a page is served twice
+        self._session = None
+
+    async def connect(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=float(self.cfg["timeout"])))
+        self.health.connected = True
+
+    async def close(self):
+        await super().close()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _request(self) -> dict:
+        params = dict(self.cfg.get("params") or {})
+        if self.page_token and self.cfg.get("page_param"):
+            params[self.cfg["page_param"]] = self.page_token
+        headers = dict(self.cfg.get("headers") or {})
+        if self.cfg.get("token"):
+            headers.setdefault("Authorization", f"Bearer {self.cfg['token']}")
+        headers.update(self._validators)
+        return {"params": params, "headers": headers}
+
+    def _parse(self, data: dict) -> list:
+        if self.cfg.get("next_page"):
+            self.page_token = data.get(self.cfg["next_page"]) or self.page_token
+        suggested = data.get(self.cfg["interval"]) if self.cfg.get("interval") else None
+        if isinstance(suggested, (int, float)) and suggested > 0:
+            self.server_interval = suggested * float(self.cfg.get("interval_scale", 1))
+        items = _get(data, self.cfg.get("items", "items"))
+        messages = []
+        for item in items if isinstance(items, list) else ():
+            f = self.fields
+            content = _get(item, f.get("content", "content"))
+            if not isinstance(content, str):
+                # not a text message (deleted, super sticker, ...) or not the shape we expect
+                continue
+            msg_id = _text(_get(item, f.get("id", "id")))
+            if msg_id is not None:
+                if msg_id in self._seen:
+                    continue
+                self._seen[msg_id] = None
+                if len(self._seen) > 1000:
+                    self._seen.popitem(last=False)
+            messages.append(self.message(msg_id, _get(item, f.get("author", "author")),
+                                         _get(item, f.get("author_id", "author_id")), content))
+        return messages
+
+    async def poll(self) -> list:
+        """One (conditional) request; returns the new messages and sets `delay` for the next one."""
+        self.health.polls += 1
+        try:
+            async with self._session.get(self.cfg["url"], **self._request()) as resp:
+                if resp.status == 304:
+                    self.health.not_modified += 1
+                    messages = []
+                elif resp.status == 200:
+                    data = await resp.json(content_type=None)
+                    self._validators = {h: resp.headers[v] for h, v in (("If-None-Match", "ETag"), ("If-Modified-Since", "Last-Modified"))
+                                        if v in resp.headers}
+                    messages = self._parse(data if isinstance(data, dict) else {})
+                else:
+                    text = await resp.text()
+                    wait = retry_after(resp.headers, self._error_delay()) if resp.status in (429, 503) else self._error_delay()
+                    return self._failed(f"HTTP {resp.status}: {text[:200]}", wait)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+            return self._failed(repr(exc), self._error_delay())
+        self.health.last_ok = time.monotonic()
+        self.health.last_error = None
+        self._failures = 0
+        floor = max(self.min_interval, self.server_interval)
+        if messages:
+            # busy: as fast as the server allows
+            self.delay = floor
+        else:
+            self.delay = min(self.max_interval, max(floor, self.delay * self.idle_backoff))
+        self.health.interval = self.delay
+        return messages
+
+    def _error_delay(self) -> float:
+        if not self._failures:
+            return self.error_delay
+        return min(self.max_interval, max(self.error_delay, self.delay * 2))
+
+    def _failed(self, error: str, wait: float) -> list:
+        self._failures += 1
+        self.health.errors += 1
+        self.health.last_error = error
+        self.delay = wait
+        self.health.interval = wait
+        logger.warning("[%s] chat poll failed (%s), retrying in %.1fs", self.name, error, wait)
+        return []
+
+    async def messages(self):
+        first = self.page_token is None and self.cfg.get("skip_backlog")
+        while True:
+            batch = await self.poll()
+            if first and self.health.last_ok is not None:
+                first = False
+                batch = []
+            self.health.messages += len(batch)
+            for message in batch:
+                yield message
+            await asyncio.sleep(self.delay)
+
+
+ADAPTERS = {"poll": PollingChatAdapter}
+
+
+def create_adapter(name: str, cfg: dict) -> PlatformAdapter:
+    """Adapter for `chat.platforms.<name>`; `type` picks the class (default: poll)."""
+    kind = (cfg or {}).get("type", "poll")
+    if kind not in ADAPTERS:
+        raise ValueError(f"unknown chat platform type {kind!r} for {name}")
+    return ADAPTERS[kind](name, cfg)
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `burst` stored."""
+
+    def __init__(self, rate: float, burst: float = None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.burst
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens: float = 1) -> float:
+        """Seconds until `tokens` would be available (0 if available now)."""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (tokens - self.tokens) / self.rate
+
+    def drain(self, seconds: float):
+        """Empty the bucket and hold it for `seconds` (e.g. after a 429)."""
+        self._refill()
+        self.tokens = -seconds * self.rate
+
+    async def acquire(self, tokens: float = 1):
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.delay(tokens))
+
+
+def retry_after(headers, default: float) -> float:
+    """Seconds to wait from Retry-After or Twitch's Ratelimit-Reset (epoch seconds)."""
+    if headers.get("Retry-After"):
+        try:
+            return max(0.0, float(headers["Retry-After"]))
+        except ValueError:
+            pass
+    if headers.get("Ratelimit-Reset"):
+        try:
+            return max(0.0, float(headers["Ratelimit-Reset"]) - time.time())
+        except ValueError:
+            pass
+    return default
@@ -0,0 +1,155 @@
+"""Coordinated reconnect scheduling for every chat connection.
+
+All connections ask one `ReconnectScheduler` before (re)connecting, so after a
+network blip they do not stampede Twitch and trip its connection/auth limits:
+
+- a global token bucket caps connect+auth attempts across the whole process;
+- each endpoint backs off with decorrelated jitter (AWS architecture blog:
+  sleep = min(cap, uniform(base, previous * 3)));
+- a per-endpoint circuit breaker stops hammering an endpoint that keeps failing;
+- when several endpoints wait for the budget, lower `priority` goes first.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 0
+SECONDARY = 10
+BACKGROUND = 20
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 5, reset_timeout: float = 60.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._clock = clock
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if self._clock() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - self._clock())
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            # trial attempt failed (or too many in a row): stay open for another period
+            self.opened_at = self._clock()
+
+
+class Endpoint:
+    def __init__(self, name: str, priority: int, base: float, cap: float, breaker: CircuitBreaker):
+        self.name = name
+        self.priority = priority
+        self.base = base
+        self.cap = cap
+        self.breaker = breaker
+        self.sleep = base
+        self.not_before = 0.0
+        self.attempts = 0
+
+    def snapshot(self) -> dict:
+        return {"priority": self.priority, "attempts": self.attempts, "breaker": self.breaker.state,
+                "failures": self.breaker.failures, "next_delay": round(self.sleep, 2)}
+
+
+class ReconnectScheduler:
+    def __init__(self, cfg: dict = None, rng: random.Random = None):
+        cfg = cfg or {}
+        self.base = float(cfg.get("base", 1.0))
+        self.cap = float(cfg.get("max", 300.0))
+        # Twitch allows 20 authentication attempts per 10 seconds per user
+        self.bucket = TokenBucket(float(cfg.get("connect_rate", 2.0)), float(cfg.get("connect_burst", 10)))
+        self.breaker_threshold = int(cfg.get("breaker_threshold", 5))
+        self.breaker_reset = float(cfg.get("breaker_reset", 60.0))
+        self.endpoints = {}
+        self._rng = rng or random.Random()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer = None
+
+    def endpoint(self, name: str, priority: int = SECONDARY) -> Endpoint:
+        ep = self.endpoints.get(name)
+        if ep is None:
+            ep = Endpoint(name, priority, self.base, self.cap, CircuitBreaker(self.breaker_threshold, self.breaker_reset))
+            self.endpoints[name] = ep
+        return ep
+
+    async def acquire(self, name: str, priority: int = None):
+        """Wait until `name` may connect: its own backoff, its breaker, then the global budget."""
+        ep = self.endpoint(name, SECONDARY if priority is None else priority)
+        if priority is not None:
+            ep.priority = priority
+        while True:
+            wait = max(ep.not_before - time.monotonic(), ep.breaker.retry_in())
+            if wait <= 0:
+                break
+            logger.info("[reconnect] %s waiting %.1fs (breaker %s)", name, wait, ep.breaker.state)
+            await asyncio.sleep(wait)
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (ep.priority, next(self._seq), fut))
+        self._pump()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        ep.attempts += 1
+
+    def _pump(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            _, _, fut = self._waiters[0]
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self.bucket.try_acquire():
+                self._timer = asyncio.get_running_loop().call_later(self.bucket.delay(), self._pump)
+                return
+            heapq.heappop(self._waiters)
+            fut.set_result(None)
+
+    def success(self, name: str):
+        ep = self.endpoint(name)
+        ep.breaker.record_success()
+        ep.sleep = ep.base
+        ep.not_before = 0.0
+
+    def failure(self, name: str) -> float:
+        """Record a failed/lost connection; returns the backoff before the next attempt."""
+        ep = self.endpoint(name)
+        ep.breaker.record_failure()
+        ep.sleep = min(ep.cap, self._rng.uniform(ep.base, ep.sleep * 3))
+        ep.not_before = time.monotonic() + ep.sleep
+        logger.info("[reconnect] %s failed, next attempt in %.1fs (breaker %s)", name, ep.sleep, ep.breaker.state)
+        return ep.sleep
+
+    def snapshot(self) -> dict:
+        return {name: ep.snapshot() for name, ep in self.endpoints.items()}
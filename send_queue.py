@@ -0,0 +1,245 @@
+"""Rate-limited, prioritized outbound chat queue.
+
+Twitch silently drops (or temporarily bans) accounts that exceed its chat
+limits: about 20 messages per 30 seconds for a normal account, 100 per 30
+seconds in channels where the bot is a moderator or the broadcaster, plus a
+per-channel pace. `SendQueue` keeps every outgoing message until the global,
+per-channel and mod/non-mod token buckets allow it, sends moderation actions
+before announcements before chatter replies, coalesces identical pending
+messages and lets callers cancel what has not been sent yet.
+"""
+
+import asyncio
+import bisect
+import functools
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MODERATION = 0
+ANNOUNCEMENT = 10
+REPLY = 20
+
+DEFAULTS = {
+    "global": {"rate": 20 / 30, "burst": 20},
+    "global_mod": {"rate": 100 / 30, "burst": 100},
+    "channel": {"rate": 1.0, "burst": 1},
+    "channel_mod": {"rate": 5.0, "burst": 5},
+    "duplicate_window": 30.0,
+    "retry_delay": 1.0,
+    "max_attempts": 3,       # sends of one message rejected by a rate-limit NOTICE before it is dropped
+    "requeue_window": 5.0,   # a NOTICE this long after a send is taken as the answer to it
+}
+
+# Twitch rejects a non-mod message identical to the previous one within 30s;
+# an invisible tag character makes the retry distinct
+_DUPLICATE_SUFFIX = " \U000e0000"
+
+
+def _resolve_from(future: asyncio.Future, done: asyncio.Future):
+    if not future.done():
+        future.set_result(not done.cancelled() and done.result())
+
+
+class OutboundMessage:
+    __slots__ = ("channel", "text", "priority", "seq", "future", "cancelled", "attempts", "confirm")
+
+    def __init__(self, channel: str, text: str, priority: int, seq: int):
+        self.channel = channel
+        self.text = text
+        self.priority = priority
+        self.seq = seq
+        self.future = asyncio.get_running_loop().create_future()
+        self.cancelled = False
+        self.attempts = 0
+        self.confirm = None  # timer resolving the future once the send is past `requeue_window`
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def cancel(self) -> bool:
+        """Withdraw the message if it has not been sent yet (or is queued again after a rate limit)."""
+        if self.future.done() or self.confirm is not None:
+            return False
+        self.cancelled = True
+        self.future.cancel()
+        return True
+
+    def __await__(self):
+        return asyncio.shield(self.future).__await__()
+
+
+class SendQueue:
+    def __init__(self, send: Callable[[str, str], Awaitable], cfg: dict = None, is_mod: Callable[[str], bool] = None):
+        cfg = cfg or {}
+        self.cfg = {k: (dict(v, **(cfg.get(k) or {})) if isinstance(v, dict) else cfg.get(k, v)) for k, v in DEFAULTS.items()}
+        self._send = send
+        self.is_mod = is_mod or (lambda channel: False)
+        self.global_bucket = self._bucket("global")
+        self.global_mod_bucket = self._bucket("global_mod")
+        self._channel_buckets = {}
+        self._pending = []
+        self._index = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._last_sent = {}
+        self._last_msg = {}
+        self.sent = 0
+        self.dropped = 0
+
+    def _bucket(self, kind: str) -> TokenBucket:
+        c = self.cfg[kind]
+        return TokenBucket(c["rate"], c["burst"])
+
+    def _channel_bucket(self, channel: str, mod: bool) -> TokenBucket:
+        key = (channel, mod)
+        bucket = self._channel_buckets.get(key)
+        if bucket is None:
+            bucket = self._channel_buckets[key] = self._bucket("channel_mod" if mod else "channel")
+        return bucket
+
+    def __len__(self):
+        return sum(1 for m in self._pending if not m.cancelled)
+
+    def submit(self, channel: str, text: str, priority: int = REPLY) -> OutboundMessage:
+        """Queue a message; an identical pending message is reused (and bumped in priority)."""
+        channel = channel.lstrip("#").lower()
+        # a stray CR/LF would let the text inject extra IRC commands
+        text = " ".join(text.splitlines()).strip()
+        key = (channel, text)
+        existing = self._index.get(key)
+        if existing is not None and not existing.cancelled and not existing.future.done():
+            if priority < existing.priority:
+                self._pending.remove(existing)
+                existing.priority = priority
+                bisect.insort(self._pending, existing)
+            return existing
+        msg = OutboundMessage(channel, text, priority, next(self._seq))
+        bisect.insort(self._pending, msg)
+        self._index[key] = msg
+        self._wakeup.set()
+        return msg
+
+    def rate_limited(self, channel: str, seconds: float = 30.0):
+        """Server said we are sending too fast (NOTICE msg_ratelimit): hold off.
+
+        The NOTICE means the last message sent to `channel` was rejected; it is queued
+        again (ahead of later messages of its priority) up to `max_attempts` sends, after
+        which its future resolves False.
+        """
+        channel = channel.lstrip("#").lower()
+        mod = self.is_mod(channel)
+        self._channel_bucket(channel, mod).drain(seconds)
+        if not mod:
+            self.global_bucket.drain(seconds)
+        msg = self._last_msg.pop(channel, None)
+        if msg is None or msg.confirm is None:
+            return  # nothing sent recently: its future already resolved
+        msg.confirm.cancel()
+        msg.confirm = None
+        if self._last_sent.get(channel, ("",))[0] == msg.text:
+            del self._last_sent[channel]  # rejected, so the retry is not a duplicate
+        if msg.attempts >= self.cfg["max_attempts"]:
+            self.dropped += 1
+            logger.warning("Outbound message to #%s dropped after %d rate-limited sends: %.100s",
+                           channel, msg.attempts, msg.text)
+            msg.future.set_result(False)
+            return
+        existing = self._index.get((channel, msg.text))
+        if existing is not None and existing is not msg and not existing.cancelled and not existing.future.done():
+            # the same text is queued anyway; that send stands for this one
+            existing.future.add_done_callback(functools.partial(_resolve_from, msg.future))
+            return
+        bisect.insort(self._pending, msg)
+        self._index[(channel, msg.text)] = msg
+        self._wakeup.set()
+        logger.info("Outbound message to #%s rejected by rate limit, queued again", channel)
+
+    def _confirmed(self, msg: OutboundMessage):
+        msg.confirm = None
+        if self._last_msg.get(msg.channel) is msg:
+            del self._last_msg[msg.channel]
+        if not msg.future.done():
+            msg.future.set_result(True)
+
+    def _ready_delay(self, msg: OutboundMessage) -> float:
+        mod = self.is_mod(msg.channel)
+        delay = max(self._channel_bucket(msg.channel, mod).delay(), self.global_mod_bucket.delay())
+        if not mod:
+            delay = max(delay, self.global_bucket.delay())
+        return delay
+
+    def _take(self, msg: OutboundMessage):
+        mod = self.is_mod(msg.channel)
+        self._channel_bucket(msg.channel, mod).try_acquire()
+        self.global_mod_bucket.try_acquire()
+        if not mod:
+            self.global_bucket.try_acquire()
+
+    def _next(self):
+        """Return (message, 0) for the best sendable message, or (None, seconds to wait)."""
+        wait = None
+        for msg in list(self._pending):
+            if msg.cancelled or msg.future.done():
+                self._discard(msg)
+                continue
+            delay = self._ready_delay(msg)
+            if delay <= 0:
+                return msg, 0.0
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    def _discard(self, msg: OutboundMessage):
+        try:
+            self._pending.remove(msg)
+        except ValueError:
+            pass
+        key = (msg.channel, msg.text)
+        if self._index.get(key) is msg:
+            del self._index[key]
+
+    def _wire_text(self, msg: OutboundMessage) -> str:
+        text = msg.text
+        if not self.is_mod(msg.channel):
+            last = self._last_sent.get(msg.channel)
+            if last and last[0] == text and time.monotonic() - last[1] < self.cfg["duplicate_window"]:
+                text += _DUPLICATE_SUFFIX
+        return text
+
+    async def run(self):
+        """Consumer loop; run it as its own task so sending never blocks reading."""
+        while True:
+            msg, wait = self._next()
+            if msg is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._take(msg)
+            self._discard(msg)
+            msg.attempts += 1
+            try:
+                await self._send(msg.channel, self._wire_text(msg))
+            except Exception as exc:
+                # not sent: keep it queued (never drop silently) and retry after a pause
+                logger.warning("Outbound message to #%s failed (%s), will retry", msg.channel, exc)
+                bisect.insort(self._pending, msg)
+                self._index.setdefault((msg.channel, msg.text), msg)
+                await asyncio.sleep(self.cfg["retry_delay"])
+                continue
+            self._last_sent[msg.channel] = (msg.text, time.monotonic())
+            self.sent += 1
+            window = self.cfg["requeue_window"]
+            if window > 0:
+                # a rate-limit NOTICE may still reject it: resolve once the window has passed
+                self._last_msg[msg.channel] = msg
+                msg.confirm = asyncio.get_running_loop().call_later(window, self._confirmed, msg)
+            elif not msg.future.done():
+                msg.future.set_result(True)
@@ -0,0 +1,345 @@
+"""Horizontal sharding of chat channels across worker processes.
+
+One asyncio loop parses, sanitizes and logs every channel on a single core. In
+sharded mode the coordinator (the main process) spreads the channels over N
+worker processes with a consistent-hash ring, so a worker joining or leaving
+moves only the channels it owned. Each worker runs the IRC connections for its
+channels and streams normalized records back over a local socket (Unix socket,
+or loopback TCP on Windows) using a small length-prefixed framing; the
+coordinator writes them to the chat log and feeds the in-process sinks.
+"""
+
+import asyncio
+import bisect
+import dataclasses
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import struct
+import sys
+import tempfile
+import time
+
+from config import Settings
+from supervisor import Supervisor, ALWAYS
+
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=str)
+
+    _loads = orjson.loads
+except ImportError:  # optional fast encoder
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {"workers": 2, "vnodes": 64, "poll_interval": 0.5}
+
+# frame = 4-byte payload length + 1-byte kind, then a JSON payload
+_HEADER = struct.Struct("!IB")
+MAX_FRAME = 16 * 1024 * 1024
+
+HELLO = 1     # worker -> coordinator: {"worker": name, "pid": pid}
+ASSIGN = 2    # coordinator -> worker: {"channels": [...]}
+RECORDS = 3   # worker -> coordinator: [record, ...] (each with its receive "ts")
+MODERATION = 4  # worker -> coordinator: CLEARMSG/CLEARCHAT event dict
+
+
+def encode_frame(kind: int, payload) -> bytes:
+    body = _dumps(payload)
+    return _HEADER.pack(len(body), kind) + body
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """Return (kind, payload); raises asyncio.IncompleteReadError on EOF."""
+    length, kind = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if length > MAX_FRAME:
+        raise ValueError(f"frame of {length} bytes exceeds {MAX_FRAME}")
+    return kind, _loads(await reader.readexactly(length))
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes for an even spread."""
+
+    def __init__(self, nodes=(), vnodes: int = 64):
+        self.vnodes = vnodes
+        self.nodes = set()
+        self._points = []
+        self._owners = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            idx = bisect.bisect(self._points, point)
+            self._points.insert(idx, point)
+            self._owners.insert(idx, node)
+
+    def remove(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        keep = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in keep]
+        self._owners = [o for _, o in keep]
+
+    def node_for(self, key: str):
+        if not self._points:
+            return None
+        idx = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[idx]
+
+    def assign(self, keys) -> dict:
+        """Map every node to the (sorted) keys it owns."""
+        plan = {node: [] for node in self.nodes}
+        for key in sorted(keys):
+            node = self.node_for(key)
+            if node is not None:
+                plan[node].append(key)
+        return plan
+
+
+class ShardCoordinator:
+    """Spawn, supervise and feed channel shards; runs in the main process."""
+
+    def __init__(self, settings: Settings, cfg: dict = None, emit=None, moderate=None):
+        cfg = dict(DEFAULTS, **(cfg or {}))
+        self.settings = settings
+        self.names = [f"shard-{i}" for i in range(max(1, int(cfg["workers"])))]
+        self.poll_interval = float(cfg["poll_interval"])
+        self.ring = HashRing(vnodes=int(cfg["vnodes"]))
+        if emit is None:
+            from chat_aggregator import emit_chat_record as emit
+        if moderate is None:
+            from chat_aggregator import apply_moderation as moderate
+        self.emit = emit
+        self.moderate = moderate
+        self.assignment = {}
+        self.processes = {}
+        self.received = 0
+        self.address = None
+        self.supervisor = Supervisor("shards")
+        self._writers = {}
+        self._server = None
+        self._ctx = multiprocessing.get_context("spawn")
+
+    async def start_server(self):
+        if hasattr(asyncio, "start_unix_server") and sys.platform != "win32":
+            path = os.path.join(tempfile.mkdtemp(prefix="obs_multichat-"), "shards.sock")
+            self._server = await asyncio.start_unix_server(self._handle, path=path)
+            self.address = path
+        else:
+            self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        return self.address
+
+    async def run(self):
+        """Serve workers until cancelled; each worker process is a supervised child."""
+        await self.start_server()
+        logger.info("[shards] coordinator listening on %s, %d workers", self.address, len(self.names))
+        self.supervisor = Supervisor("shards")
+        for name in self.names:
+            self.supervisor.add(name, lambda name=name: self._run_worker(name), restart=ALWAYS)
+        try:
+            await self.supervisor.run()
+        finally:
+            self.supervisor.shutdown()
+            self._server.close()
+            for proc in self.processes.values():
+                if proc.is_alive():
+                    proc.terminate()
+            if isinstance(self.address, str):
+                try:
+                    os.unlink(self.address)
+                    os.rmdir(os.path.dirname(self.address))
+                except OSError:
+                    pass
+
+    async def _run_worker(self, name: str):
+        proc = self._ctx.Process(target=worker_main, name=name, daemon=True,
+                                 args=(name, self.address, self.settings.raw, self.settings.log_level))
+        proc.start()
+        self.processes[name] = proc
+        logger.info("[shards] started %s (pid %s)", name, proc.pid)
+        try:
+            while proc.is_alive():
+                await asyncio.sleep(self.poll_interval)
+            raise RuntimeError(f"{name} exited with code {proc.exitcode}")
+        finally:
+            if proc.is_alive():
+                proc.terminate()
+                await asyncio.to_thread(proc.join, 5)
+            writer = self._writers.get(name)
+            if writer is not None:
+                writer.close()
+            self._leave(name)
+
+    async def _handle(self, reader, writer):
+        name = None
+        try:
+            kind, hello = await read_frame(reader)
+            if kind != HELLO:
+                raise ValueError(f"expected HELLO, got frame kind {kind}")
+            name = hello["worker"]
+            self._writers[name] = writer
+            self._join(name)
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == MODERATION:
+                    try:
+                        self.moderate(payload)
+                    except Exception:
+                        logger.exception("[shards] failed to apply moderation from %s", name)
+                    continue
+                if kind != RECORDS:
+                    continue
+                for record in payload:
+                    self.received += 1
+                    ts = record.pop("ts", None)
+                    try:
+                        self.emit(record, ts)
+                    except Exception:
+                        logger.exception("[shards] failed to emit record from %s", name)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception("[shards] bad stream from %s", name or "unknown worker")
+        finally:
+            if name is not None and self._writers.get(name) is writer:
+                del self._writers[name]
+                self._leave(name)
+            writer.close()
+
+    def _join(self, name: str):
+        logger.info("[shards] %s joined", name)
+        self.ring.add(name)
+        self.rebalance()
+
+    def _leave(self, name: str):
+        if name in self.ring.nodes:
+            logger.warning("[shards] %s left, reassigning its channels", name)
+            self.ring.remove(name)
+            self.rebalance()
+
+    def rebalance(self):
+        """Send each connected worker its channel set if it changed."""
+        plan = self.ring.assign(self.settings.channels)
+        moved = 0
+        for name, channels in plan.items():
+            if channels == self.assignment.get(name):
+                continue
+            moved += len(set(channels) - set(self.assignment.get(name) or ()))
+            writer = self._writers.get(name)
+            if writer is not None and not writer.is_closing():
+                writer.write(encode_frame(ASSIGN, {"channels": channels}))
+        self.assignment = plan
+        if moved:
+            logger.info("[shards] %d channel(s) (re)assigned: %s", moved,
+                        {n: len(c) for n, c in sorted(plan.items())})
+
+    def apply_settings(self, new: Settings, old: Settings = None):
+        """ConfigWatcher subscriber: reassign channels; restart workers when credentials change."""
+        old = old or self.settings
+        self.settings = new
+        if (new.irc_token, new.bot_username) != (old.irc_token, old.bot_username):
+            # workers were started with the old credentials; the supervisor respawns them
+            for proc in self.processes.values():
+                if proc.is_alive():
+                    proc.terminate()
+            return
+        if new.channels != old.channels:
+            self.rebalance()
+
+    def snapshot(self) -> dict:
+        return {name: {"alive": name in self.processes and self.processes[name].is_alive(),
+                       "connected": name in self._writers,
+                       "channels": len(self.assignment.get(name) or ())} for name in self.names}
+
+
+class _Batcher:
+    """Coalesce records produced in one loop iteration into a single RECORDS frame."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = []
+
+    def __call__(self, record: dict):
+        if not self.pending:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self.pending.append(dict(record, ts=time.time()))
+
+    def flush(self):
+        batch, self.pending = self.pending, []
+        if batch and not self.writer.is_closing():
+            self.writer.write(encode_frame(RECORDS, batch))
+
+    def moderate(self, event: dict):
+        # flush first so a delete never overtakes the message it deletes
+        self.flush()
+        if not self.writer.is_closing():
+            self.writer.write(encode_frame(MODERATION, event))
+
+
+async def _connect(address):
+    if isinstance(address, str):
+        return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(*address)
+
+
+async def run_worker(name: str, address, raw_config: dict):
+    """Worker body: read IRC for the assigned channels until the coordinator goes away."""
+    from chat_aggregator import ChatAggregator
+
+    settings = Settings.from_config(raw_config)
+    reader, writer = await _connect(address)
+    writer.write(encode_frame(HELLO, {"worker": name, "pid": os.getpid()}))
+    chat = None
+    task = None
+    try:
+        while True:
+            kind, payload = await read_frame(reader)
+            if kind != ASSIGN:
+                continue
+            assigned = dataclasses.replace(settings, channels=tuple(payload["channels"]))
+            logger.info("[%s] assigned %d channel(s)", name, len(assigned.channels))
+            if chat is not None:
+                chat.apply_settings(assigned)
+            elif assigned.channels:
+                chat = ChatAggregator(settings=assigned, role="worker")
+                chat.emit = _Batcher(writer)
+                chat.moderate = chat.emit.moderate
+                task = asyncio.create_task(chat.start())
+    except asyncio.IncompleteReadError:
+        logger.info("[%s] coordinator closed the connection", name)
+    finally:
+        if chat is not None:
+            await chat.stop()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+        writer.close()
+
+
+def worker_main(name: str, address, raw_config: dict, log_level: str = "INFO"):
+    """Process entry point; the coordinator owns the JSON log, workers log to stderr."""
+    # force: drop handlers set up while re-importing the parent's __main__ under spawn
+    logging.basicConfig(level=log_level, force=True,
+                        format=f"%(asctime)s %(levelname)s [{name}] %(name)s: %(message)s")
+    try:
+        asyncio.run(run_worker(name, address, raw_config))
+    except KeyboardInterrupt:
+        pass
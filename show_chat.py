@@ -3,28 +3,50 @@
 
 Usage:
   python show_chat.py [-f|--follow] [-n N] [--channel NAME] [--author NAME]
+  python show_chat.py --live [--ring NAME] [--channel NAME] [--author NAME]
+  python show_chat.py stats [--workers N] [--window MIN] [--top N] [FILE ...]
 
 Features:
 - Reads `logs/obs_multichat.log` (JSON lines created by the app)
-- Prints only records where `message == 'chat.message'`
+- Prints only chat records (`chat.message`, and `chat.copypasta` flood summaries)
 - Filters by channel or author when provided
 - `--follow` mode behaves like `tail -f`
+- `--live` reads the aggregator's shared-memory ring instead of the log file
+- `stats` builds a post-stream report over all rotated `obs_multichat.log*` files
+- Rotated backups may be gzipped (`*.gz`); they are streamed transparently
 """
 
 import argparse
 import json
+import mmap
 import os
+import sys
 import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-LOG_PATH = os.path.join(os.path.dirname(__file__), "logs", "obs_multichat.log")
+from logfiles import LOG_PATH, log_files, match, open_log
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional fast decoder
+    _loads = json.loads
+
+CHAT_PATTERN = b'"chat.message"'
+CHUNK_SIZE = 16 * 1024 * 1024
 
 
 def format_record(rec: dict) -> str:
-    ts = rec.get("asctime") or rec.get("timestamp") or datetime.utcnow().isoformat()
+    ts = rec.get("asctime") or rec.get("timestamp")
+    if not ts:
+        ts = datetime.fromtimestamp(rec["ts"]).isoformat(sep=" ", timespec="milliseconds") if rec.get("ts") else datetime.utcnow().isoformat()
     channel = rec.get("channel", "?")
-    author = rec.get("author", "?")
+    author = rec.get("author") or rec.get("type") or "?"
     content = rec.get("content", "")
+    if rec.get("collapsed"):
+        content += f" (+{rec['collapsed']} similar)"
     return f"{ts} [{channel}] {author}: {content}"
 
 
@@ -49,21 +71,82 @@ def tail(file, n=10):
         return []
 
 
+def tail_logs(log_path: str = LOG_PATH, n=10) -> list:
+    """Last n lines across the live log and its (possibly gzipped) backups."""
+    lines = []
+    for path in reversed(log_files(log_path)):
+        if len(lines) >= n:
+            break
+        want = n - len(lines)
+        if path.endswith(".gz"):
+            with open_log(path) as f:
+                older = [l.decode("utf-8", errors="replace").rstrip("\r\n") for l in deque(f, maxlen=want)]
+        else:
+            older = tail(path, want)
+        lines = older + lines
+    return lines
+
+
+def _rotated(file, f) -> bool:
+    try:
+        return os.stat(file).st_ino != os.fstat(f.fileno()).st_ino
+    except FileNotFoundError:
+        return False  # between the rename and the new file being opened
+
+
 def follow(file, callback, filters, tail_lines=10, sleep=0.5):
     # print tail first
-    for line in tail(file, tail_lines):
+    for line in tail_logs(file, tail_lines):
         callback(line, filters)
+    f = open(file, "r", encoding="utf-8", errors="replace")
     try:
-        with open(file, "r", encoding="utf-8", errors="replace") as f:
-            f.seek(0, os.SEEK_END)
-            while True:
-                line = f.readline()
-                if not line:
-                    time.sleep(sleep)
-                    continue
+        f.seek(0, os.SEEK_END)
+        while True:
+            line = f.readline()
+            if line:
                 callback(line, filters)
+                continue
+            time.sleep(sleep)
+            if _rotated(file, f):
+                # drain what the old file got before the rename, then read the new one from its start
+                for line in f:
+                    callback(line, filters)
+                f.close()
+                f = open(file, "r", encoding="utf-8", errors="replace")
     except KeyboardInterrupt:
         print("\nStopping follow.")
+    finally:
+        f.close()
+
+
+def live(ring_name: str, filters: dict, sleep=0.001):
+    """Print chat from the shared-memory ring published by ChatAggregator."""
+    from chat_ring import ChatRingReader
+    try:
+        reader = ChatRingReader(ring_name)
+    except FileNotFoundError:
+        print(f"Chat ring not found: {ring_name} (is shm_ring enabled and the app running?)")
+        raise SystemExit(1)
+    gaps = 0
+    try:
+        while True:
+            records = reader.read()
+            if reader.gaps != gaps:
+                print(f"... skipped {reader.gaps - gaps} messages (reader too slow)")
+                gaps = reader.gaps
+            if not records:
+                time.sleep(sleep)
+                continue
+            for rec in records:
+                if rec.get("type") in ("clearmsg", "clearchat"):
+                    who = rec.get("login") or rec.get("id") or "all messages"
+                    print(f"-- [{rec.get('channel', '?')}] moderator removed {who}")
+                elif not rec.get("deleted") and match(rec, filters):
+                    print(format_record(rec))
+    except KeyboardInterrupt:
+        print("\nStopping live view.")
+    finally:
+        reader.close()
 
 
 def process_line(line: str, filters: dict):
@@ -74,33 +157,219 @@ def process_line(line: str, filters: dict):
         obj = json.loads(line)
     except Exception:
         return
-    if obj.get("message") != "chat.message":
-        return
-    if filters.get("channel") and obj.get("channel") != filters["channel"]:
+    if obj.get("message") not in ("chat.message", "chat.copypasta"):
         return
-    if filters.get("author") and obj.get("author") != filters["author"]:
+    if not match(obj, filters):
         return
     print(format_record(obj))
 
 
+def split_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> list:
+    """Split a file into line-aligned (path, start, end) byte ranges.
+
+    A gzip stream cannot be entered mid-way: a `.gz` file is one chunk, `end=-1`.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    if path.endswith(".gz"):
+        return [(path, 0, -1)]
+    chunks = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                nl = mm.find(b"\n", end)
+                end = size if nl == -1 else nl + 1
+            chunks.append((path, start, end))
+            start = end
+    return chunks
+
+
+def _first_time(rec: dict) -> bool:
+    """Twitch's `first-msg=1` tag, or the aggregator's own `first_seen` flag."""
+    return rec.get("first_seen") is True or str((rec.get("tags") or {}).get("first-msg")) == "1"
+
+
+class ChatStats:
+    """Mergeable partial aggregate of chat.message records."""
+
+    def __init__(self):
+        self.total = 0
+        self.per_minute = Counter()
+        self.minute_authors = {}
+        self.chatters = Counter()
+        self.first_seen = {}
+
+    def add(self, rec: dict):
+        ts = str(rec.get("asctime") or rec.get("timestamp") or "")
+        author = rec.get("author") or "?"
+        minute = ts[:16]
+        self.total += 1
+        self.per_minute[minute] += 1
+        self.minute_authors.setdefault(minute, set()).add(author)
+        self.chatters[author] += 1
+        if _first_time(rec):
+            first = self.first_seen.get(author)
+            if first is None or ts < first:
+                self.first_seen[author] = ts
+
+    def merge(self, other: "ChatStats") -> "ChatStats":
+        self.total += other.total
+        self.per_minute.update(other.per_minute)
+        for minute, authors in other.minute_authors.items():
+            self.minute_authors.setdefault(minute, set()).update(authors)
+        self.chatters.update(other.chatters)
+        for author, ts in other.first_seen.items():
+            first = self.first_seen.get(author)
+            if first is None or ts < first:
+                self.first_seen[author] = ts
+        return self
+
+    def peak_windows(self, window: int = 5, top: int = 3) -> list:
+        """Return the `top` windows of `window` minutes with most distinct chatters."""
+        minutes = sorted(self.minute_authors)
+        results = []
+        for i, minute in enumerate(minutes):
+            start = _parse_minute(minute)
+            authors = set()
+            for other in minutes[i:]:
+                if start is not None and (_parse_minute(other) - start).total_seconds() >= window * 60:
+                    break
+                authors |= self.minute_authors[other]
+            results.append((minute, len(authors)))
+        results.sort(key=lambda r: (-r[1], r[0]))
+        return results[:top]
+
+    def report(self, top: int = 10, window: int = 5) -> dict:
+        return {
+            "messages": self.total,
+            "chatters": len(self.chatters),
+            "messages_per_minute": dict(sorted(self.per_minute.items())),
+            "top_chatters": self.chatters.most_common(top),
+            "first_time_chatters": sorted(self.first_seen.items(), key=lambda r: (r[1], r[0])),
+            "peak_windows": self.peak_windows(window, top),
+        }
+
+
+def _parse_minute(minute: str):
+    try:
+        return datetime.strptime(minute, "%Y-%m-%d %H:%M")
+    except ValueError:
+        try:
+            return datetime.fromisoformat(minute)
+        except ValueError:
+            return None
+
+
+def process_chunk(chunk) -> ChatStats:
+    """Aggregate chat.message records in one line-aligned byte range of a log file."""
+    path, start, end = chunk
+    stats = ChatStats()
+    if end == -1:
+        with open_log(path) as f:
+            for line in f:
+                if CHAT_PATTERN not in line:
+                    continue
+                try:
+                    obj = _loads(line)
+                except ValueError:
+                    continue
+                if isinstance(obj, dict) and obj.get("message") == "chat.message":
+                    stats.add(obj)
+        return stats
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = mm.find(CHAT_PATTERN, start, end)
+        while pos != -1:
+            line_start = mm.rfind(b"\n", start, pos) + 1 or start
+            line_end = mm.find(b"\n", pos, end)
+            if line_end == -1:
+                line_end = end
+            try:
+                obj = _loads(mm[line_start:line_end])
+            except ValueError:
+                obj = None
+            if isinstance(obj, dict) and obj.get("message") == "chat.message":
+                stats.add(obj)
+            pos = mm.find(CHAT_PATTERN, line_end, end)
+    return stats
+
+
+def collect_stats(files: list, workers: int = None, chunk_size: int = CHUNK_SIZE) -> ChatStats:
+    """Aggregate stats over `files` in a process pool (`workers=0` runs in-process)."""
+    chunks = [c for path in files for c in split_chunks(path, chunk_size)]
+    total = ChatStats()
+    if workers == 0 or len(chunks) <= 1:
+        for chunk in chunks:
+            total.merge(process_chunk(chunk))
+        return total
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(process_chunk, chunks):
+            total.merge(partial)
+    return total
+
+
+def stats_main(argv):
+    p = argparse.ArgumentParser(prog="show_chat.py stats", description="Post-stream chat report over rotated logs")
+    p.add_argument("files", nargs="*", help="Log files (default: logs/obs_multichat.log*)")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (0 = no pool)")
+    p.add_argument("--top", type=int, default=10, help="Number of top chatters / peak windows")
+    p.add_argument("--window", type=int, default=5, help="Peak concurrency window in minutes")
+    p.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = p.parse_args(argv)
+
+    files = args.files or log_files()
+    if not files:
+        print(f"No log files found: {LOG_PATH}*")
+        raise SystemExit(1)
+
+    report = collect_stats(files, workers=args.workers).report(top=args.top, window=args.window)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"Messages: {report['messages']}  Chatters: {report['chatters']}")
+    print("\nMessages per minute:")
+    for minute, count in report["messages_per_minute"].items():
+        print(f"  {minute}  {count}")
+    print("\nTop chatters:")
+    for author, count in report["top_chatters"]:
+        print(f"  {author}: {count}")
+    print(f"\nPeak {args.window}-minute windows (distinct chatters):")
+    for minute, count in report["peak_windows"]:
+        print(f"  {minute}  {count}")
+    print(f"\nFirst-time chatters: {len(report['first_time_chatters'])}")
+    for author, ts in report["first_time_chatters"][-args.top:]:
+        print(f"  {ts} {author}")
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "stats":
+        return stats_main(sys.argv[2:])
+
     p = argparse.ArgumentParser(description="Tail and format chat messages from logs/obs_multichat.log")
     p.add_argument("-f", "--follow", action="store_true", help="Follow new log lines (like tail -f)")
     p.add_argument("-n", "--lines", type=int, default=10, help="Number of lines to show from the end")
     p.add_argument("--channel", help="Filter by channel name")
     p.add_argument("--author", help="Filter by author name")
+    p.add_argument("--live", action="store_true", help="Read live chat from the shared-memory ring (no disk I/O)")
+    p.add_argument("--ring", default="obs_multichat_chat", help="Shared-memory ring name for --live")
     args = p.parse_args()
 
+    filters = {k: v for k, v in (("channel", args.channel), ("author", args.author)) if v}
+
+    if args.live:
+        live(args.ring, filters)
+        return
+
     if not os.path.exists(LOG_PATH):
         print(f"Log file not found: {LOG_PATH}")
         raise SystemExit(1)
 
-    filters = {k: v for k, v in (("channel", args.channel), ("author", args.author)) if v}
-
     if args.follow:
         follow(LOG_PATH, process_line, filters, tail_lines=args.lines)
     else:
-        for line in tail(LOG_PATH, args.lines):
+        for line in tail_logs(LOG_PATH, args.lines):
             process_line(line, filters)
 
 
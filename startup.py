@@ -0,0 +1,37 @@
+"""Startup phase timing.
+
+`timer.mark(phase)` records how long after process start a phase was reached
+(only the first time). `main.py` logs the report as a `startup.timing` line once
+the first chat message arrives, so a slow cold start shows which phase grew.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# process start as seen by the first import of this module (main imports it first)
+T0 = time.perf_counter()
+
+
+class StartupTimer:
+    def __init__(self, t0: float = None):
+        self.t0 = T0 if t0 is None else t0
+        self.phases = {}
+        self.reported = False
+
+    def mark(self, phase: str) -> float:
+        """Record `phase` (first occurrence wins); returns seconds since start."""
+        elapsed = time.perf_counter() - self.t0
+        self.phases.setdefault(phase, round(elapsed * 1000, 1))
+        return elapsed
+
+    def report(self) -> dict:
+        """Log the phases (ms since start) once; returns them."""
+        if not self.reported:
+            self.reported = True
+            logger.info("startup.timing", extra={"phases_ms": dict(self.phases)})
+        return dict(self.phases)
+
+
+timer = StartupTimer()
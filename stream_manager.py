@@ -1,19 +1,404 @@
-import subprocess
-import shlex
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VIDEO = {"codec": "libx264", "preset": "veryfast", "bitrate": "3000k", "gop": 60}
+DEFAULT_AUDIO = {"codec": "aac", "bitrate": "160k"}
+DEFAULT_TAP_PORT = 23000
+
+# tee reports a dropped slave as "Slave muxer #1 failed: ..., continuing with 2/3 slaves."
+_SLAVE_FAILED = re.compile(r"Slave muxer #(\d+) failed")
+
+# tee's own slave options; everything else in `options` is a muxer option, valid as a CLI flag too
+TEE_SLAVE_OPTIONS = frozenset({"f", "onfail", "select", "bsfs", "use_fifo", "fifo_options"})
+
+
+def _to_float(value):
+    try:
+        return float(str(value).rstrip("x").replace("kbits/s", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_progress(block: dict) -> dict:
+    """Convert one raw `-progress` key=value block into typed metrics."""
+    out_time_us = _to_int(block.get("out_time_us") or block.get("out_time_ms"))
+    return {
+        "frame": _to_int(block.get("frame")),
+        "fps": _to_float(block.get("fps")),
+        "bitrate_kbps": _to_float(block.get("bitrate")),
+        "speed": _to_float(block.get("speed")),
+        "drop_frames": _to_int(block.get("drop_frames")),
+        "dup_frames": _to_int(block.get("dup_frames")),
+        "out_time": block.get("out_time"),
+        "out_time_s": out_time_us / 1e6 if out_time_us is not None else None,
+        "total_size": _to_int(block.get("total_size")),
+        "progress": block.get("progress"),
+    }
+
+
+def _tee_escape(value: str, specials: str) -> str:
+    """Backslash-escape characters that have a meaning in the tee muxer spec."""
+    out = str(value).replace("\\", "\\\\")
+    for ch in specials:
+        out = out.replace(ch, "\\" + ch)
+    return out
+
+
+def endpoint_url(ep: dict) -> str:
+    url = ep["url"]
+    key = ep.get("key")
+    if key:
+        url = url.rstrip("/") + "/" + key
+    return url
+
+
+def tee_slave(ep: dict) -> str:
+    """Build one tee slave, e.g. `[f=flv:onfail=ignore]rtmp://host/app/key`.
+
+    Per-endpoint muxer options come from `ep['options']`; `format` and `onfail`
+    default to `flv` and `ignore` so one failing platform never stops the rest.
+    """
+    opts = {"f": ep.get("format", "flv"), "onfail": ep.get("onfail", "ignore")}
+    opts.update(ep.get("options") or {})
+    spec = ":".join(f"{k}={_tee_escape(v, ':|[]')}" for k, v in opts.items())
+    return f"[{spec}]{_tee_escape(endpoint_url(ep), '|')}"
+
 
 class StreamManager:
+    """Single-encode multi-RTMP streaming through ffmpeg's tee muxer.
+
+    The input is encoded once and fanned out to every endpoint, instead of one
+    ffmpeg (and one encode) per platform. ffmpeg runs under an asyncio
+    supervisor that restarts it with backoff if it exits unexpectedly.
+
+    Encoder health comes from ffmpeg's `-progress` pipe (`metrics`, plus
+    `progress` events for listeners). With `recovery.enabled`, the tee also
+    writes a local UDP mpegts tap per endpoint; when tee drops one RTMP slave,
+    a `-c copy` relay re-publishes that endpoint from its tap, so the shared
+    encode keeps running for everyone else.
+    """
+
     def __init__(self, cfg=None):
         self.cfg = cfg or {}
+        self.endpoints = []
+        self.process = None
+        self.returncode = None
+        self.restarts = 0
+        self.stderr_tail = deque(maxlen=50)
+        self._task = None
+        self._stopping = False
+        self._started = None
+        self.metrics = {}
+        self.outputs = []
+        self.listeners = []
+        self._relays = {}
+        self._last_progress = None
+        self._last_out_time = None
+
+    def add_listener(self, callback):
+        """Register `callback(event: dict)` for progress/stall/output events."""
+        self.listeners.append(callback)
+
+    def _emit(self, event_type: str, **data):
+        event = dict(data, type=event_type, ts=time.time())
+        for cb in list(self.listeners):
+            try:
+                cb(event)
+            except Exception:
+                logger.exception("stream listener %r failed", cb)
+
+    def _recovery(self) -> dict:
+        return self.cfg.get("recovery") or {}
+
+    def tap_url(self, index: int, listen: bool = False) -> str:
+        port = int(self._recovery().get("tap_base_port", DEFAULT_TAP_PORT)) + index
+        if listen:
+            return f"udp://127.0.0.1:{port}?overrun_nonfatal=1&fifo_size=50000"
+        return f"udp://127.0.0.1:{port}?pkt_size=1316"
 
-    def start_stream(self, rtmp_endpoints):
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def build_command(self, rtmp_endpoints) -> list:
+        """Return the ffmpeg argv for one encode fanned out to `rtmp_endpoints`."""
+        if not rtmp_endpoints:
+            raise ValueError("at least one rtmp endpoint is required")
+        cfg = self.cfg
+        video = dict(DEFAULT_VIDEO, **(cfg.get("video") or {}))
+        audio = dict(DEFAULT_AUDIO, **(cfg.get("audio") or {}))
+        source = cfg.get("input")
+        if not source:
+            raise ValueError("stream.input is not configured")
+
+        cmd = [cfg.get("ffmpeg", "ffmpeg"), "-hide_banner", "-nostdin", "-loglevel", cfg.get("loglevel", "warning")]
+        if cfg.get("progress", True):
+            cmd += ["-progress", "pipe:1", "-stats_period", str(cfg.get("stats_period", 1))]
+        cmd += [str(a) for a in cfg.get("input_args", [])]
+        cmd += ["-i", str(source), "-map", "0:v?", "-map", "0:a?"]
+        cmd += ["-c:v", video["codec"]]
+        if video.get("preset"):
+            cmd += ["-preset", str(video["preset"])]
+        if video.get("bitrate"):
+            cmd += ["-b:v", str(video["bitrate"]), "-maxrate", str(video.get("maxrate", video["bitrate"]))]
+            cmd += ["-bufsize", str(video.get("bufsize", video["bitrate"]))]
+        if video.get("gop"):
+            cmd += ["-g", str(video["gop"])]
+        if video.get("pix_fmt", "yuv420p"):
+            cmd += ["-pix_fmt", video.get("pix_fmt", "yuv420p")]
+        cmd += ["-c:a", audio["codec"]]
+        if audio.get("bitrate"):
+            cmd += ["-b:a", str(audio["bitrate"])]
+        if audio.get("sample_rate"):
+            cmd += ["-ar", str(audio["sample_rate"])]
+        cmd += [str(a) for a in cfg.get("output_args", [])]
+        # flv slaves need codec extradata in global headers when muxed through tee
+        cmd += ["-flags", "+global_header", "-f", "tee"]
+        slaves = [tee_slave(ep) for ep in rtmp_endpoints]
+        if self._recovery().get("enabled"):
+            slaves += [tee_slave({"url": self.tap_url(i), "format": "mpegts"}) for i in range(len(rtmp_endpoints))]
+        cmd.append("|".join(slaves))
+        return cmd
+
+    def build_relay_command(self, index: int) -> list:
+        """Return a `-c copy` ffmpeg argv re-publishing endpoint `index` from its tap.
+
+        Output flags come from `ep['relay_options']` when set, else from the muxer options
+        in `ep['options']` (tee's own slave options are not ffmpeg flags and are left out).
         """
-        rtmp_endpoints: list of dicts {'url': 'rtmp://...', 'key': '...'}
-        Это заглушка, показывающая идею запуска ffmpeg для мульти-RTMP (через tee).
+        ep = self.endpoints[index]
+        cmd = [self.cfg.get("ffmpeg", "ffmpeg"), "-hide_banner", "-nostdin", "-loglevel", self.cfg.get("loglevel", "warning")]
+        cmd += ["-i", self.tap_url(index, listen=True), "-map", "0", "-c", "copy"]
+        options = ep.get("relay_options")
+        if options is None:
+            options = {k: v for k, v in (ep.get("options") or {}).items() if k not in TEE_SLAVE_OPTIONS}
+        for k, v in options.items():
+            cmd += [f"-{k}", str(v)]
+        cmd += ["-f", ep.get("format", "flv"), endpoint_url(ep)]
+        return cmd
+
+    async def start_stream(self, rtmp_endpoints=None):
         """
-        print("Starting stream to endpoints:", rtmp_endpoints)
-        # Пример команды (адаптируйте под свой поток и вход):
-        # command = "ffmpeg -re -i <input> -c:v libx264 -preset veryfast -b:v 3000k -c:a aac -f tee \"[f=flv]rtmp://a/...|[f=flv]rtmp://b/...\""
-        # subprocess.Popen(shlex.split(command))
+        rtmp_endpoints: list of dicts {'url': 'rtmp://...', 'key': '...', 'options': {...}}
+        Defaults to `rtmp_endpoints` from the stream config.
+        """
+        if self._task and not self._task.done():
+            raise RuntimeError("stream already running")
+        endpoints = [ep for ep in (rtmp_endpoints or self.cfg.get("rtmp_endpoints") or []) if ep.get("enabled", True)]
+        self.build_command(endpoints)  # validate before spawning anything
+        self.endpoints = endpoints
+        self._stopping = False
+        self.restarts = 0
+        self._started = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._supervise())
+        await self._started
+        logger.info("Stream started to %d endpoint(s)", len(endpoints))
+
+    async def _spawn(self):
+        cmd = self.build_command(self.endpoints)
+        logger.debug("ffmpeg command: %s", cmd)
+        return await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE if self.cfg.get("progress", True) else asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+    async def _supervise(self):
+        restart = self.cfg.get("restart") or {}
+        delay = base_delay = float(restart.get("delay", 2))
+        max_delay = float(restart.get("max_delay", 60))
+        max_restarts = restart.get("max_restarts")
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                self.process = await self._spawn()
+            except Exception as exc:
+                if not self._started.done():
+                    self._started.set_exception(exc)
+                    return
+                logger.exception("[ffmpeg] failed to spawn")
+            else:
+                if not self._started.done():
+                    self._started.set_result(None)
+                started_at = loop.time()
+                # armed by the first real out_time: a listen input may wait for OBS for a long time
+                self._last_progress = None
+                self._last_out_time = None
+                self.outputs = [{"platform": ep.get("platform"), "state": "ok", "failures": 0} for ep in self.endpoints]
+                watchdog = asyncio.create_task(self._watchdog(self.process))
+                try:
+                    pumps = [self._pump_stderr(self.process.stderr)]
+                    if self.process.stdout is not None:
+                        pumps.append(self._pump_progress(self.process.stdout))
+                    await asyncio.gather(*pumps)
+                    self.returncode = await self.process.wait()
+                finally:
+                    watchdog.cancel()
+                    # a fresh encoder carries every endpoint again
+                    await self._stop_relays()
+                if self._stopping:
+                    return
+                logger.warning("[ffmpeg] exited with code %s: %s", self.returncode,
+                               self.stderr_tail[-1] if self.stderr_tail else "")
+                if loop.time() - started_at > max_delay:
+                    delay = base_delay
+            if self._stopping or not restart.get("enabled", True):
+                return
+            if max_restarts is not None and self.restarts >= int(max_restarts):
+                logger.error("[ffmpeg] reached max restarts (%s), giving up", max_restarts)
+                return
+            self.restarts += 1
+            logger.info("[ffmpeg] restarting in %.1fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    async def _pump_stderr(self, stream):
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            text = line.decode("utf-8", errors="replace").rstrip()
+            if text:
+                self.stderr_tail.append(text)
+                logger.info("[ffmpeg] %s", text)
+                m = _SLAVE_FAILED.search(text)
+                if m:
+                    self._output_failed(int(m.group(1)), text)
+
+    async def _pump_progress(self, stream):
+        """Read `-progress` key=value blocks; each ends with `progress=continue|end`."""
+        block = {}
+        loop = asyncio.get_running_loop()
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            key, sep, value = line.decode("utf-8", errors="replace").strip().partition("=")
+            if not sep:
+                continue
+            block[key] = value
+            if key != "progress":
+                continue
+            metrics = parse_progress(block)
+            block = {}
+            if metrics["out_time_s"] is not None and metrics["out_time_s"] != self._last_out_time:
+                self._last_out_time = metrics["out_time_s"]
+                self._last_progress = loop.time()
+            self.metrics = metrics
+            self._emit("progress", **metrics)
+
+    async def _watchdog(self, proc):
+        """Recycle the encoder when its output time stops advancing (once it has started)."""
+        timeout = float(self.cfg.get("stall_timeout", 15))
+        if timeout <= 0 or proc.stdout is None:
+            return
+        loop = asyncio.get_running_loop()
+        while proc.returncode is None:
+            await asyncio.sleep(min(1.0, timeout / 2))
+            if self._last_progress is None:
+                continue
+            idle = loop.time() - self._last_progress
+            if idle > timeout and proc.returncode is None:
+                logger.warning("[ffmpeg] no progress for %.1fs, restarting encoder", idle)
+                self._emit("stalled", idle=idle)
+                try:
+                    proc.terminate()
+                except ProcessLookupError:
+                    pass
+                return
+
+    def _output_failed(self, index: int, reason: str):
+        if index >= len(self.endpoints):
+            logger.warning("[ffmpeg] recovery tap #%d failed: %s", index - len(self.endpoints), reason)
+            return
+        status = self.outputs[index]
+        status["state"] = "failed"
+        status["failures"] += 1
+        self._emit("output_failed", index=index, platform=status["platform"], reason=reason)
+        if self._recovery().get("enabled") and index not in self._relays and not self._stopping:
+            self._relays[index] = asyncio.create_task(self._relay(index))
+
+    async def _relay(self, index: int):
+        """Keep a copy relay for one failed endpoint alive until the encoder restarts."""
+        recovery = self._recovery()
+        delay = base_delay = float(recovery.get("delay", 2))
+        max_delay = float(recovery.get("max_delay", 30))
+        status = self.outputs[index]
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            proc = None
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *self.build_relay_command(index),
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                status["state"] = "relay"
+                self._emit("output_recovered", index=index, platform=status["platform"])
+                started_at = loop.time()
+                while True:
+                    line = await proc.stderr.readline()
+                    if not line:
+                        break
+                    logger.info("[ffmpeg relay #%d] %s", index, line.decode("utf-8", errors="replace").rstrip())
+                code = await proc.wait()
+                if loop.time() - started_at > max_delay:
+                    delay = base_delay
+                logger.warning("[ffmpeg relay #%d] exited with code %s", index, code)
+            except asyncio.CancelledError:
+                if proc is not None and proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                raise
+            except Exception:
+                logger.exception("[ffmpeg relay #%d] failed to spawn", index)
+            status["state"] = "failed"
+            status["failures"] += 1
+            self._emit("output_failed", index=index, platform=status["platform"], reason="relay exited")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    async def _stop_relays(self):
+        relays = list(self._relays.values())
+        self._relays.clear()
+        for task in relays:
+            task.cancel()
+        if relays:
+            await asyncio.gather(*relays, return_exceptions=True)
 
-    def stop_stream(self):
-        print("Stopping stream (stub).")
+    async def stop_stream(self, timeout: float = 10):
+        """Stop ffmpeg gracefully (SIGTERM lets it finalize outputs), then kill."""
+        self._stopping = True
+        proc = self.process
+        if proc is not None and proc.returncode is None:
+            try:
+                proc.terminate()
+            except ProcessLookupError:
+                pass
+            try:
+                await asyncio.wait_for(proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("[ffmpeg] did not exit in %.0fs, killing", timeout)
+                proc.kill()
+                await proc.wait()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._stop_relays()
+        self.process = None
+        logger.info("Stream stopped")
@@ -0,0 +1,187 @@
+"""Structured-concurrency supervisor and liveness watchdog.
+
+`Supervisor` runs named child coroutines inside one `asyncio.TaskGroup` and
+restarts them according to their policy. `LivenessWatchdog` force-recycles
+connections that stop showing any sign of life (no traffic, no PING) within a
+deadline, so a half-open socket cannot stall chat silently.
+"""
+
+import asyncio
+import logging
+import signal
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+ALWAYS = "always"          # restart whenever the child returns or fails
+ON_FAILURE = "on-failure"  # restart only when the child raises
+NEVER = "never"            # run once
+
+
+@dataclass
+class ChildSpec:
+    name: str
+    factory: Callable[[], Awaitable]
+    restart: str = ON_FAILURE
+    backoff: float = 1.0
+    max_backoff: float = 60.0
+    max_restarts: Optional[int] = None
+    critical: bool = False  # shut the whole supervisor down if this child gives up
+    health: Optional[Callable[[], dict]] = field(default=None, repr=False)  # extra state for status()
+    state: str = "pending"
+    restarts: int = 0
+    last_error: Optional[str] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+
+class Supervisor:
+    def __init__(self, name: str = "main"):
+        self.name = name
+        self.children = {}
+        self._shutdown = asyncio.Event()
+        self._group = None
+
+    def add(self, name: str, factory: Callable[[], Awaitable], restart: str = ON_FAILURE, **opts) -> ChildSpec:
+        """Register a child; `factory()` must return a fresh coroutine on each call."""
+        if name in self.children:
+            raise ValueError(f"child {name!r} already registered")
+        spec = ChildSpec(name, factory, restart, **opts)
+        self.children[name] = spec
+        if self._group is not None:
+            spec.task = self._group.create_task(self._run_child(spec), name=f"{self.name}:{name}")
+        return spec
+
+    def status(self) -> dict:
+        status = {}
+        for n, c in self.children.items():
+            status[n] = {"state": c.state, "restarts": c.restarts, "last_error": c.last_error}
+            if c.health is not None:
+                status[n]["health"] = c.health()
+        return status
+
+    def shutdown(self):
+        """Request a graceful stop: every child is cancelled and run() returns."""
+        if not self._shutdown.is_set():
+            logger.info("[%s] shutdown requested", self.name)
+            self._shutdown.set()
+
+    def install_signal_handlers(self, signals=(signal.SIGINT, signal.SIGTERM)):
+        loop = asyncio.get_running_loop()
+        for sig in signals:
+            try:
+                loop.add_signal_handler(sig, self.shutdown)
+            except (NotImplementedError, RuntimeError):
+                # Windows event loops have no add_signal_handler
+                signal.signal(sig, lambda *_: loop.call_soon_threadsafe(self.shutdown))
+
+    async def run(self):
+        try:
+            async with asyncio.TaskGroup() as tg:
+                self._group = tg
+                for spec in self.children.values():
+                    spec.task = tg.create_task(self._run_child(spec), name=f"{self.name}:{spec.name}")
+                await self._shutdown.wait()
+                for spec in self.children.values():
+                    if spec.task is not None:
+                        spec.task.cancel()
+        finally:
+            self._group = None
+            logger.info("[%s] all children stopped", self.name)
+
+    async def _run_child(self, spec: ChildSpec):
+        delay = spec.backoff
+        while True:
+            spec.state = "running"
+            started = time.monotonic()
+            try:
+                await spec.factory()
+                failed = False
+                spec.state = "finished"
+            except asyncio.CancelledError:
+                spec.state = "cancelled"
+                raise
+            except Exception as exc:
+                failed = True
+                spec.state = "failed"
+                spec.last_error = repr(exc)
+                logger.exception("[%s] child %s failed", self.name, spec.name)
+
+            if spec.restart == NEVER or (spec.restart == ON_FAILURE and not failed):
+                break
+            if spec.max_restarts is not None and spec.restarts >= spec.max_restarts:
+                logger.error("[%s] child %s reached max restarts (%d)", self.name, spec.name, spec.max_restarts)
+                break
+            if time.monotonic() - started > spec.max_backoff:
+                delay = spec.backoff
+            spec.restarts += 1
+            spec.state = "restarting"
+            logger.info("[%s] restarting %s in %.1fs", self.name, spec.name, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, spec.max_backoff)
+
+        if spec.critical and spec.state == "failed":
+            logger.error("[%s] critical child %s gave up, shutting down", self.name, spec.name)
+            self.shutdown()
+        elif all(c is spec or c.task is None or c.task.done() for c in self.children.values()):
+            self.shutdown()
+
+
+class Liveness:
+    """Handle a connection uses to report activity to the watchdog."""
+
+    __slots__ = ("name", "recycle", "deadline", "last_seen", "recycled")
+
+    def __init__(self, name: str, recycle: Callable[[], None], deadline: float):
+        self.name = name
+        self.recycle = recycle
+        self.deadline = deadline
+        self.last_seen = time.monotonic()
+        self.recycled = 0
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def idle(self) -> float:
+        return time.monotonic() - self.last_seen
+
+
+class LivenessWatchdog:
+    """Recycle any registered connection idle for longer than its deadline."""
+
+    def __init__(self, deadline: float = 360.0, interval: float = 1.0):
+        self.deadline = deadline
+        self.interval = interval
+        self.entries = {}
+
+    def register(self, name: str, recycle: Callable[[], None], deadline: float = None) -> Liveness:
+        entry = Liveness(name, recycle, deadline or self.deadline)
+        self.entries[name] = entry
+        return entry
+
+    def unregister(self, entry: Liveness):
+        if self.entries.get(entry.name) is entry:
+            del self.entries[entry.name]
+
+    def check(self) -> list:
+        """Recycle stalled connections; returns the names that were recycled."""
+        stalled = []
+        for entry in list(self.entries.values()):
+            idle = entry.idle()
+            if idle <= entry.deadline:
+                continue
+            logger.warning("[watchdog] %s silent for %.0fs (deadline %.0fs), recycling", entry.name, idle, entry.deadline)
+            self.unregister(entry)
+            entry.recycled += 1
+            stalled.append(entry.name)
+            try:
+                entry.recycle()
+            except Exception:
+                logger.exception("[watchdog] failed to recycle %s", entry.name)
+        return stalled
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.check()
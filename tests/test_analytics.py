@@ -0,0 +1,53 @@
+import random
+from emotes import tokenize
+from analytics import ChatAnalytics, SlidingWindowCounter, HyperLogLog, SpaceSaving, CountMinSketch, ALL
+
+
+def test_sliding_window_forgets_old_buckets():
+    now = [0.0]
+    counter = SlidingWindowCounter(window=10, buckets=10, clock=lambda: now[0])
+    for t in range(20):
+        now[0] = t + 0.5
+        counter.add(2)
+    assert counter.count() == 20 and counter.rate() == 2.0
+    now[0] = 100.0
+    assert counter.count() == 0
+
+
+def test_hyperloglog_estimates_within_a_few_percent():
+    hll = HyperLogLog(12)
+    for i in range(50000):
+        hll.add(f"user{i}")
+        hll.add(f"user{i}")  # duplicates do not count
+    assert abs(hll.count() - 50000) / 50000 < 0.05
+    small = HyperLogLog(12)
+    for i in range(100):
+        small.add(str(i))
+    assert 95 <= small.count() <= 105
+
+
+def test_heavy_hitters_survive_a_flood_of_unique_items():
+    rng = random.Random(7)
+    ss, cms = SpaceSaving(k=20), CountMinSketch(width=1024, depth=4)
+    stream = ["KEKW"] * 3000 + ["LUL"] * 2000 + [f"noise{rng.random()}" for _ in range(20000)]
+    rng.shuffle(stream)
+    for item in stream:
+        ss.add(item)
+        cms.add(item)
+    top = [item for item, _ in ss.top(2)]
+    assert top == ["KEKW", "LUL"] and len(ss.counts) == 20
+    assert 3000 <= cms.estimate("KEKW") < 3100
+
+
+def test_chat_analytics_snapshot_per_channel_and_total():
+    now = [1000.0]
+    stats = ChatAnalytics({"windows": [10]}, clock=lambda: now[0])
+    segments = tokenize("Kappa hello Kappa", "25:0-4,12-16")
+    for author in ("a", "b", "a"):
+        stats({"channel": "c1", "author": author, "content": "Kappa hello Kappa", "segments": segments})
+    stats({"channel": "c2", "author": "z", "content": "Hello, hello!!", "tags": {}})
+    c1 = stats.snapshot("c1")
+    assert c1["messages"] == 3 and c1["unique_chatters"] == 2 and c1["rate"]["10s"] == 0.3
+    assert c1["top_emotes"] == [("Kappa", 6)] and c1["top_phrases"] == [("kappa hello kappa", 3)]
+    assert stats.snapshot(ALL)["unique_chatters"] == 3
+    assert stats.phrase_count("KAPPA hello kappa!") == 3
@@ -48,3 +48,27 @@ async def test_event_message_logs(caplog):
     # link should be removed by sanitizer
     assert getattr(rec, 'content') == 'Hello'
     assert isinstance(getattr(rec, 'tags'), dict)
+
+
+def test_apply_settings_joins_and_parts_live():
+    from config import Settings
+
+    class Writer:
+        def __init__(self):
+            self.lines = []
+
+        def is_closing(self):
+            return False
+
+        def write(self, data):
+            self.lines.append(data.decode())
+
+    old = Settings.from_config({"chat": {"twitch": {"streamer_login": "a", "channels": ["b"]}}}, {})
+    new = Settings.from_config({"chat": {"twitch": {"streamer_login": "a", "channels": ["c"]}}}, {})
+    agg = ChatAggregator(settings=old)
+    writer = Writer()
+    agg._irc_writers["irc-fallback"] = writer
+    agg._irc_channels = {"a", "b"}
+    agg.apply_settings(new, old)
+    assert agg.settings is new
+    assert writer.lines == ["JOIN #c\r\n", "PART #b\r\n"]
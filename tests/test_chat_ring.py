@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+from multiprocessing import shared_memory
+import pytest
+import chat_aggregator
+import chat_ring
+from chat_ring import ChatRingWriter, ChatRingReader
+
+
+@pytest.fixture
+def ring_name():
+    return f"test_chat_ring_{os.getpid()}"
+
+
+def test_reader_sees_published_records(ring_name):
+    writer = ChatRingWriter(ring_name, slots=8, slot_size=256)
+    try:
+        reader = ChatRingReader(ring_name)
+        writer.publish({"channel": "c", "author": "a", "content": "one"})
+        writer.publish({"channel": "c", "author": "b", "content": "two"})
+        assert [r["content"] for r in reader.read()] == ["one", "two"]
+        assert reader.read() == []
+        assert reader.gaps == 0
+        reader.close()
+    finally:
+        writer.close()
+
+
+def test_slow_reader_gets_gap_counter(ring_name):
+    writer = ChatRingWriter(ring_name, slots=4, slot_size=256)
+    try:
+        reader = ChatRingReader(ring_name)
+        for i in range(10):
+            writer.publish({"content": str(i)})
+        assert [r["content"] for r in reader.read()] == ["6", "7", "8", "9"]
+        assert reader.gaps == 6
+        reader.close()
+    finally:
+        writer.close()
+
+
+def test_oversized_record_dropped(ring_name):
+    writer = ChatRingWriter(ring_name, slots=4, slot_size=64)
+    try:
+        assert writer.publish({"content": "x", "tags": {"badge-info": "y" * 200}})
+        assert not writer.publish({"content": "x" * 200})
+        assert writer.dropped == 1
+    finally:
+        writer.close()
+
+
+def test_log_chat_message_feeds_ring(ring_name):
+    import types
+    agg = chat_aggregator.ChatAggregator({"shm_ring": {"enabled": True, "name": ring_name, "slots": 16}})
+    agg._start_ring()
+    try:
+        reader = ChatRingReader(ring_name)
+        msg = types.SimpleNamespace(channel=types.SimpleNamespace(name="vj_games"),
+                                    author=types.SimpleNamespace(name="someuser"),
+                                    content="hello", tags={}, echo=False)
+        chat_aggregator.log_chat_message(msg)
+        recs = reader.read()
+        assert recs[0]["channel"] == "vj_games" and recs[0]["content"] == "hello"
+        reader.close()
+    finally:
+        chat_aggregator.remove_sink(agg.ring.publish)
+        agg.ring.close()
+
+
+def test_shard_worker_does_not_take_over_the_ring(ring_name):
+    import types
+    cfg = {"shm_ring": {"enabled": True, "name": ring_name, "slots": 16}}
+    coordinator = chat_aggregator.ChatAggregator(cfg, role="coordinator")
+    coordinator._start_ring()
+    try:
+        worker = chat_aggregator.ChatAggregator(cfg, role="worker")
+        worker._start_ring()
+        assert worker.ring is None
+        reader = ChatRingReader(ring_name)
+        msg = types.SimpleNamespace(channel=types.SimpleNamespace(name="c"), author=types.SimpleNamespace(name="u"),
+                                    content="still here", tags={}, echo=False)
+        chat_aggregator.log_chat_message(msg)
+        assert [r["content"] for r in reader.read()] == ["still here"]
+        reader.close()
+    finally:
+        chat_aggregator.remove_sink(coordinator.ring.publish)
+        coordinator.ring.close()
+
+
+def test_live_ring_is_not_taken_over_but_a_stale_one_is(ring_name):
+    writer = ChatRingWriter(ring_name, slots=4, slot_size=64)
+    try:
+        reader = ChatRingReader(ring_name)
+        with pytest.raises(FileExistsError):
+            ChatRingWriter(ring_name, slots=4, slot_size=64)
+        writer.publish({"content": "x"})
+        assert [r["content"] for r in reader.read()] == ["x"]
+        reader.close()
+    finally:
+        writer.close()
+
+    # a block whose writer has exited
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    stale = shared_memory.SharedMemory(name=ring_name, create=True, size=64)
+    chat_ring._HEADER.pack_into(stale.buf, 0, chat_ring.MAGIC, 1, 16, dead.pid, 0)
+    stale.close()
+    writer = ChatRingWriter(ring_name, slots=4, slot_size=64)
+    writer.close()
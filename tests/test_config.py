@@ -18,3 +18,67 @@ def test_load_config_env_overrides(monkeypatch, tmp_path):
     merged = load_config(str(cfg))
     # TWITCH_STREAMER_LOGIN should be applied to returned config
     assert merged.get("chat", {}).get("twitch", {}).get("streamer_login") == "env_login"
+
+
+def test_settings_snapshot_is_validated_and_frozen():
+    import dataclasses
+    import pytest
+    from config import Settings
+
+    st = Settings.from_config(
+        {"chat": {"twitch": {"streamer_login": "VJ_Games", "channels": ["#other"]},
+                  "filters": {"ignore_authors": ["Nightbot"], "ignore_patterns": ["^!"]}}},
+        {"TWITCH_ECHO_MESSAGES": "false", "LOG_LEVEL": "debug", "TWITCH_RETRY_BASE": "7"},
+    )
+    assert st.channels == ("vj_games", "other")
+    assert st.echo_messages is False and st.log_level == "DEBUG" and st.retry_base == 7
+    assert not st.filters.accepts("nightbot", "hi")
+    assert not st.filters.accepts("someone", "!uptime")
+    assert st.filters.accepts("someone", "hello")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        st.echo_messages = True
+    with pytest.raises(ValueError):
+        Settings.from_config({}, {"LOG_LEVEL": "LOUD"})
+    with pytest.raises(ValueError):
+        Settings.from_config({}, {"TWITCH_RETRY_BASE": "soon"})
+    # 0 has always meant unlimited retries
+    assert Settings.from_config({}, {"TWITCH_RETRY_MAX_ATTEMPTS": "0"}).retry_max_attempts is None
+    assert Settings.from_config({}, {"TWITCH_RETRY_MAX_ATTEMPTS": "3"}).retry_max_attempts == 3
+
+
+def test_config_watcher_swaps_snapshot_and_notifies(monkeypatch, tmp_path):
+    from config import ConfigWatcher
+
+    monkeypatch.delenv("TWITCH_STREAMER_LOGIN", raising=False)
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+    cfg = tmp_path / "config.yaml"
+    env = tmp_path / ".env"
+    cfg.write_text("log_level: INFO\nchat:\n  twitch:\n    streamer_login: one\n")
+    env.write_text("TWITCH_ECHO_MESSAGES=true\n")
+    watcher = ConfigWatcher(str(cfg), str(env), interval=0.01)
+    seen = []
+    watcher.subscribe(lambda new, old: seen.append((old.channels, new.channels, new.echo_messages)))
+    assert watcher.check() is False
+
+    cfg.write_text("log_level: INFO\nchat:\n  twitch:\n    streamer_login: one\n    channels: [two]\n")
+    env.write_text("TWITCH_ECHO_MESSAGES=false\n# changed\n")
+    assert watcher.check() is True
+    assert seen == [(("one",), ("one", "two"), False)]
+
+    # invalid edits keep the previous snapshot
+    cfg.write_text("log_level: NOPE\n")
+    assert watcher.check() is False
+    assert watcher.current.channels == ("one", "two")
+
+
+def test_read_environ_drops_keys_deleted_from_dotenv(monkeypatch, tmp_path):
+    import config
+
+    # as if load_dotenv() had copied OBS_TEST_KEY from .env into os.environ at startup
+    monkeypatch.setenv("OBS_TEST_KEY", "startup")
+    monkeypatch.setattr(config, "_DOTENV_KEYS", frozenset({"OBS_TEST_KEY"}))
+    env = tmp_path / ".env"
+    env.write_text("OBS_TEST_KEY=edited\n")
+    assert config.read_environ(str(env))["OBS_TEST_KEY"] == "edited"
+    env.write_text("# removed\n")
+    assert "OBS_TEST_KEY" not in config.read_environ(str(env))
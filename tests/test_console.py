@@ -0,0 +1,52 @@
+import asyncio
+import io
+import pytest
+from console import ConsoleRenderer
+
+
+def _rec(channel, i, author="viewer"):
+    return {"channel": channel, "author": author, "content": f"m{i}"}
+
+
+def test_render_lines_and_summarizes_busy_channel():
+    console = ConsoleRenderer({"fps": 10, "max_rate": 20})
+    console({"channel": "quiet", "author": "a", "content": "hello"})
+    for i in range(50):
+        console(_rec("raid", i))
+    text = console.render(console.take(), now=10.0)
+    assert text == "[quiet] a: hello\n+50 messages in #raid\n"
+    assert console.written == 1 and console.summarized == 50
+
+
+def test_filters_and_bounded_buffer():
+    console = ConsoleRenderer({"channel": "c1", "author": "bob", "buffer": 3, "max_rate": 1000})
+    console(_rec("c2", 0, "bob"))
+    console(_rec("c1", 0, "alice"))
+    for i in range(5):
+        console(_rec("c1", i, "bob"))
+    assert console.render(console.take(), now=10.0) == "[c1] bob: m2\n[c1] bob: m3\n[c1] bob: m4\n+2 messages in #c1\n"
+
+
+@pytest.mark.asyncio
+async def test_slow_stream_never_blocks_the_sink():
+    class SlowStream(io.StringIO):
+        def write(self, text):
+            import time
+            time.sleep(0.2)  # a blocked terminal/pipe
+            return super().write(text)
+
+    stream = SlowStream()
+    console = ConsoleRenderer({"fps": 50}, stream=stream)
+    task = asyncio.create_task(console.run())
+    console(_rec("c", 0))
+    await asyncio.sleep(0.05)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for i in range(1, 100):
+        console(_rec("c", i))
+        await asyncio.sleep(0)
+    assert loop.time() - started < 0.1  # the event loop kept running during the write
+    await asyncio.sleep(0.5)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert stream.getvalue().startswith("[c] viewer: m0\n")
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import types
+import random
+import pytest
+from analytics import ChatAnalytics
+from copypasta import CopypastaFilter
+from chat_aggregator import ChatAggregator, emit_chat_record
+
+PASTA = "this stream is the best thing that ever happened to me and my whole family honestly"
+
+
+def _variant(rng, i):
+    words = PASTA.split()
+    words[rng.randrange(len(words))] = f"x{i}"  # one substituted word per copy
+    return " ".join(words) + "!" * (i % 3)
+
+
+def test_flood_collapses_after_threshold_and_expires():
+    now = [0.0]
+    f = CopypastaFilter({"threshold": 3, "window": 10}, clock=lambda: now[0])
+    rng = random.Random(1)
+    admitted = [f.admit("c", _variant(rng, i), f"user{i}") for i in range(200)]
+    assert admitted[:3] == [True, True, True]
+    assert admitted.count(True) < 10
+    # unrelated chat and short messages are untouched during the flood
+    assert f.admit("c", "what game are we playing after this one chat")
+    assert all(f.admit("c", "LUL LUL") for _ in range(20))
+    assert f.admit("other", PASTA)
+
+    [summary] = f.flush()
+    assert summary["channel"] == "c" and summary["collapsed"] == 200 - admitted.count(True)
+    assert summary["authors"] == summary["collapsed"]
+    assert f.flush() == []
+
+    now[0] = 100.0
+    f.flush()
+    assert f.admit("c", PASTA)  # the cluster expired: a new wave starts visible again
+
+
+def _message(i):
+    return types.SimpleNamespace(channel=types.SimpleNamespace(name="c"), author=types.SimpleNamespace(name=f"u{i}", id=str(i)),
+                                 id=str(i), content=PASTA, tags={}, echo=False)
+
+
+def test_aggregator_drops_collapsed_messages_before_emit():
+    chat = ChatAggregator({"copypasta": {"enabled": True, "threshold": 2}})
+    emitted = []
+    chat.emit = emitted.append
+    for i in range(10):
+        chat._publish(_message(i))
+    assert [r["id"] for r in emitted] == ["0", "1"]
+    assert chat.copypasta.collapsed == 8
+
+
+@pytest.mark.asyncio
+async def test_summary_is_its_own_record_type_and_credits_no_author(tmp_path, caplog):
+    chat = ChatAggregator({"copypasta": {"enabled": True, "threshold": 2, "flush_interval": 0.01},
+                           "first_seen": {"enabled": True, "path": str(tmp_path)}})
+    emitted = []
+    chat.emit = emitted.append
+    for i in range(10):
+        chat._publish(_message(i))
+    task = asyncio.create_task(chat._flush_copypasta())
+    for _ in range(100):
+        if len(emitted) > 2:
+            break
+        await asyncio.sleep(0.01)
+    task.cancel()
+    try:
+        summary = emitted[2]
+        assert summary["type"] == "copypasta" and summary["id"].startswith("copypasta-")
+        assert summary["author"] is None and summary["author_id"] is None
+        assert summary["collapsed"] == summary["collapsed_authors"] == summary["collapsed_first_seen"] == 8
+        # first-time chatters whose message was collapsed are still recorded as seen
+        assert not chat.first_seen.check("c", "9")
+    finally:
+        chat.first_seen.close()
+
+    with caplog.at_level(logging.INFO, logger="chat_aggregator"):
+        emit_chat_record(summary)
+    assert [r.getMessage() for r in caplog.records] == ["chat.copypasta"]
+    analytics = ChatAnalytics()
+    for record in emitted:
+        analytics(record)
+    stats = analytics.snapshot("c")
+    assert stats["messages"] == 10 and stats["unique_chatters"] == 2
@@ -0,0 +1,59 @@
+import json
+from chat_aggregator import chat_record
+from emotes import EmoteIndex, emote_spans, tokenize, UTF16
+
+
+def test_emote_spans_code_points_and_utf16():
+    # "😀 Kappa" : the emoji is one code point but two UTF-16 units
+    content = "😀 Kappa"
+    assert emote_spans(content, "25:2-6") == [(2, 7, "25")]
+    assert emote_spans(content, "25:3-7", offsets=UTF16) == [(2, 7, "25")]
+    # out-of-range and overlapping spans are dropped instead of mangling text
+    assert emote_spans("hi", "1:0-9") == []
+    assert emote_spans("LULW", "1:0-3/2:1-2") == [(0, 4, "1")]
+
+
+def test_tokenize_merges_tag_and_manifest_emotes(tmp_path):
+    manifest = tmp_path / "emotes.json"
+    manifest.write_text(json.dumps({
+        "global": {"KEKW": {"id": "bt1", "source": "bttv"}},
+        "channels": {"chan": {"catJAM": "7tv1"}},
+    }))
+    index = EmoteIndex(str(manifest))
+    segs = tokenize("Kappa KEKW so good catJAM", "25:0-4", index, "chan")
+    assert segs == [
+        {"type": "emote", "name": "Kappa", "id": "25", "source": "twitch"},
+        {"type": "text", "text": " "},
+        {"type": "emote", "name": "KEKW", "id": "bt1", "source": "bttv"},
+        {"type": "text", "text": " so good "},
+        {"type": "emote", "name": "catJAM", "id": "7tv1", "source": "third-party"},
+    ]
+    # channel emotes do not leak into other channels
+    assert [s["type"] for s in tokenize("catJAM", index=index, channel="other")] == ["text"]
+
+
+def test_emote_index_is_bounded_lru():
+    index = EmoteIndex(max_entries=2)
+    index.add("a", "1")
+    index.add("b", "2")
+    index.lookup("a")
+    index.add("c", "3")
+    assert len(index) == 2 and index.lookup("b") is None and index.lookup("a")["id"] == "1"
+
+
+def test_chat_record_segments_are_sanitized():
+    class Obj:
+        pass
+
+    msg = Obj()
+    msg.channel, msg.author = Obj(), Obj()
+    msg.channel.name, msg.author.name, msg.author.id = "chan", "viewer", None
+    msg.content = "Kappa   see https://example.com  Kappa"
+    msg.tags = {"emotes": "25:0-4,33-37"}
+    rec = chat_record(msg)
+    assert rec["content"] == "Kappa see Kappa"
+    assert rec["segments"] == [
+        {"type": "emote", "name": "Kappa", "id": "25", "source": "twitch"},
+        {"type": "text", "text": " see "},
+        {"type": "emote", "name": "Kappa", "id": "25", "source": "twitch"},
+    ]
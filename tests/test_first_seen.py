@@ -0,0 +1,39 @@
+import types
+from first_seen import FirstSeen, ScalableBloomFilter
+from chat_aggregator import ChatAggregator
+
+
+def test_scalable_filter_grows_and_keeps_error_rate(tmp_path):
+    bloom = ScalableBloomFilter(str(tmp_path / "c"), capacity=500, error_rate=0.01)
+    new = sum(bloom.add(f"user{i}") for i in range(5000))
+    assert new > 5000 * 0.99  # a false positive hides a new chatter, within the error rate
+    assert len(bloom.slices) > 1
+    assert not any(bloom.add(f"user{i}") for i in range(5000))  # never a false "first time"
+    false_positives = sum(f"other{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.01
+    bloom.close()
+
+
+def test_flags_survive_a_restart_and_are_per_channel(tmp_path):
+    seen = FirstSeen({"path": str(tmp_path)})
+    assert seen.check("a", "42") and not seen.check("a", "42")
+    assert seen.check("b", "42")
+    assert not seen.check("a", None)
+    seen.close()
+
+    seen = FirstSeen({"path": str(tmp_path)})
+    assert not seen.check("a", "42") and not seen.check("b", "42")
+    assert seen.check("a", "43")
+    seen.close()
+
+
+def test_records_carry_first_seen(tmp_path):
+    chat = ChatAggregator({"first_seen": {"enabled": True, "path": str(tmp_path)}})
+    emitted = []
+    chat.emit = emitted.append
+    for user_id in ("1", "2", "1"):
+        message = types.SimpleNamespace(channel=types.SimpleNamespace(name="c"), author=types.SimpleNamespace(name="u", id=user_id),
+                                        id=None, content="hi", tags={"user-id": user_id}, echo=False)
+        chat._publish(message)
+    assert [r["first_seen"] for r in emitted] == [True, True, False]
+    chat.first_seen.close()
@@ -0,0 +1,54 @@
+import logging
+import instrument
+from config import Settings
+from chat_aggregator import chat_record
+
+
+class CountingMessage:
+    """Message whose content read is counted, like the costly debug payloads."""
+
+    def __init__(self):
+        self.reads = 0
+        self.channel = type("C", (), {"name": "c"})()
+        self.author = type("A", (), {"name": "viewer", "id": "1"})()
+        self.tags = {}
+        self.echo = False
+
+    @property
+    def content(self):
+        self.reads += 1
+        return "hello"
+
+
+def _settings(log_level="INFO", debug=None):
+    return Settings.from_config({"log_level": log_level, "debug": debug or {}})
+
+
+def test_gates_follow_log_level_and_per_subsystem_overrides():
+    instrument.configure(_settings("DEBUG", {"twitchio": False, "irc": {"sample": 3}}))
+    snap = instrument.snapshot()
+    assert snap["twitchio"]["enabled"] is False
+    assert snap["records"] == {"enabled": True, "sample": 1}
+    irc = instrument.gate("irc")
+    assert [irc.sample() for _ in range(6)] == [False, False, True, False, False, True]
+
+    instrument.configure(_settings("INFO", {"records": True}))
+    assert not instrument.gate("irc").enabled
+    assert instrument.gate("records").enabled and instrument.gate("records").level == logging.INFO
+    instrument.configure(_settings())
+
+
+def test_disabled_gate_skips_building_the_payload(caplog):
+    caplog.set_level(logging.DEBUG, logger="chat_aggregator")
+    instrument.configure(_settings("INFO"))
+    msg = CountingMessage()
+    chat_record(msg)
+    assert msg.reads == 1  # only the record itself
+    assert not [r for r in caplog.records if r.getMessage() == "log_chat_message invoked"]
+
+    instrument.configure(_settings("DEBUG"))
+    msg = CountingMessage()
+    chat_record(msg)
+    assert msg.reads == 2
+    assert [r for r in caplog.records if r.getMessage() == "log_chat_message invoked"]
+    instrument.configure(_settings())
@@ -0,0 +1,45 @@
+from chat_aggregator import ChatAggregator, _IrcConnection
+from irc_stream import LineSplitter, ReceiveStats
+from keepalive import ConnectionHealth
+
+
+def test_splitter_keeps_partial_tails_and_multibyte_chars():
+    splitter = LineSplitter()
+    data = "PING :a\r\n:u!u@u PRIVMSG #c :привет\r\n:u!u@u PRIVMSG #c :bye\r\n".encode("utf-8")
+    cut = data.index("привет".encode("utf-8")) + 1  # inside a two-byte character
+    assert splitter.feed(data[:cut]) == ["PING :a"]
+    assert splitter.feed(data[cut:-3]) == [":u!u@u PRIVMSG #c :привет"]
+    assert splitter.feed(data[-3:]) == [":u!u@u PRIVMSG #c :bye"]
+    assert splitter.feed(b"") == []
+
+
+def test_splitter_drops_runaway_line():
+    splitter = LineSplitter(max_line=8)
+    assert splitter.feed(b"x" * 20) == [] and splitter.dropped == 1
+    assert splitter.feed(b"ok\r\n") == ["ok"]
+
+
+def test_batch_dispatch_emits_records_and_answers_ping():
+    class Writer:
+        def __init__(self):
+            self.data = b""
+
+        def write(self, data):
+            self.data += data
+
+    agg = ChatAggregator({})
+    records = []
+    agg.emit = records.append
+    conn = _IrcConnection("irc-fallback", Writer(), ConnectionHealth("irc-fallback"))
+    stats = ReceiveStats()
+    lines = LineSplitter().feed(
+        b":tmi.twitch.tv 001 bot :Welcome\r\n"
+        b"PING :tmi.twitch.tv\r\n"
+        b"@id=m1;user-id=7 :a!a@a.tmi.twitch.tv PRIVMSG #chan :one\r\n"
+        b"@id=m2;user-id=8 :b!b@b.tmi.twitch.tv PRIVMSG #chan :two\r\n")
+    agg._handle_irc_lines(conn, lines, stats)
+    stats.record_batch(100, len(lines), 0.001)
+    assert [(r["id"], r["author_id"], r["content"]) for r in records] == [("m1", "7", "one"), ("m2", "8", "two")]
+    assert conn.writer.data == b"PONG :tmi.twitch.tv\r\n" and conn.pending_drain and conn.welcomed
+    snap = stats.snapshot()
+    assert snap["lines"] == 4 and snap["lines_per_batch"] == 4 and snap["max_line_us"] > 0
@@ -0,0 +1,57 @@
+import asyncio
+import socket
+import pytest
+from keepalive import ConnectionHealth, HealthRegistry, set_tcp_keepalive
+
+
+def test_pong_measures_rtt_and_clears_missed():
+    h = ConnectionHealth("c", cfg={"timeout": 0})
+    h.connected = True
+    first = h.next_ping().decode()
+    assert first == "PING :ka-1\r\n"
+    h.next_ping()
+    assert h.on_pong(":tmi.twitch.tv PONG tmi.twitch.tv :unrelated") is None
+    rtt = h.on_pong(":tmi.twitch.tv PONG tmi.twitch.tv :ka-2")
+    assert rtt is not None and h.srtt == rtt and len(h.history) == 1
+    # ka-1 was older than the answered ping and is dropped, not counted as missed
+    assert h.expire() == 0
+    h.next_ping()
+    assert h.expire() == 1 and h.degraded
+
+
+def test_registry_prefers_healthiest_with_hysteresis():
+    reg = HealthRegistry(margin=0.2)
+    a = ConnectionHealth("a", ["chan"])
+    b = ConnectionHealth("b", ["chan"])
+    for h, rtt in ((a, 0.05), (b, 0.20)):
+        h.connected = True
+        h.record(rtt)
+        reg.register(h)
+    assert reg.is_primary("a", "chan") and not reg.is_primary("b", "chan")
+    a.record(0.055)
+    b.srtt = 0.05  # only marginally better: keep the current primary
+    assert reg.primary("chan") == "a"
+    a.missed = 1   # degraded primary: fail over
+    assert reg.primary("chan") == "b"
+    b.connected = False
+    assert reg.primary("chan") == "a"
+    assert reg.snapshot()["b"]["connected"] is False
+
+
+@pytest.mark.asyncio
+async def test_keepalive_recycles_after_missed_pongs():
+    h = ConnectionHealth("c", cfg={"interval": 0.01, "timeout": 0.01, "max_missed": 2})
+    sent, recycled = [], []
+    await asyncio.wait_for(h.run(sent.append, lambda: recycled.append(True)), 1)
+    assert len(sent) == 2 and recycled == [True]
+
+
+def test_set_tcp_keepalive():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        set_tcp_keepalive(sock, idle=7, interval=3, count=2)
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE) == 1
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE) == 7
+    finally:
+        sock.close()
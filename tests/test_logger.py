@@ -0,0 +1,89 @@
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import show_chat
+from logger import ChatLogHandler, prune_backups, setup_logging
+
+
+def _record(i):
+    return logging.LogRecord("chat_aggregator", logging.INFO, __file__, 0, "chat.message %d" % i, None, None)
+
+
+def test_rotated_files_are_compressed_and_read_back_in_order(tmp_path):
+    log = str(tmp_path / "obs_multichat.log")
+    handler = ChatLogHandler(log, {"max_mb": 0.001, "rotate_hours": 0, "keep_days": 0, "max_total_mb": 0})
+    try:
+        for i in range(1000):
+            handler.emit(_record(i))
+        handler.wait()
+    finally:
+        handler.close()
+
+    files = show_chat.log_files(log)
+    assert files[-1] == log and len(files) > 2
+    assert all(f.endswith(".gz") for f in files[:-1])
+    lines = []
+    for path in files:
+        with show_chat.open_log(path) as f:
+            lines.extend(l.decode().strip() for l in f)
+    assert lines == ["chat.message %d" % i for i in range(1000)]
+    assert show_chat.tail_logs(log, 60) == lines[-60:]
+
+
+def test_prune_by_age_then_disk_budget(tmp_path):
+    log = tmp_path / "obs_multichat.log"
+    log.write_bytes(b"x" * 1000)
+    for i, stamp in enumerate(["20240101-000000", "20240102-000000", "20240103-000000"]):
+        path = tmp_path / f"obs_multichat.log.{stamp}.gz"
+        path.write_bytes(b"y" * 400 * 1024)
+        os.utime(path, (1000 + i * 86400, 1000 + i * 86400))
+
+    removed = prune_backups(str(log), keep_days=1.5, now=1000 + 2 * 86400 + 10)
+    assert [os.path.basename(p) for p in removed] == ["obs_multichat.log.20240101-000000.gz"]
+    removed = prune_backups(str(log), max_total_mb=0.5)
+    assert [os.path.basename(p) for p in removed] == ["obs_multichat.log.20240102-000000.gz"]
+    assert show_chat.log_files(str(log)) == [str(tmp_path / "obs_multichat.log.20240103-000000.gz"), str(log)]
+
+
+def test_stats_stream_gzipped_backups(tmp_path):
+    log = tmp_path / "obs_multichat.log"
+    rec = {"asctime": "2024-01-01 10:00:01,000", "message": "chat.message", "channel": "c", "author": "alice"}
+    with gzip.open(str(log) + ".20240101-100000.gz", "wt") as f:
+        f.write(json.dumps(rec) + "\n")
+    log.write_text(json.dumps(dict(rec, author="bob")) + "\n")
+    report = show_chat.collect_stats(show_chat.log_files(str(log)), workers=0).report()
+    assert report["messages"] == 2 and report["chatters"] == 2
+
+
+def _spawned_child(log_dir):
+    # what a shard worker does when it re-imports main.py: set up logging and log
+    setup_logging(log_dir=log_dir)
+    logging.getLogger("child").info("chat.message from child")
+    handler = next(h for h in logging.getLogger().handlers if isinstance(h, ChatLogHandler))
+    started = handler._worker is not None
+    handler.close()
+    raise SystemExit(1 if started else 0)
+
+
+def test_spawned_child_leaves_backups_to_the_parent(tmp_path):
+    log = str(tmp_path / "obs_multichat.log")
+    backup = log + ".20240101-000000"
+    content = b"".join(b"chat.message %d\n" % i for i in range(50000))
+    with open(backup, "wb") as f:
+        f.write(content)
+    handler = ChatLogHandler(log, {"keep_days": 0, "max_total_mb": 0})
+    child = multiprocessing.get_context("spawn").Process(target=_spawned_child, args=(str(tmp_path),))
+    try:
+        child.start()
+        handler.emit(_record(0))
+        handler.wait()
+        child.join(30)
+    finally:
+        handler.close()
+
+    assert child.exitcode == 0
+    assert sorted(os.listdir(tmp_path)) == ["obs_multichat.log", "obs_multichat.log.20240101-000000.gz"]
+    with gzip.open(backup + ".gz", "rb") as f:
+        assert f.read() == content
@@ -0,0 +1,130 @@
+import asyncio
+import time
+import pytest
+import pytest_asyncio
+from aiohttp import web
+import twitch_auth
+from config import Settings
+from metadata_updater import MetadataUpdater
+
+
+@pytest_asyncio.fixture
+async def mock_api():
+    state = {"requests": [], "fail": {}, "delay": 0}
+
+    async def handler(request):
+        platform = request.match_info["platform"]
+        state["requests"].append((platform, request.method, dict(request.query), await request.json(), dict(request.headers)))
+        if state["delay"]:
+            await asyncio.sleep(state["delay"])
+        fails = state["fail"].get(platform)
+        if fails:
+            status = fails.pop(0)
+            return web.Response(status=status, headers={"Retry-After": "0"} if status == 429 else {})
+        return web.Response(status=204)
+
+    app = web.Application()
+    app.router.add_route("*", "/{platform}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    state["base"] = f"http://127.0.0.1:{port}"
+    yield state
+    await runner.cleanup()
+
+
+def _updater(api, **cfg):
+    platforms = {
+        "twitch": {"url": api["base"] + "/twitch", "token": "oauth:abc", "client_id": "cid", "broadcaster_id": "42"},
+        "vk": {"url": api["base"] + "/vk", "method": "POST", "fields": {"title": "name"}},
+    }
+    return MetadataUpdater(dict({"debounce": 0.05, "retry_delay": 0.01, "platforms": platforms}, **cfg))
+
+
+@pytest.mark.asyncio
+async def test_rapid_changes_coalesce_into_one_request(mock_api):
+    meta = _updater(mock_api)
+    for i in range(5):
+        meta.update("twitch", {"title": f"title {i}"})
+    meta.update("twitch", {"game_id": "509658"})
+    await asyncio.sleep(0.2)
+    await meta.flush()
+    await meta.close()
+    assert len(mock_api["requests"]) == 1
+    platform, method, query, body, headers = mock_api["requests"][0]
+    assert (platform, method, query) == ("twitch", "PATCH", {"broadcaster_id": "42"})
+    assert body == {"title": "title 4", "game_id": "509658"}
+    assert headers["Authorization"] == "Bearer abc" and headers["Client-Id"] == "cid"
+
+
+@pytest.mark.asyncio
+async def test_only_changed_fields_are_sent(mock_api):
+    meta = _updater(mock_api)
+    meta.update("twitch", {"title": "A", "game_id": "1"})
+    await meta.flush()
+    meta.update("twitch", {"title": "A", "game_id": "2"})
+    await meta.flush()
+    meta.update("twitch", {"title": "A"})
+    await meta.flush()
+    await meta.close()
+    assert [r[3] for r in mock_api["requests"]] == [{"title": "A", "game_id": "1"}, {"game_id": "2"}]
+
+
+@pytest.mark.asyncio
+async def test_platforms_updated_concurrently(mock_api):
+    mock_api["delay"] = 0.3
+    meta = _updater(mock_api, debounce=0)
+    start = time.monotonic()
+    meta.update_all({"title": "Event"})
+    await asyncio.sleep(0)
+    await meta.flush()
+    elapsed = time.monotonic() - start
+    await meta.close()
+    assert sorted(r[0] for r in mock_api["requests"]) == ["twitch", "vk"]
+    assert [r[3] for r in mock_api["requests"] if r[0] == "vk"] == [{"name": "Event"}]
+    assert elapsed < 0.55
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_and_server_errors_are_retried(mock_api):
+    mock_api["fail"]["twitch"] = [429, 503]
+    meta = _updater(mock_api)
+    meta.update("twitch", {"title": "retry me"})
+    await meta.flush()
+    await meta.close()
+    assert len(mock_api["requests"]) == 3
+    assert meta.acked["twitch"] == {"title": "retry me"}
+
+
+@pytest.mark.asyncio
+async def test_client_error_is_not_retried(mock_api):
+    mock_api["fail"]["vk"] = [400]
+    meta = _updater(mock_api)
+    meta.update("vk", {"title": "bad"})
+    await meta.flush()
+    await meta.close()
+    assert len(mock_api["requests"]) == 1
+    assert meta.delta("vk") == {"title": "bad"}
+
+
+@pytest.mark.asyncio
+async def test_twitch_token_follows_settings_and_refreshes_on_401(mock_api, monkeypatch):
+    saved = {}
+    monkeypatch.setattr(twitch_auth, "read_tokens_from_env", lambda: {"access_token": "oauth:old", "refresh_token": "r1"})
+    monkeypatch.setattr(twitch_auth, "refresh_access_token",
+                        lambda cid, secret, refresh: {"access_token": "fresh", "refresh_token": "r2", "expires_in": 60})
+    monkeypatch.setattr(twitch_auth, "write_tokens_to_env", lambda *args: saved.setdefault("tokens", args))
+    platforms = {"twitch": {"url": mock_api["base"] + "/twitch", "broadcaster_id": "42"}}
+    meta = MetadataUpdater({"debounce": 0.01, "retry_delay": 0.01, "platforms": platforms},
+                           settings=Settings(irc_token="oauth:startup", client_id="cid", client_secret="s"))
+    meta.apply_settings(Settings(irc_token="oauth:old", client_id="cid", client_secret="s"))
+    mock_api["fail"]["twitch"] = [401]
+    meta.update("twitch", {"title": "after refresh"})
+    await meta.flush()
+    await meta.close()
+    auth = [r[4]["Authorization"] for r in mock_api["requests"]]
+    assert auth == ["Bearer old", "Bearer fresh"]
+    assert saved["tokens"] == ("fresh", "r2", 60)
+    assert meta.acked["twitch"] == {"title": "after refresh"}
@@ -0,0 +1,71 @@
+import os
+import chat_aggregator
+from chat_aggregator import _parse_irc_line, moderation_event, apply_moderation, emit_chat_record, add_sink, remove_sink
+from chat_ring import ChatRingWriter, ChatRingReader
+from moderation import ModerationIndex, RecentMessages
+
+
+def _rec(i, author="spammer", author_id="42", channel="chan"):
+    return {"id": f"m{i}", "channel": channel, "author": author, "author_id": author_id, "content": f"msg {i}"}
+
+
+def test_index_deletes_by_message_user_and_channel():
+    index = ModerationIndex()
+    cache = RecentMessages(100)
+    for i in range(5):
+        index.track(_rec(i), cache.redact, cache(_rec(i)))
+    index.track(_rec(5, "viewer", "7"), cache.redact, cache(_rec(5, "viewer", "7")))
+    index.track(_rec(6, "viewer", "7", "other"), cache.redact, cache(_rec(6, "viewer", "7", "other")))
+
+    assert index.delete("m0") == 1 and index.delete("m0") == 0
+    assert index.clear_user("chan", user_id="42") == 4
+    assert [r["id"] for r in cache.recent()] == ["m5", "m6"]
+    assert index.clear_user("chan", login="VIEWER") == 1
+    assert index.clear_channel("other") == 1 and len(cache) == 0 and len(index) == 0
+
+
+def test_index_is_bounded():
+    index = ModerationIndex(max_tracked=3)
+    for i in range(10):
+        index.track(_rec(i), lambda h: True, i + 1)
+    assert len(index) == 3 and index.delete("m0") == 0
+    assert index.clear_user("chan", user_id="42") == 3
+
+
+def test_parse_clearmsg_and_clearchat_lines():
+    tags, prefix, command, params = _parse_irc_line(
+        r"@login=spammer;room-id=1;target-msg-id=abc-1;tmi-sent-ts=1 :tmi.twitch.tv CLEARMSG #chan :buy\sfollowers")
+    assert command == "CLEARMSG" and params == ["#chan", "buy\\sfollowers"]
+    assert moderation_event(command, "chan", tags, params) == {"type": "clearmsg", "channel": "chan", "id": "abc-1", "login": "spammer"}
+
+    tags, _, command, params = _parse_irc_line("@ban-duration=600;room-id=1;target-user-id=42 :tmi.twitch.tv CLEARCHAT #chan :spammer")
+    assert moderation_event(command, "chan", tags, params) == {
+        "type": "clearchat", "channel": "chan", "user_id": "42", "login": "spammer", "duration": 600}
+
+    tags, prefix, command, params = _parse_irc_line(r"@display-name=A\sB;id=x :a!a@a.tmi.twitch.tv PRIVMSG #chan :hi :)")
+    assert tags["display-name"] == "A B" and prefix.split("!")[0] == "a" and params == ["#chan", "hi :)"]
+
+
+def test_apply_moderation_redacts_ring_and_notifies_readers():
+    name = f"test_moderation_ring_{os.getpid()}"
+    ring = ChatRingWriter(name, slots=8, slot_size=512)
+    cache = RecentMessages(10)
+    add_sink(ring.publish, redact=ring.redact, moderation_events=True)
+    add_sink(cache, redact=cache.redact)
+    try:
+        reader = ChatRingReader(name)
+        for i in range(3):
+            emit_chat_record(_rec(i))
+        emit_chat_record(_rec(3, "viewer", "7"))
+        assert apply_moderation({"type": "clearchat", "channel": "chan", "user_id": "42", "login": "spammer"}) == 6
+        records = reader.read()
+        assert [r.get("deleted", False) for r in records[:4]] == [True, True, True, False]
+        assert records[0]["content"] == "" and records[3]["content"] == "msg 3"
+        assert records[4]["type"] == "clearchat"
+        assert [r["id"] for r in cache.recent()] == ["m3"]
+        reader.close()
+    finally:
+        remove_sink(ring.publish)
+        remove_sink(cache)
+        ring.close()
+        chat_aggregator.moderation.clear_channel("chan")
@@ -0,0 +1,153 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from chat_aggregator import ChatAggregator
+from platforms import PlatformAdapter, PollingChatAdapter, create_adapter
+
+
+@pytest_asyncio.fixture
+async def chat_api():
+    """Mock liveChat endpoint: `pending` items are served once, with page tokens and ETags."""
+    state = {"requests": [], "pending": [], "page": 0, "interval_ms": 10, "fail": []}
+
+    async def handler(request):
+        state["requests"].append((dict(request.query), dict(request.headers)))
+        if state["fail"]:
+            return web.Response(status=state["fail"].pop(0), headers={"Retry-After": "0"})
+        etag = f'"p{state["page"]}"'
+        if not state["pending"] and request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+        items, state["pending"] = state["pending"], []
+        if items:
+            state["page"] += 1
+            etag = f'"p{state["page"]}"'
+        return web.json_response({"items": items, "nextPageToken": f"tok{state['page']}",
+                                  "pollingIntervalMillis": state["interval_ms"]}, headers={"ETag": etag})
+
+    app = web.Application()
+    app.router.add_get("/chat", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    state["url"] = f"http://127.0.0.1:{port}/chat"
+    yield state
+    await runner.cleanup()
+
+
+def _item(i, text="hello"):
+    return {"id": f"m{i}", "authorDetails": {"displayName": f"viewer{i}", "channelId": f"UC{i}"},
+            "snippet": {"displayMessage": text}}
+
+
+def _adapter(api, **cfg):
+    return PollingChatAdapter("youtube", dict({"url": api["url"], "channel": "yt", "min_interval": 0.01,
+                                               "max_interval": 0.5, "error_delay": 0.01, "params": {"liveChatId": "L1"}}, **cfg))
+
+
+@pytest.mark.asyncio
+async def test_poll_follows_tokens_conditional_requests_and_idle_backoff(chat_api):
+    chat_api["pending"] = [_item(1), _item(2)]
+    adapter = _adapter(chat_api)
+    await adapter.connect()
+    try:
+        first = await adapter.poll()
+        assert [(m.id, m.author.name, m.author.id, m.content, m.channel.name) for m in first] == \
+            [("m1", "viewer1", "UC1", "hello", "yt"), ("m2", "viewer2", "UC2", "hello", "yt")]
+        assert adapter.delay == pytest.approx(0.01)  # server suggests 10 ms and chat is busy
+
+        delays = []
+        for _ in range(6):
+            assert await adapter.poll() == []
+            delays.append(adapter.delay)
+        assert delays == sorted(delays) and delays[-1] > 0.05 and delays[-1] <= 0.5
+        assert adapter.health.not_modified == 6
+
+        query, headers = chat_api["requests"][-1]
+        assert query == {"part": "snippet,authorDetails", "liveChatId": "L1", "pageToken": "tok1"}
+        assert headers["If-None-Match"] == '"p1"'
+
+        chat_api["pending"] = [_item(3), _item(2)]  # a repeated id is dropped
+        assert [m.id for m in await adapter.poll()] == ["m3"]
+        assert adapter.delay == pytest.approx(0.01)
+
+        chat_api["interval_ms"] = 200  # the server asks us to slow down
+        chat_api["pending"] = [_item(4)]
+        await adapter.poll()
+        assert adapter.delay == pytest.approx(0.2)
+    finally:
+        await adapter.close()
+
+
+@pytest.mark.asyncio
+async def test_errors_back_off_and_recover(chat_api):
+    chat_api["fail"] = [500, 500, 429]
+    adapter = _adapter(chat_api)
+    await adapter.connect()
+    try:
+        for _ in range(3):
+            assert await adapter.poll() == []
+        assert adapter.health.errors == 3 and adapter.health.last_error.startswith("HTTP 429")
+        chat_api["pending"] = [_item(1)]
+        assert len(await adapter.poll()) == 1
+        assert adapter.health.snapshot()["last_error"] is None
+    finally:
+        await adapter.close()
+
+
+@pytest.mark.asyncio
+async def test_platform_messages_reach_the_chat_pipeline(chat_api):
+    chat_api["pending"] = [_item(0, "old message before we connected")]
+    cfg = {"platforms": {"youtube": {"url": chat_api["url"], "channel": "yt", "min_interval": 0.01, "max_interval": 0.05}}}
+    chat = ChatAggregator(cfg)
+    emitted = []
+    chat.emit = emitted.append
+    chat._add_platforms()
+    adapter = chat.adapters["youtube"]
+    task = asyncio.create_task(chat._run_adapter(adapter))
+    try:
+        await asyncio.sleep(0.1)
+        chat_api["pending"] = [_item(1, "hi from youtube")]
+        for _ in range(100):
+            if emitted:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    assert [(r["channel"], r["author"], r["content"], r["tags"]["platform"]) for r in emitted] == \
+        [("yt", "viewer1", "hi from youtube", "youtube")]
+    assert not adapter.health.connected
+
+
+def test_malformed_items_are_coerced_or_skipped():
+    adapter = PollingChatAdapter("youtube", {"url": "http://unused"})
+    data = {"items": [{"id": 7, "authorDetails": {"displayName": 42, "channelId": 9}, "snippet": {"displayMessage": "hi"}},
+                      {"id": "m2", "snippet": {"displayMessage": {"text": "not a string"}}},
+                      {"id": "m3", "snippet": {}}, "garbage", None]}
+    [message] = adapter._parse(data)
+    assert (message.id, message.author.name, message.author.id, message.content) == ("7", "42", "9", "hi")
+    assert adapter._parse({"items": 5}) == []
+
+
+def test_adapter_health_is_part_of_supervisor_status():
+    chat = ChatAggregator({"platforms": {"youtube": {"url": "http://unused"}}})
+    chat._add_platforms()
+    status = chat.supervisor.status()["platform-youtube"]
+    assert status["health"] == chat.adapters["youtube"].health.snapshot()
+
+
+def test_incomplete_adapter_fails_on_instantiation():
+    class NoMessages(PlatformAdapter):
+        async def connect(self):
+            pass
+
+    with pytest.raises(TypeError):
+        NoMessages("kick")
+
+
+def test_unknown_adapter_type_is_rejected():
+    with pytest.raises(ValueError):
+        create_adapter("kick", {"type": "websocket"})
@@ -0,0 +1,58 @@
+import asyncio
+import random
+import pytest
+from reconnect import ReconnectScheduler, CircuitBreaker, CLOSED, OPEN, HALF_OPEN, PRIMARY, BACKGROUND
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    sched = ReconnectScheduler({"base": 1, "max": 20}, rng=random.Random(1))
+    prev = 1
+    for _ in range(50):
+        delay = sched.failure("irc")
+        assert 1 <= delay <= min(20, prev * 3)
+        prev = delay
+    sched.success("irc")
+    assert sched.endpoints["irc"].sleep == 1 and sched.endpoints["irc"].not_before == 0
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    now = [0.0]
+    br = CircuitBreaker(threshold=2, reset_timeout=10, clock=lambda: now[0])
+    br.record_failure()
+    assert br.state == CLOSED
+    br.record_failure()
+    assert br.state == OPEN and br.retry_in() == 10
+    now[0] = 10
+    assert br.state == HALF_OPEN
+    br.record_failure()
+    assert br.state == OPEN
+    br.record_success()
+    assert br.state == CLOSED and br.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_budget_serves_primary_first():
+    sched = ReconnectScheduler({"connect_rate": 50, "connect_burst": 1})
+    order = []
+
+    async def connect(name, prio):
+        await sched.acquire(name, prio)
+        order.append(name)
+
+    await sched.acquire("warmup", PRIMARY)  # drain the single burst token
+    tasks = [asyncio.create_task(connect(f"bg{i}", BACKGROUND)) for i in range(3)]
+    tasks.append(asyncio.create_task(connect("primary", PRIMARY)))
+    await asyncio.wait_for(asyncio.gather(*tasks), 1)
+    assert order[0] == "primary"
+    assert sorted(order[1:]) == ["bg0", "bg1", "bg2"]
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_endpoint_backoff():
+    sched = ReconnectScheduler({"base": 0.05, "max": 0.05})
+    sched.failure("irc")
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await sched.acquire("irc")
+    assert loop.time() - start >= 0.04
+    assert sched.snapshot()["irc"]["attempts"] == 1
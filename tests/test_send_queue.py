@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from send_queue import SendQueue, MODERATION, ANNOUNCEMENT
+
+
+def _queue(sent, fail=None, **cfg):
+    async def send(channel, text):
+        if fail and fail[0] > 0:
+            fail[0] -= 1
+            raise ConnectionError("down")
+        sent.append((channel, text))
+
+    cfg.setdefault("retry_delay", 0.01)
+    cfg.setdefault("requeue_window", 0.01)
+    return SendQueue(send, cfg, is_mod=lambda c: c == "modchan")
+
+
+async def _drain(q, n, timeout=1):
+    task = asyncio.create_task(q.run())
+    for _ in range(int(timeout / 0.01)):
+        if q.sent >= n:
+            break
+        await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_priority_order_coalescing_and_cancel():
+    sent = []
+    q = _queue(sent, channel={"rate": 100, "burst": 100})
+    q.submit("#chan", "hello")
+    dup = q.submit("chan", "hello")
+    cancelled = q.submit("chan", "never")
+    q.submit("chan", "/timeout spammer 60", MODERATION)
+    q.submit("chan", "stream starts soon", ANNOUNCEMENT)
+    q.submit("chan", "line one\r\nPRIVMSG #other :x")
+    assert q.submit("chan", "hello", ANNOUNCEMENT) is dup and len(q) == 5
+    assert cancelled.cancel()
+    await _drain(q, 4)
+    assert [t for _, t in sent] == ["/timeout spammer 60", "hello", "stream starts soon", "line one PRIVMSG #other :x"]
+    assert await dup is True
+
+
+@pytest.mark.asyncio
+async def test_non_mod_limits_without_blocking_other_channels():
+    sent = []
+    q = _queue(sent, channel={"rate": 1, "burst": 1}, channel_mod={"rate": 100, "burst": 100},
+               **{"global": {"rate": 0.01, "burst": 3}})
+    for i in range(3):
+        q.submit("slow", f"m{i}")
+    for i in range(5):
+        q.submit("modchan", f"x{i}")
+    await _drain(q, 6, timeout=0.3)
+    slow = [t for c, t in sent if c == "slow"]
+    assert slow == ["m0"]  # per-channel pace holds the rest back
+    assert [t for c, t in sent if c == "modchan"] == [f"x{i}" for i in range(5)]
+    assert len(q) == 2  # still queued, not dropped
+
+
+@pytest.mark.asyncio
+async def test_failed_send_is_retried_not_dropped():
+    sent, fail = [], [2]
+    q = _queue(sent, fail, channel={"rate": 100, "burst": 100})
+    msg = q.submit("chan", "important")
+    await _drain(q, 1)
+    assert sent == [("chan", "important")] and msg.attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_duplicate_text_made_distinct_for_non_mods():
+    sent = []
+    q = _queue(sent, channel={"rate": 100, "burst": 100})
+    q.submit("chan", "gg")
+    await _drain(q, 1)
+    q.submit("chan", "gg")
+    await _drain(q, 2)
+    assert sent[0][1] == "gg" and sent[1][1].startswith("gg ") and sent[1][1] != "gg"
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_send_is_requeued_then_dropped():
+    sent = []
+    q = _queue(sent, channel={"rate": 100, "burst": 100}, max_attempts=2, requeue_window=1.0,
+               **{"global": {"rate": 100, "burst": 100}})
+    msg = q.submit("chan", "hello")
+    await _drain(q, 1)
+    assert not msg.future.done() and not msg.cancel()  # sent, still inside the window
+    q.rate_limited("#Chan", seconds=0)
+    assert len(q) == 1
+    await _drain(q, 2)
+    assert sent == [("chan", "hello"), ("chan", "hello")]  # the rejected send is no duplicate
+    q.rate_limited("chan", seconds=0)
+    assert len(q) == 0 and q.dropped == 1
+    assert await msg is False
+
+
+@pytest.mark.asyncio
+async def test_requeued_message_can_be_cancelled_and_resolves_after_the_window():
+    sent = []
+    q = _queue(sent, channel={"rate": 100, "burst": 100}, requeue_window=0.05,
+               **{"global": {"rate": 100, "burst": 100}})
+    first = q.submit("chan", "one")
+    await _drain(q, 1)
+    q.rate_limited("chan", seconds=60)  # held: the retry stays queued
+    assert first.cancel() and len(q) == 0
+    second = q.submit("chan", "two")
+    q.rate_limited("chan", seconds=0)  # hold lifted
+    await _drain(q, 2)
+    assert await asyncio.wait_for(second, 1) is True
+    assert [t for _, t in sent] == ["one", "two"]
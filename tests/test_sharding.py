@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from config import Settings
+from sharding import HashRing, ShardCoordinator, encode_frame, read_frame, HELLO, ASSIGN, RECORDS
+
+
+CHANNELS = [f"chan{i}" for i in range(300)]
+
+
+def test_hash_ring_moves_only_the_leaving_nodes_keys():
+    ring = HashRing(["shard-0", "shard-1", "shard-2", "shard-3"])
+    before = {c: ring.node_for(c) for c in CHANNELS}
+    counts = {n: len(keys) for n, keys in ring.assign(CHANNELS).items()}
+    assert min(counts.values()) > len(CHANNELS) / 4 * 0.5
+
+    ring.remove("shard-2")
+    after = {c: ring.node_for(c) for c in CHANNELS}
+    moved = [c for c in CHANNELS if before[c] != after[c]]
+    assert moved and all(before[c] == "shard-2" for c in moved)
+
+    ring.add("shard-2")
+    assert {c: ring.node_for(c) for c in CHANNELS} == before
+
+
+@pytest.mark.asyncio
+async def test_frames_round_trip():
+    reader = asyncio.StreamReader()
+    reader.feed_data(encode_frame(RECORDS, [{"content": "привет", "ts": 1.5}]) + encode_frame(ASSIGN, {"channels": []}))
+    reader.feed_eof()
+    assert await read_frame(reader) == (RECORDS, [{"content": "привет", "ts": 1.5}])
+    assert await read_frame(reader) == (ASSIGN, {"channels": []})
+    with pytest.raises(asyncio.IncompleteReadError):
+        await read_frame(reader)
+
+
+async def _fake_worker(address, name):
+    reader, writer = await asyncio.open_unix_connection(address)
+    writer.write(encode_frame(HELLO, {"worker": name, "pid": 0}))
+    kind, payload = await read_frame(reader)
+    assert kind == ASSIGN
+    return reader, writer, set(payload["channels"])
+
+
+@pytest.mark.asyncio
+async def test_coordinator_assigns_channels_and_emits_records(tmp_path):
+    emitted = []
+    coord = ShardCoordinator(Settings(channels=tuple(CHANNELS[:40])), {"workers": 2},
+                             emit=lambda record, ts: emitted.append((record, ts)))
+    await coord.start_server()
+    try:
+        r0, w0, first = await _fake_worker(coord.address, "shard-0")
+        assert first == set(CHANNELS[:40])
+
+        r1, w1, second = await _fake_worker(coord.address, "shard-1")
+        kind, payload = await read_frame(r0)
+        # only the channels taken over by the new worker left shard-0
+        assert kind == ASSIGN and set(payload["channels"]) == first - second
+        assert second and second <= first
+
+        w1.write(encode_frame(RECORDS, [{"channel": "chan1", "content": "hi", "ts": 12.0}]))
+        for _ in range(100):
+            if emitted:
+                break
+            await asyncio.sleep(0.01)
+        assert emitted == [({"channel": "chan1", "content": "hi"}, 12.0)]
+
+        w1.close()
+        kind, payload = await read_frame(r0)
+        assert set(payload["channels"]) == first  # shard-1 left, its channels came back
+        w0.close()
+    finally:
+        coord._server.close()
@@ -0,0 +1,49 @@
+import json
+import show_chat
+
+
+def _write_log(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec) + "\n")
+
+
+def _chat(ts, author, channel="vj_games", content="hi"):
+    return {"asctime": ts, "levelname": "INFO", "name": "chat_aggregator", "message": "chat.message",
+            "channel": channel, "author": author, "content": content}
+
+
+def test_split_chunks_line_aligned(tmp_path):
+    log = tmp_path / "obs_multichat.log"
+    _write_log(log, [_chat("2024-01-01 10:00:00,000", f"user{i}") for i in range(50)])
+    chunks = show_chat.split_chunks(str(log), chunk_size=100)
+    data = log.read_bytes()
+    assert chunks[0][1] == 0 and chunks[-1][2] == len(data)
+    for (_, start, end), (_, nxt, _) in zip(chunks, chunks[1:]):
+        assert end == nxt
+        assert data[end - 1:end] == b"\n"
+
+
+def test_collect_stats_over_rotated_files(tmp_path):
+    log = tmp_path / "obs_multichat.log"
+    _write_log(str(log) + ".1", [
+        _chat("2024-01-01 10:00:01,000", "alice"),
+        {"asctime": "2024-01-01 10:00:02,000", "message": "Twitch bot connected"},
+        dict(_chat("2024-01-01 10:00:30,000", "bob", content='says "chat.message"'), tags={"first-msg": "1"}),
+    ])
+    _write_log(log, [
+        _chat("2024-01-01 10:01:00,000", "alice"),
+        dict(_chat("2024-01-01 10:07:00,000", "carol"), first_seen=True),
+    ])
+    files = show_chat.log_files(str(log))
+    assert files == [str(log) + ".1", str(log)]
+
+    serial = show_chat.collect_stats(files, workers=0, chunk_size=64)
+    pooled = show_chat.collect_stats(files, workers=2, chunk_size=64)
+    for stats in (serial, pooled):
+        report = stats.report(top=2, window=5)
+        assert report["messages"] == 4
+        assert report["messages_per_minute"] == {"2024-01-01 10:00": 2, "2024-01-01 10:01": 1, "2024-01-01 10:07": 1}
+        assert report["top_chatters"][0] == ("alice", 2)
+        assert [a for a, _ in report["first_time_chatters"]] == ["bob", "carol"]
+        assert report["peak_windows"][0] == ("2024-01-01 10:00", 2)
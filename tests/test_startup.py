@@ -0,0 +1,24 @@
+import logging
+import os
+import subprocess
+import sys
+from startup import StartupTimer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_timer_keeps_first_mark_and_reports_once(caplog):
+    caplog.set_level(logging.INFO, logger="startup")
+    timer = StartupTimer(t0=0.0)
+    first = timer.mark("irc_welcome")
+    timer.mark("irc_welcome")
+    assert timer.phases["irc_welcome"] == round(first * 1000, 1)
+    timer.report()
+    timer.report()
+    assert [r.phases_ms for r in caplog.records if r.getMessage() == "startup.timing"] == [timer.phases]
+
+
+def test_chat_import_does_not_pull_heavy_dependencies():
+    code = "import sys, chat_aggregator; print(sorted(m for m in ('twitchio', 'aiohttp', 'requests') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
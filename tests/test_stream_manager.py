@@ -0,0 +1,152 @@
+import asyncio
+import json
+import shutil
+import sys
+import pytest
+from stream_manager import StreamManager, parse_progress, tee_slave
+
+
+def _fake_ffmpeg(tmp_path, body):
+    script = tmp_path / "ffmpeg"
+    script.write_text(f"#!{sys.executable}\nimport json, sys, time\n{body}\n")
+    script.chmod(0o755)
+    return str(script)
+
+
+def test_tee_slave_options_and_escaping():
+    ep = {"url": "rtmp://live.twitch.tv/app/", "key": "live_1|2", "options": {"flvflags": "no_duration_filesize"}}
+    assert tee_slave(ep) == "[f=flv:onfail=ignore:flvflags=no_duration_filesize]rtmp://live.twitch.tv/app/live_1\\|2"
+    assert tee_slave({"url": "out.ts", "format": "mpegts", "onfail": "abort"}) == "[f=mpegts:onfail=abort]out.ts"
+
+
+def test_build_command_encodes_once():
+    sm = StreamManager({"input": "rtmp://127.0.0.1/live/obs", "video": {"bitrate": "6000k"}})
+    cmd = sm.build_command([{"url": "rtmp://a/app", "key": "k1"}, {"url": "rtmp://b/app", "key": "k2"}])
+    assert cmd.count("-i") == 1 and cmd.count("-c:v") == 1
+    assert cmd[cmd.index("-b:v") + 1] == "6000k"
+    assert cmd[-2:] == ["tee", "[f=flv:onfail=ignore]rtmp://a/app/k1|[f=flv:onfail=ignore]rtmp://b/app/k2"]
+    with pytest.raises(ValueError):
+        sm.build_command([])
+
+
+@pytest.mark.asyncio
+async def test_supervisor_runs_and_stops(tmp_path):
+    argv_file = tmp_path / "argv.json"
+    ffmpeg = _fake_ffmpeg(tmp_path, f"json.dump(sys.argv[1:], open({str(argv_file)!r}, 'w'))\ntime.sleep(30)")
+    sm = StreamManager({"ffmpeg": ffmpeg, "input": "in.mp4", "rtmp_endpoints": [{"url": "out.flv"}]})
+    await sm.start_stream()
+    for _ in range(100):
+        if argv_file.exists() and argv_file.read_text():
+            break
+        await asyncio.sleep(0.02)
+    assert sm.running
+    assert json.loads(argv_file.read_text())[-1] == "[f=flv:onfail=ignore]out.flv"
+    await sm.stop_stream(timeout=2)
+    assert not sm.running
+
+
+@pytest.mark.asyncio
+async def test_supervisor_restarts_crashed_ffmpeg(tmp_path):
+    ffmpeg = _fake_ffmpeg(tmp_path, "print('boom', file=sys.stderr)\nsys.exit(1)")
+    sm = StreamManager({"ffmpeg": ffmpeg, "input": "in.mp4", "restart": {"delay": 0.01, "max_restarts": 2}})
+    await sm.start_stream([{"url": "out.flv"}])
+    await asyncio.wait_for(sm._task, 5)
+    assert sm.restarts == 2
+    assert sm.returncode == 1
+    assert "boom" in sm.stderr_tail
+    await sm.stop_stream()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+async def test_real_ffmpeg_tee_to_files(tmp_path):
+    outs = [tmp_path / "a.flv", tmp_path / "b.flv"]
+    sm = StreamManager({
+        "input": "testsrc=size=320x240:rate=30",
+        "input_args": ["-re", "-f", "lavfi", "-t", "1"],
+        "restart": {"enabled": False},
+    })
+    await sm.start_stream([{"url": str(p)} for p in outs])
+    await asyncio.wait_for(sm._task, 30)
+    assert sm.returncode == 0
+    assert all(p.stat().st_size > 0 for p in outs)
+
+
+def test_parse_progress_block():
+    m = parse_progress({"frame": "120", "fps": "29.97", "bitrate": "2999.1kbits/s", "speed": "1.01x",
+                        "drop_frames": "2", "dup_frames": "0", "out_time_us": "4000000",
+                        "out_time": "00:00:04.000000", "progress": "continue"})
+    assert m["fps"] == 29.97 and m["bitrate_kbps"] == 2999.1 and m["speed"] == 1.01
+    assert m["drop_frames"] == 2 and m["out_time_s"] == 4.0
+    assert parse_progress({"bitrate": "N/A", "speed": "N/A"})["speed"] is None
+
+
+@pytest.mark.asyncio
+async def test_progress_metrics_and_single_output_recovery(tmp_path):
+    relay_file = tmp_path / "relay.json"
+    ffmpeg = _fake_ffmpeg(tmp_path, f"""
+if "tee" in sys.argv:
+    for i in range(3):
+        print(f"frame={{i * 30}}\\nfps=30.0\\nbitrate=3000.0kbits/s\\nout_time_us={{i * 1000000}}\\n"
+              f"drop_frames=0\\ndup_frames=1\\nspeed=1.00x\\nprogress=continue", flush=True)
+    print("[tee @ 0x1] Slave muxer #1 failed: Broken pipe, continuing with 3/4 slaves.", file=sys.stderr, flush=True)
+else:
+    json.dump(sys.argv[1:], open({str(relay_file)!r}, "w"))
+time.sleep(30)
+""")
+    sm = StreamManager({"ffmpeg": ffmpeg, "input": "in.mp4", "recovery": {"enabled": True, "tap_base_port": 24000}})
+    events = []
+    sm.add_listener(events.append)
+    endpoints = [{"platform": "twitch", "url": "rtmp://a/app", "key": "k"},
+                 {"platform": "youtube", "url": "rtmp://b/live2", "key": "y",
+                  "options": {"flvflags": "no_duration_filesize", "onfail": "ignore", "use_fifo": 1}}]
+    assert sm.build_command(endpoints)[-1].endswith("|[f=mpegts:onfail=ignore]udp://127.0.0.1:24001?pkt_size=1316")
+    await sm.start_stream(endpoints)
+    for _ in range(200):
+        if relay_file.exists() and relay_file.read_text():
+            break
+        await asyncio.sleep(0.02)
+    assert sm.metrics["fps"] == 30.0 and sm.metrics["out_time_s"] == 2.0
+    types_ = [e["type"] for e in events]
+    assert types_.count("progress") == 3
+    assert "output_failed" in types_ and "output_recovered" in types_
+    assert sm.outputs[0]["state"] == "ok"
+    assert sm.outputs[1]["state"] == "relay"
+    relay_argv = json.loads(relay_file.read_text())
+    assert "udp://127.0.0.1:24001?overrun_nonfatal=1&fifo_size=50000" in relay_argv
+    assert relay_argv[-3:] == ["-f", "flv", "rtmp://b/live2/y"]
+    assert relay_argv[relay_argv.index("-flvflags") + 1] == "no_duration_filesize"
+    assert "-onfail" not in relay_argv and "-use_fifo" not in relay_argv
+    sm.endpoints[1]["relay_options"] = {"rw_timeout": 5000000}
+    assert sm.build_relay_command(1)[-5:-3] == ["-rw_timeout", "5000000"]
+    assert sm.restarts == 0
+    await sm.stop_stream(timeout=2)
+    assert not sm._relays
+
+
+@pytest.mark.asyncio
+async def test_watchdog_recycles_stalled_encoder(tmp_path):
+    ffmpeg = _fake_ffmpeg(tmp_path, "print('out_time_us=0\\nprogress=continue', flush=True)\ntime.sleep(30)")
+    sm = StreamManager({"ffmpeg": ffmpeg, "input": "in.mp4", "stall_timeout": 0.2,
+                        "restart": {"delay": 0.01, "max_restarts": 1}})
+    events = []
+    sm.add_listener(events.append)
+    await sm.start_stream([{"url": "out.flv"}])
+    await asyncio.wait_for(sm._task, 5)
+    assert [e["type"] for e in events].count("stalled") == 2
+    assert sm.restarts == 1
+    await sm.stop_stream()
+
+
+@pytest.mark.asyncio
+async def test_watchdog_waits_for_the_first_output(tmp_path):
+    # an encoder waiting for OBS to connect to its listen input prints nothing
+    ffmpeg = _fake_ffmpeg(tmp_path, "time.sleep(30)")
+    sm = StreamManager({"ffmpeg": ffmpeg, "input": "rtmp://127.0.0.1/live/obs", "stall_timeout": 0.1,
+                        "restart": {"delay": 0.01}})
+    events = []
+    sm.add_listener(events.append)
+    await sm.start_stream([{"url": "out.flv"}])
+    await asyncio.sleep(0.5)
+    assert "stalled" not in [e["type"] for e in events] and sm.restarts == 0 and sm.running
+    await sm.stop_stream(timeout=2)
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from supervisor import Supervisor, LivenessWatchdog, ALWAYS, NEVER
+
+
+@pytest.mark.asyncio
+async def test_restart_policies_and_shutdown():
+    runs = {"flaky": 0, "once": 0}
+
+    async def flaky():
+        runs["flaky"] += 1
+        if runs["flaky"] < 3:
+            raise RuntimeError("boom")
+        await asyncio.sleep(30)
+
+    async def once():
+        runs["once"] += 1
+
+    sup = Supervisor("test")
+    sup.add("flaky", flaky, backoff=0.01)
+    sup.add("once", once, restart=NEVER)
+    task = asyncio.create_task(sup.run())
+    for _ in range(100):
+        if runs["flaky"] == 3:
+            break
+        await asyncio.sleep(0.01)
+    status = sup.status()
+    assert status["flaky"] == {"state": "running", "restarts": 2, "last_error": "RuntimeError('boom')"}
+    assert status["once"]["state"] == "finished" and runs["once"] == 1
+    sup.shutdown()
+    await asyncio.wait_for(task, 1)
+    assert sup.status()["flaky"]["state"] == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_critical_child_giving_up_stops_supervisor():
+    async def bad():
+        raise ValueError("nope")
+
+    async def forever():
+        await asyncio.sleep(30)
+
+    sup = Supervisor("test")
+    sup.add("bad", bad, backoff=0.01, max_restarts=1, critical=True)
+    sup.add("forever", forever, restart=ALWAYS)
+    await asyncio.wait_for(sup.run(), 1)
+    assert sup.status()["bad"]["restarts"] == 1
+
+
+def test_watchdog_recycles_silent_connection():
+    recycled = []
+    wd = LivenessWatchdog(deadline=10)
+    quiet = wd.register("quiet", lambda: recycled.append("quiet"))
+    busy = wd.register("busy", lambda: recycled.append("busy"))
+    quiet.last_seen -= 11
+    busy.last_seen -= 11
+    busy.touch()
+    assert wd.check() == ["quiet"]
+    assert recycled == ["quiet"]
+    assert "quiet" not in wd.entries and "busy" in wd.entries
+
+
+@pytest.mark.asyncio
+async def test_irc_fallback_recycled_when_socket_goes_silent(monkeypatch):
+    from chat_aggregator import ChatAggregator
+    from config import Settings
+    from reconnect import ReconnectScheduler
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        await reader.read()  # half-open: accept, never send anything
+
+    connections = []
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    real_open = asyncio.open_connection
+    monkeypatch.setattr(asyncio, "open_connection", lambda host, p, ssl=None: real_open("127.0.0.1", port))
+    monkeypatch.setattr(asyncio, "sleep", _fast_sleep(asyncio.sleep))
+
+    agg = ChatAggregator(settings=Settings.from_config({"chat": {"twitch": {"streamer_login": "chan"}}}, {}))
+    agg.watchdog = LivenessWatchdog(deadline=0.1, interval=0.02)
+    agg.reconnect = ReconnectScheduler({"base": 0.01, "max": 0.02})
+    watchdog = asyncio.create_task(agg.watchdog.run())
+    irc = asyncio.create_task(agg._irc_fallback("oauth:x", "bot"))
+    for _ in range(200):
+        if len(connections) >= 2:
+            break
+        await asyncio.sleep(0.01)
+    irc.cancel()
+    watchdog.cancel()
+    await asyncio.gather(irc, watchdog, return_exceptions=True)
+    server.close()
+    assert len(connections) >= 2
+
+
+def _fast_sleep(real_sleep):
+    async def sleep(delay, *args):
+        await real_sleep(min(delay, 0.02), *args)
+    return sleep